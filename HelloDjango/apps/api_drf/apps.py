@@ -3,4 +3,14 @@ from django.apps import AppConfig
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'api_drf'
+    name = 'apps.api_drf'
+
+    def ready(self):
+        # 数据修改时使相关的视图缓存失效，见 hello_django/caching.py
+        from django.contrib.auth import get_user_model
+        from hello_django.caching import connect_invalidation
+        from .models import Student, Teacher, Draft
+        from .utils.auth_cache import connect_auth_cache_signals
+        connect_invalidation(Student, Teacher, Draft, get_user_model())
+        # 用户、用户组、权限变化时使认证和权限缓存失效
+        connect_auth_cache_signals()
@@ -23,7 +23,9 @@ class Student(models.Model):
         verbose_name_plural = verbose_name   # 复数形式，默认下会在 verbose_name 后面加上字符串 s 表示复数（比如在Admin界面显示时）
         ordering = ['name', '-grade']        # 指定数据记录的排序字段，默认ASC，- 表示 DESC
         # 定义索引字段
-        # indexes = [models.Index(fields=["name"])]
+        # 索引的字段和方向与 ordering 一致，默认排序的查询可以直接按索引顺序读取，不需要在数据库中排序；
+        # 批量 upsert 按 name 查询已存在的记录（见 utils/bulk.py），也可以使用这个索引
+        indexes = [models.Index(fields=['name', '-grade'], name='api_student_name_grade_idx')]
 
 
 class Teacher(models.Model):
@@ -45,6 +47,7 @@ class Teacher(models.Model):
         verbose_name = '教师信息表'             # 此Model的文本表示，用于在 Admin 界面显示等
         verbose_name_plural = verbose_name    # 复数形式，默认下会在 verbose_name 后面加上字符串 s 表示复数（比如在Admin界面显示时）
         ordering = ['name', '-subject']       # 指定数据记录的排序字段，默认ASC，- 表示 DESC
+        indexes = [models.Index(fields=['name', '-subject'], name='api_teacher_name_subject_idx')]
 
 
 # ----------------- 研究DRF用户验证 + 权限控制 ------------------
@@ -69,6 +72,7 @@ class Draft(models.Model):
         verbose_name = "Draft"
         verbose_name_plural = "Drafts"
         ordering = ['-create_date']
+        indexes = [models.Index(fields=['-create_date'], name='api_draft_create_date_idx')]
 
     def __str__(self):
         return f"{self.author} - {self.status} - {self.create_date} : {self.content}"
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import Student, Teacher, Draft
+from .utils.bulk import BulkUpsertListSerializer
 
 # DRF 框架提供了多种序列化类
 
@@ -13,6 +14,12 @@ class StudentSerializer(serializers.Serializer):
     # 日期/日期时间字段可以通过 format 自定义输出格式
     create_date = serializers.DateField(read_only=True, format='%Y-%m-%d')
 
+    class Meta:
+        model = Student
+        # many=True 写入时使用批量 upsert，按 natural_key 判断记录是否已存在，见 utils/bulk.py
+        list_serializer_class = BulkUpsertListSerializer
+        natural_key = ('name', 'grade', 'grade_class')
+
     def validate_gender(self, value):
         if value in ['male', 'female']:
             return value
@@ -40,6 +47,8 @@ class TeacherSerializer(serializers.ModelSerializer):
         model = Teacher
         fields = '__all__'
         read_only_fields = ('tid', 'create_date')
+        list_serializer_class = BulkUpsertListSerializer
+        natural_key = ('name', 'grade', 'grade_class')
 
     def validate_gender(self, value):
         if value in ['male', 'female']:
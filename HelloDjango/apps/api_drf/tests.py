@@ -0,0 +1,376 @@
+import json
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from hello_django.testing import QueryPlanAssertionsMixin
+from .models import Student, Teacher, Draft
+from .serializers import DraftSerializer, StudentSerializer, TeacherSerializer
+from .utils.fast_serializer import NotCompilable
+from .utils.query_optimizer import build_query_plan
+from .utils.streaming import async_streaming_list_response
+
+# 运行方式（使用 sqlite 的 prod 配置）：HELLO_DJANGO_PROFILE=prod python manage.py test apps.api_drf
+
+User = get_user_model()
+
+
+class QueryPlanTest(TestCase):
+    def test_draft_serializer_plan(self):
+        plan = build_query_plan(DraftSerializer, Draft)
+        # author(source="author.id") 和 get_author_name 里的 obj.author.username 都需要 author
+        self.assertEqual(plan.select_related, {'author'})
+        self.assertEqual(plan.prefetch_related, set())
+        self.assertIn('author__username', plan.only)
+        self.assertIn('author_id', plan.only)
+
+    def test_teacher_serializer_plan(self):
+        plan = build_query_plan(TeacherSerializer, Teacher)
+        self.assertEqual(plan.select_related, set())
+        self.assertEqual(plan.prefetch_related, set())
+
+
+@override_settings(API_CACHE_ENABLED=False)
+class EndpointQueryCountTest(TestCase):
+    """
+    列表接口的查询次数不能随数据条数增长：分别在少量数据和大量数据下请求同一个接口，查询次数必须相同，并且等于期望值.
+    这里统计的是视图本身的查询次数，关闭视图缓存.
+    """
+    # (URL, 期望的查询次数)
+    ENDPOINTS = [
+        ('/api_drf/list_student', 1),
+        ('/api_drf/teacher/genericviews/0', 1),
+        ('/api_drf/teacher/compositeviews', 1),
+        ('/api_drf/teacher/viewset/', 1),
+        ('/api_drf/draft/open/0', 1),
+        ('/api_drf/draft/auth/0', 1),
+        ('/api_drf/draft/owner/0', 1),
+        ('/api_drf/draft/token', 1),
+        ('/api_drf/draft/jwt/0', 1),
+    ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.users = [User.objects.create_user(username=f"user_{i}", password='password') for i in range(5)]
+
+    def seed(self, count: int):
+        Student.objects.bulk_create([
+            Student(name=f"student_{i}", gender='male', grade='1', grade_class='1') for i in range(count)
+        ])
+        Teacher.objects.bulk_create([
+            Teacher(name=f"teacher_{i}", gender='female', subject='math', grade='1', grade_class='1')
+            for i in range(count)
+        ])
+        Draft.objects.bulk_create([
+            Draft(author=self.users[i % len(self.users)], content=f"draft_{i}") for i in range(count)
+        ])
+
+    def count_queries(self, url: str) -> int:
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200, msg=url)
+        return len(ctx.captured_queries)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self.seed(3)
+        small = {url: self.count_queries(url) for url, _ in self.ENDPOINTS}
+        self.seed(50)
+        for url, expected in self.ENDPOINTS:
+            with self.subTest(url=url):
+                large = self.count_queries(url)
+                self.assertEqual(small[url], large, msg=f"{url} issues N+1 queries")
+                self.assertEqual(large, expected)
+
+
+class StreamingListTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        Student.objects.bulk_create([
+            Student(name=f"student_{i}", gender='male', grade='1', grade_class='1') for i in range(250)
+        ])
+
+    def test_default_cursor_pagination(self):
+        response = self.client.get('/api_drf/list_student', HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(len(body['results']), 100)
+        self.assertIsNotNone(body['next'])
+
+    def test_cursor_pagination_keeps_model_ordering(self):
+        # name 有重复值，翻页时靠追加的主键保证顺序稳定、不重复不遗漏
+        Student.objects.bulk_create([
+            Student(name=f"student_{i % 5}", gender='male', grade=str(i % 3), grade_class='1') for i in range(20)
+        ])
+        sids, url = [], '/api_drf/list_student?page_size=7'
+        while url:
+            body = self.client.get(url, HTTP_ACCEPT='application/json').json()
+            sids += [row['sid'] for row in body['results']]
+            url = body['next']
+        expected = list(Student.objects.order_by('name', '-grade', 'pk').values_list('sid', flat=True))
+        self.assertEqual(sids, expected)
+
+    def test_stream_json_and_ndjson(self):
+        response = self.client.get('/api_drf/list_student?stream=json')
+        self.assertTrue(response.streaming)
+        rows = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(len(rows), 250)
+        response = self.client.get('/api_drf/list_student?stream=ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual(len(lines), 250)
+        self.assertEqual(json.loads(lines[0]).keys(), rows[0].keys())
+
+    def test_async_stream_compiles_before_response(self):
+        # 序列化器无法编译时在返回响应之前抛出异常，而不是在发送了 200 响应头之后
+        with self.assertRaises(NotCompilable):
+            async_streaming_list_response(Draft.objects.all(), DraftSerializer)
+
+
+class CachedViewTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='reader', password='password')
+        Teacher.objects.bulk_create([
+            Teacher(name=f"teacher_{i}", gender='female', subject='math', grade='1', grade_class='1') for i in range(5)
+        ])
+
+    def get(self, url: str):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200)
+        return response.json(), len(ctx.captured_queries)
+
+    def test_warm_request_hits_cache(self):
+        url = '/api_drf/teacher/viewset/'
+        first, _ = self.get(url)
+        second, queries = self.get(url)
+        self.assertEqual(first, second)
+        self.assertEqual(queries, 0)
+
+    def test_save_invalidates(self):
+        url = '/api_drf/teacher/compositeviews'
+        before, _ = self.get(url)
+        Teacher.objects.create(name='new_teacher', gender='male', subject='art', grade='2', grade_class='1')
+        after, queries = self.get(url)
+        self.assertGreater(queries, 0)
+        self.assertEqual(len(after['results']), len(before['results']) + 1)
+
+    def test_function_view_hits_cache(self):
+        Student.objects.create(name='student', gender='male', grade='1', grade_class='1')
+        first, _ = self.get('/api_drf/list_student')
+        second, queries = self.get('/api_drf/list_student')
+        self.assertEqual(first, second)
+        self.assertEqual(queries, 0)
+
+    def test_vary_on_auth(self):
+        url = '/api_drf/draft/token'
+        Draft.objects.create(author=self.user, content='draft')
+        token = Token.objects.create(user=self.user)
+        self.get(url)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        # 认证后的用户不同，不会命中匿名用户的缓存
+        _, cold = self.get(url)
+        _, warm = self.get(url)
+        # 命中缓存时只剩下认证查询 Token 的一次查询
+        self.assertEqual(warm, 1)
+        self.assertLess(warm, cold)
+
+    def test_deleted_token_is_not_served_from_cache(self):
+        url = '/api_drf/draft/token'
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        self.get(url)
+        token.delete()
+        response = self.client.get(url, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 401)
+
+
+@override_settings(API_CACHE_ENABLED=False)
+class AuthCacheTest(TestCase):
+    """draft/perm 接口使用 MyTokenAuthentication + CachedModelPermissions，缓存预热后认证和鉴权不查询数据库"""
+    URL = '/api_drf/draft/perm/0'
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='perm_user', password='password')
+        self.view_perm = Permission.objects.get(codename='view_draft')
+        self.user.user_permissions.add(self.view_perm)
+        Draft.objects.bulk_create([Draft(author=self.user, content=f"draft_{i}") for i in range(3)])
+
+    def get(self, username: str):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.URL, HTTP_ACCEPT='application/json', HTTP_X_USERNAME=username)
+        return response.status_code, len(ctx.captured_queries)
+
+    def test_warm_request_has_no_auth_queries(self):
+        status, cold = self.get('perm_user')
+        self.assertEqual(status, 200)
+        status, warm = self.get('perm_user')
+        self.assertEqual(status, 200)
+        # 只剩下查询 Draft 列表的一次查询
+        self.assertEqual(warm, 1)
+        self.assertLess(warm, cold)
+
+    def test_user_permission_change_invalidates(self):
+        self.assertEqual(self.get('perm_user')[0], 200)
+        self.user.user_permissions.remove(self.view_perm)
+        self.assertEqual(self.get('perm_user')[0], 403)
+        self.user.user_permissions.add(self.view_perm)
+        self.assertEqual(self.get('perm_user')[0], 200)
+
+    def test_group_permission_change_invalidates(self):
+        self.user.user_permissions.clear()
+        group = Group.objects.create(name='readers')
+        group.permissions.add(self.view_perm)
+        self.assertEqual(self.get('perm_user')[0], 403)
+        self.user.groups.add(group)
+        self.assertEqual(self.get('perm_user')[0], 200)
+        group.permissions.clear()
+        self.assertEqual(self.get('perm_user')[0], 403)
+
+    def test_unknown_username_is_negatively_cached(self):
+        status, _ = self.get('nobody')
+        self.assertIn(status, (401, 403))
+        status, queries = self.get('nobody')
+        self.assertIn(status, (401, 403))
+        self.assertEqual(queries, 0)
+        # 创建用户时会清除负缓存
+        nobody = User.objects.create_user(username='nobody', password='password')
+        nobody.user_permissions.add(self.view_perm)
+        self.assertEqual(self.get('nobody')[0], 200)
+
+
+@override_settings(API_CACHE_ENABLED=True)
+class AuthViewCacheTest(AuthCacheTest):
+    """开启视图缓存时，draft/perm 缓存的响应只返回给通过 X-Username 认证和权限检查的用户"""
+
+    def setUp(self):
+        super().setUp()
+        User.objects.create_user(username='other_user', password='password')
+
+    def test_warm_request_has_no_auth_queries(self):
+        self.assertEqual(self.get('perm_user')[0], 200)
+        status, queries = self.get('perm_user')
+        self.assertEqual(status, 200)
+        # 认证、鉴权和响应都命中缓存
+        self.assertEqual(queries, 0)
+
+    def test_cached_response_requires_permission(self):
+        self.assertEqual(self.get('perm_user')[0], 200)
+        self.assertEqual(self.get('other_user')[0], 403)
+        self.assertIn(self.get('nobody')[0], (401, 403))
+        response = self.client.get(self.URL, HTTP_ACCEPT='application/json')
+        self.assertIn(response.status_code, (401, 403))
+
+
+class BulkUpsertTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def post(self, url: str, rows: list):
+        return self.client.post(url, data=rows, format='json')
+
+    def test_bulk_student_create_and_update(self):
+        rows = [{'name': f"student_{i}", 'gender': 'male', 'grade': '1', 'grade_class': '1'} for i in range(10)]
+        rows.append({'name': 'bad', 'gender': 'unknown', 'grade': '1', 'grade_class': '1'})
+        # 自然键重复，以最后一行为准
+        rows.append({'name': 'student_0', 'gender': 'female', 'grade': '1', 'grade_class': '1'})
+        response = self.post('/api_drf/bulk_student', rows)
+        self.assertEqual(response.status_code, 207)
+        report = response.json()
+        self.assertEqual((report['created'], report['updated'], report['duplicated'], report['failed']), (10, 0, 1, 1))
+        self.assertEqual(report['errors'][0]['index'], 10)
+        self.assertIn('gender', report['errors'][0]['errors'])
+        self.assertEqual(Student.objects.get(name='student_0').gender, 'female')
+
+        rows = [{'name': f"student_{i}", 'gender': 'female', 'grade': '1', 'grade_class': '1'} for i in range(5, 15)]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.post('/api_drf/bulk_student', rows)
+        self.assertEqual(response.status_code, 200)
+        report = response.json()
+        self.assertEqual((report['created'], report['updated'], report['failed']), (5, 5, 0))
+        self.assertEqual(Student.objects.count(), 15)
+        self.assertEqual(Student.objects.filter(gender='female').count(), 11)
+        # 查询已存在记录 + bulk_create + bulk_update，不随行数增长（另外还有事务的 SAVEPOINT 语句）
+        self.assertLessEqual(len([q for q in ctx.captured_queries if 'SAVEPOINT' not in q['sql']]), 3)
+
+    def test_bulk_teacher_invalidates_cache(self):
+        self.assertEqual(self.client.get('/api_drf/teacher/viewset/', HTTP_ACCEPT='application/json').json()['results'], [])
+        rows = [{'name': f"teacher_{i}", 'gender': 'male', 'subject': 'math', 'grade': '1', 'grade_class': '1'}
+                for i in range(3)]
+        self.assertEqual(self.post('/api_drf/teacher/bulk', rows).status_code, 200)
+        results = self.client.get('/api_drf/teacher/viewset/', HTTP_ACCEPT='application/json').json()['results']
+        self.assertEqual(len(results), 3)
+
+    def test_all_rows_invalid(self):
+        response = self.post('/api_drf/bulk_student', [{'name': 'x'}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['failed'], 1)
+
+    def test_null_natural_key_is_row_error(self):
+        rows = [{'name': f"student_{i}", 'gender': 'male', 'grade': '1', 'grade_class': '1'} for i in range(3)]
+        rows.insert(1, {'name': 'no_class', 'gender': 'male', 'grade': '1', 'grade_class': None})
+        rows.append({'name': 'missing_class', 'gender': 'male', 'grade': '1'})
+        response = self.post('/api_drf/bulk_student', rows)
+        self.assertEqual(response.status_code, 207)
+        report = response.json()
+        self.assertEqual((report['created'], report['failed']), (3, 2))
+        self.assertEqual([e['index'] for e in report['errors']], [1, 4])
+        self.assertIn('grade_class', report['errors'][0]['errors'])
+        self.assertEqual(Student.objects.count(), 3)
+
+    def test_failed_chunk_is_retried_row_by_row(self):
+        # 绕过校验直接写入，一行违反 NOT NULL 约束，整块失败后逐行重试，其余的行照常写入
+        rows = [{'name': f"student_{i}", 'gender': 'male', 'grade': '1', 'grade_class': '1'} for i in range(5)]
+        serializer = StudentSerializer(data=rows, many=True)
+        rows[2] = {**rows[2], 'grade_class': None}
+        serializer.create(list(enumerate(rows)))
+        report = serializer.report
+        self.assertEqual((report['created'], report['failed']), (4, 1))
+        self.assertEqual(report['errors'][0]['index'], 2)
+        self.assertEqual(Student.objects.count(), 4)
+
+
+@override_settings(API_CACHE_ENABLED=False)
+class DatabaseQueryPlanTest(QueryPlanAssertionsMixin, TestCase):
+    """列表接口（分页、翻页、流式导出）的查询都不能出现没有索引的排序或带过滤条件的全表扫描"""
+
+    def setUp(self):
+        self.client = APIClient()
+        users = [User.objects.create_user(username=f"user_{i}", password='password') for i in range(3)]
+        Student.objects.bulk_create([
+            Student(name=f"student_{i}", gender='male', grade=str(i % 6), grade_class='1') for i in range(300)
+        ])
+        Teacher.objects.bulk_create([
+            Teacher(name=f"teacher_{i}", gender='female', subject='math', grade=str(i % 6), grade_class='1')
+            for i in range(300)
+        ])
+        Draft.objects.bulk_create([Draft(author=users[i % 3], content=f"draft_{i}") for i in range(300)])
+
+    def test_list_endpoints(self):
+        urls = [url for url, _ in EndpointQueryCountTest.ENDPOINTS]
+        urls += [f"{url}{'&' if '?' in url else '?'}stream=ndjson" for url in urls]
+        for url in urls:
+            with self.subTest(url=url), self.assertEfficientQueries():
+                response = self.client.get(url, HTTP_ACCEPT='application/json')
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                self.assertEqual(response.status_code, 200)
+
+    def test_next_page(self):
+        with self.assertEfficientQueries():
+            body = self.client.get('/api_drf/teacher/viewset/', HTTP_ACCEPT='application/json').json()
+            self.client.get(body['next'], HTTP_ACCEPT='application/json')
+
+    def test_bulk_upsert_lookup(self):
+        rows = [{'name': f"student_{i}", 'gender': 'female', 'grade': str(i % 6), 'grade_class': '1'} for i in range(50)]
+        with self.assertEfficientQueries():
+            self.client.post('/api_drf/bulk_student', data=rows, format='json')
@@ -3,8 +3,10 @@ from rest_framework.urlpatterns import format_suffix_patterns
 from rest_framework.routers import DefaultRouter
 from rest_framework.authtoken.views import obtain_auth_token
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
-from .views import get_student, list_student, create_student, TeacherApiView, TeacherGenericView, \
-    TeacherCompositeView, TeacherViewSet, create_draft_user, DraftOpenView, DraftAuthView, DraftOwnerView, DraftJwtView
+from .views import get_student, list_student, create_student, bulk_student, TeacherApiView, TeacherGenericView, \
+    TeacherBulkView, TeacherCompositeView, TeacherViewSet, create_draft_user, DraftOpenView, DraftAuthView, DraftOwnerView, DraftTokenView, \
+    DraftJwtView, DraftPermView
+from .views_async import stream_student, stream_teacher
 
 # ViewSet 需要使用 Router 来集成
 router = DefaultRouter()
@@ -15,12 +17,14 @@ urlpatterns = [
     path('get_student/<int:sid>', get_student),
     path('list_student', list_student),
     path('create_student', create_student),
+    path('bulk_student', bulk_student),
     # ------- Class-based 视图 ---------
     # 由于这里设置了 tid 参数，所以 TeacherApiView 里的所有方法，包括 post，都必须要接受一个 tid 参数，即使用不到
     path('teacher/apiviews/<int:tid>', TeacherApiView.as_view()),
     # 其他class-based view
     path('teacher/genericviews/<int:tid>', TeacherGenericView.as_view()),
     path('teacher/compositeviews', TeacherCompositeView.as_view()),
+    path('teacher/bulk', TeacherBulkView.as_view()),
 
     # 引入DRF的用户登录界面视图函数，具体URL为 api_drf/auth/login
     path('auth/', include('rest_framework.urls')),
@@ -36,7 +40,13 @@ urlpatterns = [
     path('draft/open/<int:nid>', DraftOpenView.as_view()),
     path('draft/auth/<int:nid>', DraftAuthView.as_view()),
     path('draft/owner/<int:nid>', DraftOwnerView.as_view()),
+    path('draft/perm/<int:nid>', DraftPermView.as_view()),
+    path('draft/token', DraftTokenView.as_view()),
     path('draft/jwt/<int:nid>', DraftJwtView.as_view()),
+
+    # async 视图，ASGI 部署时流式导出全部数据，见 views_async.py
+    path('async/stream_student', stream_student),
+    path('async/stream_teacher', stream_teacher),
 ]
 
 # 默认下，DRF 框架的 Response 对象会对接口返回的数据使用默认的HTML页面进行渲染，稍微封装一下，容易查看数据
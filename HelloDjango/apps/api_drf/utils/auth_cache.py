@@ -0,0 +1,137 @@
+"""
+用户和权限的缓存，供身份认证类和权限类使用.
+每个请求都执行 User.objects.get(username=...) 查询用户，权限检查时 ModelBackend 还要再查询用户权限和用户组权限（2 次查询），
+而用户和权限的变化频率远低于请求频率. 这里的做法：
+  + 用户对象按 username 缓存；不存在的 username 也缓存一段较短的时间（负缓存），避免用不存在的用户名反复穿透到数据库；
+  + 用户的权限集合按 (用户ID, 用户版本号, 用户组版本号) 缓存：
+      - 用户的 user_permissions 或 groups 变化时，该用户的版本号 +1；
+      - 任何用户组的 permissions 变化、用户组或权限被删除时，全局的用户组版本号 +1（一个组可能包含很多用户，逐个失效代价太大）；
+    版本号变化后旧的 key 不会再被访问，等待自然过期；
+  + 取到权限集合后直接设置到 user._perm_cache 上，ModelBackend.has_perm() 发现这个属性后就不会再查询数据库.
+信号在 ApiConfig.ready() 中通过 connect_auth_cache_signals() 注册.
+相关配置（settings）：
+  AUTH_CACHE_TIMEOUT: 用户和权限的缓存时间（秒），默认 300
+  AUTH_NEGATIVE_CACHE_TIMEOUT: 不存在的用户名的缓存时间（秒），默认 30
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from hello_django.caching import get_cache
+
+# 负缓存的标记值，不能用 None（cache.get 未命中时也返回 None）
+_MISSING = '__missing__'
+_GROUPS_VERSION_KEY = 'auth:ver:groups'
+
+
+def _timeout() -> int:
+    return getattr(settings, 'AUTH_CACHE_TIMEOUT', 300)
+
+
+def _user_key(username: str) -> str:
+    return f"auth:user:{username}"
+
+
+def _user_version_key(user_id) -> str:
+    return f"auth:ver:user:{user_id}"
+
+
+def _bump(key: str):
+    cache = get_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 2, timeout=None)
+
+
+def get_cached_user(username: str):
+    """按 username 获取用户，不存在时返回 None"""
+    cache = get_cache()
+    key = _user_key(username)
+    user = cache.get(key)
+    if user == _MISSING:
+        return None
+    if user is not None:
+        return user
+    User = get_user_model()
+    try:
+        user = User.objects.get(**{User.USERNAME_FIELD: username})
+    except User.DoesNotExist:
+        cache.set(key, _MISSING, timeout=getattr(settings, 'AUTH_NEGATIVE_CACHE_TIMEOUT', 30))
+        return None
+    cache.set(key, user, timeout=_timeout())
+    return user
+
+
+def get_cached_permissions(user) -> set:
+    """返回用户的所有权限（'app_label.codename' 的集合），并设置到 user._perm_cache 上"""
+    if not user.is_active or user.is_anonymous:
+        return set()
+    if hasattr(user, '_perm_cache'):
+        return user._perm_cache
+    cache = get_cache()
+    version_keys = [_user_version_key(user.pk), _GROUPS_VERSION_KEY]
+    versions = cache.get_many(version_keys)
+    for key in version_keys:
+        if key not in versions:
+            cache.add(key, 1, timeout=None)
+            versions[key] = cache.get(key, 1)
+    key = f"auth:perms:{user.pk}:{versions[version_keys[0]]}:{versions[version_keys[1]]}"
+    perms = cache.get(key)
+    if perms is None:
+        # ModelBackend 会把结果缓存在 user._perm_cache 上，这里只需要把它存到缓存中
+        perms = set(user.get_all_permissions())
+        cache.set(key, perms, timeout=_timeout())
+    user._perm_cache = perms
+    return perms
+
+
+def invalidate_user(user):
+    get_cache().delete(_user_key(user.get_username()))
+    _bump(_user_version_key(user.pk))
+
+
+def _on_user_saved(sender, instance, **kwargs):
+    # 修改用户名时旧 username 的缓存会等到过期，期间旧用户名仍然能认证，这是可以接受的
+    invalidate_user(instance)
+
+
+def _on_user_m2m_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear', 'pre_clear'):
+        return
+    if not reverse:
+        # user.user_permissions.add(...) / user.groups.add(...)
+        if action != 'pre_clear':
+            _bump(_user_version_key(instance.pk))
+        return
+    # permission.user_set.add(...) / group.user_set.add(...)：pk_set 是用户 ID；clear() 时 post_clear 拿不到用户，在 pre_clear 里处理
+    if action == 'pre_clear':
+        user_ids = instance.user_set.values_list('pk', flat=True)
+    elif action == 'post_clear':
+        return
+    else:
+        user_ids = pk_set or ()
+    for user_id in user_ids:
+        _bump(_user_version_key(user_id))
+
+
+def _on_groups_changed(sender, **kwargs):
+    _bump(_GROUPS_VERSION_KEY)
+
+
+def _on_group_permissions_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        _bump(_GROUPS_VERSION_KEY)
+
+
+def connect_auth_cache_signals():
+    User = get_user_model()
+    post_save.connect(_on_user_saved, sender=User, dispatch_uid='auth-cache:user-save')
+    post_delete.connect(_on_user_saved, sender=User, dispatch_uid='auth-cache:user-delete')
+    m2m_changed.connect(_on_user_m2m_changed, sender=User.user_permissions.through,
+                        dispatch_uid='auth-cache:user-permissions')
+    m2m_changed.connect(_on_user_m2m_changed, sender=User.groups.through, dispatch_uid='auth-cache:user-groups')
+    m2m_changed.connect(_on_group_permissions_changed, sender=Group.permissions.through,
+                        dispatch_uid='auth-cache:group-permissions')
+    post_delete.connect(_on_groups_changed, sender=Group, dispatch_uid='auth-cache:group-delete')
+    post_delete.connect(_on_groups_changed, sender=Permission, dispatch_uid='auth-cache:permission-delete')
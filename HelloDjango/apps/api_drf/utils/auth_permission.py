@@ -1,11 +1,11 @@
 """
 自定义DRF的 权限控制类 和 基于Token的身份验证类
 """
-from django.contrib.auth.models import User
-from rest_framework.permissions import BasePermission, SAFE_METHODS
+from rest_framework.permissions import BasePermission, DjangoModelPermissions, SAFE_METHODS
 from rest_framework.authentication import BaseAuthentication
 from rest_framework.exceptions import AuthenticationFailed
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from .auth_cache import get_cached_user, get_cached_permissions
 
 # 自定义 权限控制类 需要继承 BasePermission 类
 # 然后根据需要重写 has_permission(self,request,view) 和 has_object_permission(self,request, view, obj) 方法
@@ -21,20 +21,42 @@ class IsOwnerOrReadOnly(BasePermission):
         # 写入权限只允许给 Draft 的作者
         return obj.author == request.user
 
+
+class CachedModelPermissions(DjangoModelPermissions):
+    """
+    和 DjangoModelPermissions 一样根据 Model 权限控制访问，区别在于：
+    + 用户的权限集合从缓存中读取（见 auth_cache.py），缓存命中时权限检查不查询数据库；
+    + GET/HEAD 请求也需要 view 权限（DjangoModelPermissions 对读请求不做检查）.
+    """
+    perms_map = {
+        **DjangoModelPermissions.perms_map,
+        'GET': ['%(app_label)s.view_%(model_name)s'],
+        'HEAD': ['%(app_label)s.view_%(model_name)s'],
+    }
+
+    def has_permission(self, request, view):
+        user = request.user
+        if user and user.is_authenticated:
+            get_cached_permissions(user)
+        return super().has_permission(request, view)
+
 # ---------------------------------------------------------------
 
 # 自定义 Token验证类 需要继承 BaseAuthentication 类，然后根据需要重写 .authenticate(self, request) 方法
 # + 验证成功，返回一个 (user, auth) 的二元组，然后DRF（不再是Django）会使用这个元组来设置 request.user 和 request.auth 属性
 # + 验证失败，返回None
+# 用户对象从缓存中读取，不存在的用户名也会缓存一段时间，缓存命中时认证过程不查询数据库，见 auth_cache.py
 class MyTokenAuthentication(BaseAuthentication):
     def authenticate(self, request):
-        username = request.META.get('X_USERNAME')
+        # 请求头 X-Username 在 META 中的 key 是 HTTP_X_USERNAME
+        username = request.META.get('HTTP_X_USERNAME') or request.META.get('X_USERNAME')
         if not username:
             return None
-        try:
-            user = User.objects.get(username=username)
-        except User.DoesNotExist:
+        user = get_cached_user(username)
+        if user is None:
             raise AuthenticationFailed('No such user')
+        if not user.is_active:
+            raise AuthenticationFailed('User inactive or deleted')
         # 验证成功，返回一个元祖
         return (user, None)
 
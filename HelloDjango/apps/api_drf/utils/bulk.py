@@ -0,0 +1,174 @@
+"""
+批量写入（创建 + 按自然键更新）的 ListSerializer.
+序列化器默认的 many=True 写入，ListSerializer.create() 会对每条数据调用一次 child.create()，即每行一条 INSERT，
+20 万行的全量同步需要 20 万次数据库往返；并且只要有一行校验失败，整批数据都会被拒绝.
+BulkUpsertListSerializer 的做法：
+  1. 逐行校验，校验失败的行记录到 row_errors 中（包含原始数据中的下标），其余的行继续写入；
+     自然键字段缺失或为 null 的行也记录为失败（序列化器中这些字段可能是 required=False/allow_null=True，但数据库列是 NOT NULL）；
+  2. 按自然键（比如 name + grade + grade_class）去重，同一批数据中重复的键以最后一行为准；
+  3. 按 chunk_size 分块，每块在一个事务中：先用一次查询找出已存在的记录，已存在的用 bulk_update 更新，其余的用 bulk_create 创建；
+     某一块写入失败时回滚这一块，再逐行重试这一块（每行一个事务），只把真正写入失败的行记录为失败；
+  4. bulk_create/bulk_update 不会发送 post_save 信号，写入后手动使视图缓存失效.
+使用方式，在子序列化器的 Meta 中设置：
+    class Meta:
+        model = Student
+        list_serializer_class = BulkUpsertListSerializer
+        natural_key = ('name', 'grade', 'grade_class')
+然后 serializer = StudentSerializer(data=rows, many=True); serializer.is_valid(); serializer.save(); serializer.report
+注意：表上没有自然键的唯一约束（同一个班级可以有同名的学生），"先查询再插入"不是原子的，
+两个请求并发写入同一个自然键时可能都判断为不存在而各插入一行；需要严格去重时应在数据库上加 UniqueConstraint 并串行化同步任务.
+"""
+from django.db import transaction, DatabaseError
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.utils.serializer_helpers import ReturnDict
+from hello_django.caching import bump_generation
+
+
+class BulkUpsertListSerializer(serializers.ListSerializer):
+    # 每个事务处理的行数
+    chunk_size = 2000
+    # bulk_create/bulk_update 每条 SQL 的行数
+    batch_size = 500
+    # 查询已存在记录时，每条 SQL 中 IN 列表的最大长度（旧版本 sqlite 限制 999 个参数）
+    lookup_size = 500
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.row_errors = []
+        self.report = None
+
+    @property
+    def model(self):
+        return self.child.Meta.model
+
+    @property
+    def natural_key(self) -> tuple:
+        return tuple(self.child.Meta.natural_key)
+
+    def to_internal_value(self, data):
+        """和 ListSerializer.to_internal_value 不同，某一行校验失败时不抛出异常，而是记录到 row_errors 中"""
+        if not isinstance(data, list):
+            message = self.error_messages['not_a_list'].format(input_type=type(data).__name__)
+            raise ValidationError({'non_field_errors': [message]}, code='not_a_list')
+        if not self.allow_empty and len(data) == 0:
+            raise ValidationError({'non_field_errors': [self.error_messages['empty']]}, code='empty')
+        if self.max_length is not None and len(data) > self.max_length:
+            message = self.error_messages['max_length'].format(max_length=self.max_length)
+            raise ValidationError({'non_field_errors': [message]}, code='max_length')
+        self.row_errors = []
+        result = []
+        for index, item in enumerate(data):
+            try:
+                validated = self.child.run_validation(item)
+            except ValidationError as exc:
+                self.row_errors.append({'index': index, 'errors': exc.detail})
+                continue
+            missing = {name: ['自然键字段不能为空.'] for name in self.natural_key if validated.get(name) is None}
+            if missing:
+                self.row_errors.append({'index': index, 'errors': missing})
+            else:
+                # 记录原始下标，写入失败时用于报告
+                result.append((index, validated))
+        return result
+
+    def _existing(self, keys: list[tuple]) -> dict:
+        """查询已存在的记录，返回 {自然键: 主键}；按第一个键字段做 IN 查询，再在 Python 中匹配完整的键"""
+        model = self.model
+        natural_key = self.natural_key
+        first_values = sorted({key[0] for key in keys}, key=str)
+        wanted = set(keys)
+        found = {}
+        for i in range(0, len(first_values), self.lookup_size):
+            part = first_values[i:i + self.lookup_size]
+            rows = model.objects.filter(**{f"{natural_key[0]}__in": part}) \
+                .values_list('pk', *natural_key).order_by()
+            for pk, *key in rows:
+                key = tuple(key)
+                if key in wanted:
+                    found[key] = pk
+        return found
+
+    def _write_chunk(self, rows: list) -> tuple[int, int]:
+        model = self.model
+        natural_key = self.natural_key
+        keys = [tuple(validated.get(name) for name in natural_key) for _, validated in rows]
+        with transaction.atomic():
+            existing = self._existing(keys)
+            to_create = []
+            # 只更新请求中提供了的字段：按字段集合分组，每组一次 bulk_update（通常所有行的字段都一样，只有一组）
+            to_update = {}
+            for key, (_, validated) in zip(keys, rows):
+                pk = existing.get(key)
+                if pk is None:
+                    to_create.append(model(**validated))
+                else:
+                    fields = tuple(sorted(name for name in validated if name not in natural_key))
+                    to_update.setdefault(fields, []).append(model(pk=pk, **validated))
+            if to_create:
+                model.objects.bulk_create(to_create, batch_size=self.batch_size)
+            for fields, objs in to_update.items():
+                if fields:
+                    model.objects.bulk_update(objs, fields, batch_size=self.batch_size)
+        return len(to_create), sum(len(objs) for objs in to_update.values())
+
+    def _write_rows(self, rows: list) -> tuple[int, int, list]:
+        """逐行写入（每行一个事务），返回 (创建数, 更新数, 失败的行)"""
+        created = updated = 0
+        errors = []
+        for row in rows:
+            try:
+                n_created, n_updated = self._write_chunk([row])
+            except DatabaseError as exc:
+                errors.append({'index': row[0], 'errors': {'non_field_errors': [str(exc)]}})
+                continue
+            created += n_created
+            updated += n_updated
+        return created, updated, errors
+
+    def save(self, **kwargs):
+        """validated_data 中每一项是 (原始下标, 校验后的数据)，不能使用 ListSerializer.save()"""
+        assert hasattr(self, '_errors'), 'You must call `.is_valid()` before calling `.save()`.'
+        assert not self.errors, 'You cannot call `.save()` on a serializer with invalid data.'
+        validated_data = [(index, {**attrs, **kwargs}) for index, attrs in self.validated_data]
+        self.instance = self.create(validated_data)
+        return self.instance
+
+    def create(self, validated_data):
+        natural_key = self.natural_key
+        # 同一批数据中自然键重复时，以最后一行为准
+        deduplicated = {}
+        for index, validated in validated_data:
+            deduplicated[tuple(validated.get(name) for name in natural_key)] = (index, validated)
+        rows = list(deduplicated.values())
+        created = updated = 0
+        write_errors = []
+        for i in range(0, len(rows), self.chunk_size):
+            chunk = rows[i:i + self.chunk_size]
+            try:
+                n_created, n_updated = self._write_chunk(chunk)
+            except DatabaseError:
+                # 整块回滚后逐行重试，找出写入失败的行，其余的行照常写入
+                n_created, n_updated, errors = self._write_rows(chunk)
+                write_errors.extend(errors)
+            created += n_created
+            updated += n_updated
+        if created or updated:
+            bump_generation(self.model)
+        errors = sorted(self.row_errors + write_errors, key=lambda e: e['index'])
+        self.report = {
+            'received': len(self.initial_data),
+            'created': created,
+            'updated': updated,
+            'duplicated': len(validated_data) - len(rows),
+            'failed': len(errors),
+            'errors': errors,
+        }
+        return []
+
+    @property
+    def data(self):
+        # 批量写入的响应是写入报告，不返回写入的数据
+        if self.report is not None:
+            return ReturnDict(self.report, serializer=self)
+        return super().data
@@ -0,0 +1,163 @@
+"""
+只读列表接口的"编译"序列化器.
+DRF 的 Serializer(many=True) 序列化时，每一行都要：构造 Model 实例 -> 遍历每个 Field 对象 -> get_attribute 沿 source 取值 ->
+to_representation 转换，列表接口的大部分耗时都在这里.
+CompiledReadSerializer 在第一次使用时分析序列化器的字段定义：
+  1. 把每个字段的 source 转换成 values_list() 的 lookup 路径（比如 source="author.id" -> "author__id"）；
+  2. 根据字段类型生成一个转换函数（比如 DateField(format='%Y-%m-%d') -> value.strftime('%Y-%m-%d')）.
+之后直接用 values_list() 查询，不构造 Model 实例，对每一行做一次 zip + 转换，输出的结构和原来的序列化器完全一致.
+序列化器里有 SerializerMethodField、嵌套序列化器、source='*' 等无法映射成列的字段时，编译会抛出 NotCompilable，调用方应回退到原来的序列化器.
+"""
+from django.db.models import QuerySet
+from rest_framework import serializers
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.fields import ISO_8601
+
+
+class NotCompilable(Exception):
+    pass
+
+
+def _date_converter(field):
+    output_format = getattr(field, 'format', api_settings.DATE_FORMAT)
+    if output_format is None:
+        return None
+    if output_format.lower() == ISO_8601:
+        return lambda value: value if isinstance(value, str) else value.isoformat()
+    return lambda value: value if isinstance(value, str) else value.strftime(output_format)
+
+
+def _field_converter(field):
+    """返回 value -> 输出值 的转换函数，None 表示原样输出；值为 None 时不会调用转换函数，和 Serializer.to_representation 一致"""
+    if isinstance(field, serializers.ReadOnlyField):
+        return None
+    if isinstance(field, serializers.PrimaryKeyRelatedField) and not getattr(field, 'many', False):
+        return None
+    if isinstance(field, serializers.IntegerField):
+        return int
+    if isinstance(field, serializers.FloatField):
+        return float
+    if isinstance(field, serializers.CharField):
+        return str
+    if isinstance(field, serializers.DateField):
+        return _date_converter(field)
+    if isinstance(field, (serializers.ChoiceField, serializers.BooleanField, serializers.DateTimeField,
+                          serializers.DecimalField, serializers.UUIDField, serializers.JSONField)) and \
+            not isinstance(field, serializers.MultipleChoiceField):
+        # 这些字段的 to_representation 只依赖 value 本身（DateTimeField 还要处理时区），直接复用，只省掉 get_attribute 的开销
+        return field.to_representation
+    raise NotCompilable(f"field type {type(field).__name__} is not supported")
+
+
+class CompiledReadSerializer:
+    """由序列化器类生成的只读序列化函数，只能用于 values_list() 可以表达的扁平结构"""
+
+    def __init__(self, serializer_class, model):
+        self.serializer_class = serializer_class
+        self.model = model
+        serializer = serializer_class()
+        self.keys = []
+        self.lookups = []
+        self.converters = []
+        for field_name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, (serializers.SerializerMethodField, serializers.BaseSerializer,
+                                  serializers.HiddenField)) or field.source == '*':
+                raise NotCompilable(f"field '{field_name}' can not be mapped to a column")
+            self.keys.append(field_name)
+            self.lookups.append(self._lookup(field))
+            self.converters.append(_field_converter(field))
+        # 没有转换函数的列在循环里直接跳过
+        self.convert_indexes = [i for i, c in enumerate(self.converters) if c is not None]
+
+    def _lookup(self, field) -> str:
+        """把 source_attrs 转换成 values_list 的 lookup，并检查每一段都是模型字段"""
+        attrs = list(field.source_attrs)
+        if isinstance(field, serializers.PrimaryKeyRelatedField):
+            attrs.append('pk')
+        model = self.model
+        for i, attr in enumerate(attrs):
+            if attr == 'pk':
+                if i != len(attrs) - 1:
+                    raise NotCompilable(f"unsupported source '{field.source}'")
+                break
+            try:
+                model_field = model._meta.get_field(attr)
+            except Exception:
+                raise NotCompilable(f"source '{field.source}' is not a model field")
+            if model_field.many_to_many or model_field.one_to_many:
+                raise NotCompilable(f"source '{field.source}' is a multi-valued relation")
+            if i < len(attrs) - 1:
+                if not model_field.is_relation:
+                    raise NotCompilable(f"unsupported source '{field.source}'")
+                model = model_field.related_model
+            elif model_field.is_relation:
+                raise NotCompilable(f"source '{field.source}' is a related object")
+        return '__'.join(attrs)
+
+    def values(self, queryset: QuerySet, named: bool = False) -> QuerySet:
+        """
+        返回只查询需要的列的 values_list 查询集.
+        :param named: 返回 namedtuple，游标分页需要通过 getattr 从每行中读取排序字段的值
+        """
+        return queryset.values_list(*self.lookups, named=named)
+
+    def render_rows(self, rows) -> list[dict]:
+        keys = self.keys
+        converters = self.converters
+        convert_indexes = self.convert_indexes
+        result = []
+        append = result.append
+        for row in rows:
+            if convert_indexes:
+                row = list(row)
+                for i in convert_indexes:
+                    value = row[i]
+                    if value is not None:
+                        row[i] = converters[i](value)
+            append(dict(zip(keys, row)))
+        return result
+
+    def serialize(self, queryset: QuerySet) -> list[dict]:
+        return self.render_rows(self.values(queryset))
+
+
+_compiled_cache = {}
+
+
+def compile_read_serializer(serializer_class, model) -> CompiledReadSerializer:
+    """编译结果按 (序列化器类, Model) 缓存，无法编译的也会记录下来，不会每次请求都重新分析"""
+    key = (serializer_class, model)
+    if key not in _compiled_cache:
+        try:
+            _compiled_cache[key] = CompiledReadSerializer(serializer_class, model)
+        except NotCompilable as e:
+            _compiled_cache[key] = e
+    compiled = _compiled_cache[key]
+    if isinstance(compiled, NotCompilable):
+        raise compiled
+    return compiled
+
+
+class CompiledListMixin:
+    """
+    ListModelMixin 的替代，compiled_read = True 时 list() 使用 CompiledReadSerializer，
+    序列化器无法编译时自动回退到原来的 list() 实现.
+    """
+    compiled_read = False
+
+    def list(self, request, *args, **kwargs):
+        if not self.compiled_read:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        try:
+            compiled = compile_read_serializer(self.get_serializer_class(), queryset.model)
+        except NotCompilable:
+            return super().list(request, *args, **kwargs)
+        rows = compiled.values(queryset, named=self.paginator is not None)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(compiled.render_rows(page))
+        return Response(compiled.render_rows(rows))
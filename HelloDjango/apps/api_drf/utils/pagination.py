@@ -0,0 +1,30 @@
+"""
+DRF 分页类.
+列表接口默认使用游标分页（CursorPagination）：
+  + 不需要 count(*) 查询总数，也没有 offset 越往后越慢的问题，翻页代价固定；
+  + 默认沿用 Model.Meta.ordering（接口返回的顺序不变，并且有对应的索引，见 models.py），末尾追加主键，
+    保证排序唯一、重复值之间的顺序稳定（游标只记录第一个排序字段的值，重复值之间靠偏移量定位）；
+    InnoDB 的二级索引末尾隐含主键（升序），所以追加的主键仍然可以按索引顺序读取；
+  + 没有 Meta.ordering（或者是表达式、跨表字段）的模型按主键倒序.
+"""
+from rest_framework.pagination import CursorPagination
+
+
+class PkCursorPagination(CursorPagination):
+    page_size = 100
+    # 允许客户端通过 ?page_size=xxx 调整每页条数，但不能超过 max_page_size
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+    def get_ordering(self, request, queryset, view):
+        ordering = getattr(view, 'cursor_ordering', None)
+        if ordering:
+            return (ordering,) if isinstance(ordering, str) else tuple(ordering)
+        model_ordering = queryset.model._meta.ordering
+        if model_ordering and all(isinstance(f, str) and f != '?' and '__' not in f for f in model_ordering):
+            ordering = tuple(model_ordering)
+            pk_names = {'pk', queryset.model._meta.pk.attname}
+            if not any(f.lstrip('-') in pk_names for f in ordering):
+                ordering += ('pk',)
+            return ordering
+        return ('-' + queryset.model._meta.pk.attname,)
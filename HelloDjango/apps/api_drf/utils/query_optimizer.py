@@ -0,0 +1,181 @@
+"""
+根据序列化器的定义自动优化视图的 QuerySet，避免 N+1 查询.
+DRF 序列化一条记录时，如果字段的 source 跨越了外键（比如 DraftSerializer.author 的 source="author.id"），
+或者 SerializerMethodField 的方法里访问了关联对象（比如 get_author_name 里的 obj.author.username），
+每条记录都会触发一次关联对象的查询，列表接口返回 N 条数据就会执行 N+1 次查询.
+这里的做法是：
+  1. 遍历序列化器的字段，从 source 路径中找出访问了哪些关联字段；
+  2. 对 SerializerMethodField，解析方法源码的 AST，找出 obj.xxx.yyy 这样的属性访问链；
+  3. 嵌套的序列化器字段递归处理；
+  4. 正向的 ForeignKey/OneToOne 使用 select_related，多对多和反向关联使用 prefetch_related；
+  5. 可选的，根据用到的字段生成 only()，只查询需要的列.
+分析结果按 (序列化器类, Model) 缓存，每个序列化器只分析一次.
+"""
+import ast
+import inspect
+import textwrap
+from django.db.models import QuerySet
+from rest_framework import serializers
+
+_plan_cache = {}
+
+
+class QueryPlan:
+    """对一个 Model 的查询优化方案"""
+
+    def __init__(self):
+        self.select_related = set()
+        self.prefetch_related = set()
+        # None 表示无法确定用到了哪些字段（比如序列化器里有 '*' source），不使用 only()
+        self.only = set()
+
+    def apply(self, queryset: QuerySet, use_only: bool = False) -> QuerySet:
+        if self.select_related:
+            queryset = queryset.select_related(*sorted(self.select_related))
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*sorted(self.prefetch_related))
+        if use_only and self.only is not None:
+            queryset = queryset.only(*sorted(self.only))
+        return queryset
+
+    def __repr__(self):
+        return f"QueryPlan(select_related={sorted(self.select_related)}, " \
+               f"prefetch_related={sorted(self.prefetch_related)}, only={self.only and sorted(self.only)})"
+
+
+def _method_attribute_chains(method) -> list[list[str]]:
+    """解析 SerializerMethodField 对应方法的源码，返回方法里对第二个参数（即 obj）的属性访问链，比如 [['author', 'username']]"""
+    try:
+        source = textwrap.dedent(inspect.getsource(method))
+        tree = ast.parse(source)
+    except (OSError, TypeError, SyntaxError):
+        return []
+    func = tree.body[0]
+    if not isinstance(func, (ast.FunctionDef, ast.AsyncFunctionDef)) or len(func.args.args) < 2:
+        return []
+    obj_name = func.args.args[1].arg
+    chains = []
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Attribute):
+            continue
+        chain = []
+        current = node
+        while isinstance(current, ast.Attribute):
+            chain.append(current.attr)
+            current = current.value
+        if isinstance(current, ast.Name) and current.id == obj_name:
+            chains.append(list(reversed(chain)))
+    # 只保留最长的链，比如 obj.author.username 会同时遍历到 obj.author 和 obj.author.username
+    chains.sort(key=len, reverse=True)
+    result = []
+    for chain in chains:
+        if not any(other[:len(chain)] == chain for other in result):
+            result.append(chain)
+    return result
+
+
+def _resolve_path(model, attrs: list[str], prefix: str, plan: QueryPlan, many: bool = False):
+    """
+    沿着 attrs 在 model 上解析关联关系，把需要的 select_related/prefetch_related/only 记录到 plan 中.
+    :param prefix: 当前 model 相对于查询根 model 的 lookup 路径，比如 'author__'
+    :param many: 路径上是否已经经过了多值关联，经过之后只能用 prefetch_related
+    """
+    if not attrs:
+        return
+    name, rest = attrs[0], attrs[1:]
+    try:
+        field = model._meta.get_field(name)
+    except Exception:
+        # 不是模型字段（比如 property 或方法），无法判断它访问了哪些列
+        if not many:
+            plan.only = None
+        return
+    if not field.is_relation:
+        if not many and plan.only is not None:
+            plan.only.add(prefix + field.attname)
+        return
+    lookup = prefix + name
+    if field.many_to_many or field.one_to_many or many:
+        plan.prefetch_related.add(lookup)
+        many = True
+    else:
+        # 正向 ForeignKey / OneToOne，以及反向 OneToOne
+        plan.select_related.add(lookup)
+        if plan.only is not None and field.concrete:
+            # only() 中必须包含外键列本身，否则 select_related 会报错
+            plan.only.add(prefix + field.attname)
+    if rest:
+        _resolve_path(field.related_model, rest, lookup + '__', plan, many)
+
+
+def _collect(serializer, model, prefix: str, plan: QueryPlan, many: bool = False):
+    for field_name, field in serializer.fields.items():
+        if isinstance(field, serializers.HiddenField) or field.write_only:
+            continue
+        if isinstance(field, serializers.SerializerMethodField):
+            method = getattr(serializer, field.method_name)
+            chains = _method_attribute_chains(method)
+            if not chains:
+                continue
+            for chain in chains:
+                _resolve_path(model, chain, prefix, plan, many)
+            continue
+        if field.source == '*':
+            plan.only = None
+            continue
+        attrs = field.source_attrs
+        # 嵌套序列化器，递归处理
+        child = field.child if isinstance(field, serializers.ListSerializer) else field
+        if isinstance(child, serializers.BaseSerializer):
+            _resolve_path(model, attrs, prefix, plan, many)
+            related = model
+            lookup = prefix
+            nested_many = many
+            for attr in attrs:
+                try:
+                    rel_field = related._meta.get_field(attr)
+                except Exception:
+                    related = None
+                    break
+                if not rel_field.is_relation:
+                    related = None
+                    break
+                nested_many = nested_many or rel_field.many_to_many or rel_field.one_to_many
+                related = rel_field.related_model
+                lookup = lookup + attr + '__'
+            if related is not None:
+                _collect(child, related, lookup, plan, nested_many)
+            continue
+        _resolve_path(model, attrs, prefix, plan, many)
+
+
+def build_query_plan(serializer_class, model) -> QueryPlan:
+    key = (serializer_class, model)
+    plan = _plan_cache.get(key)
+    if plan is None:
+        plan = QueryPlan()
+        _collect(serializer_class(), model, '', plan)
+        if plan.only is not None:
+            plan.only.add(model._meta.pk.attname)
+        _plan_cache[key] = plan
+    return plan
+
+
+def optimize_queryset(queryset: QuerySet, serializer_class, use_only: bool = False) -> QuerySet:
+    """根据序列化器用到的字段，给 queryset 加上 select_related/prefetch_related/only"""
+    plan = build_query_plan(serializer_class, queryset.model)
+    return plan.apply(queryset, use_only=use_only)
+
+
+class QueryOptimizedMixin:
+    """
+    GenericAPIView 的 Mixin，需要放在 GenericAPIView 之前继承，自动优化 get_queryset() 的结果.
+    optimize_only = True 时，GET 请求（只读）还会使用 only() 只查询需要的列；
+    写请求不使用 only()，避免 save() 时再去加载被延迟的字段.
+    """
+    optimize_only = False
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        use_only = self.optimize_only and self.request is not None and self.request.method == 'GET'
+        return optimize_queryset(queryset, self.get_serializer_class(), use_only=use_only)
@@ -0,0 +1,131 @@
+"""
+流式输出列表接口.
+ListModelMixin.list() 会先把整个 queryset 加载成 Model 实例列表，再把所有实例序列化成一个大列表，最后整体渲染成 JSON，
+数据量越大内存占用越高. 这里的做法是：
+  1. 使用 queryset.iterator(chunk_size) 从数据库游标中分块读取，不缓存整个结果集；
+  2. 每读到一块就序列化这一块（序列化器可以编译时使用 CompiledReadSerializer，否则使用原序列化器）；
+  3. 通过 StreamingHttpResponse 边序列化边输出 JSON 数组 或 NDJSON（每行一个 JSON 对象）.
+内存占用只和 chunk_size 有关，和总行数无关.
+async_streaming_list_response 是 ASGI 下的异步版本：使用 QuerySet.aiterator() 读取，慢客户端下载数据期间不占用 worker 线程.
+"""
+import json
+from itertools import islice
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+from .fast_serializer import compile_read_serializer, NotCompilable
+
+STREAM_FORMATS = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def _iter_chunks(iterator, chunk_size: int):
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_serialized_chunks(queryset, serializer_class, chunk_size: int = 2000, context: dict = None):
+    """分块读取并序列化 queryset，每次产出一块序列化后的 dict 列表"""
+    try:
+        compiled = compile_read_serializer(serializer_class, queryset.model)
+    except NotCompilable:
+        compiled = None
+    if compiled is not None:
+        rows = compiled.values(queryset).iterator(chunk_size=chunk_size)
+        for chunk in _iter_chunks(rows, chunk_size):
+            yield compiled.render_rows(chunk)
+    else:
+        instances = queryset.iterator(chunk_size=chunk_size)
+        for chunk in _iter_chunks(instances, chunk_size):
+            yield serializer_class(instance=chunk, many=True, context=context or {}).data
+
+
+async def aiter_serialized_chunks(queryset, compiled, chunk_size: int = 2000):
+    """
+    iter_serialized_chunks 的异步版本，只支持编译后的序列化器（序列化器访问关联对象会触发同步查询，不能在事件循环中执行）.
+    compiled 是 compile_read_serializer() 的返回值，由调用方在返回响应之前编译.
+    """
+    chunk = []
+    async for row in compiled.values(queryset).aiterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield compiled.render_rows(chunk)
+            chunk = []
+    if chunk:
+        yield compiled.render_rows(chunk)
+
+
+def iter_json_array(chunks):
+    encoder = JSONEncoder(ensure_ascii=False)
+    yield b'['
+    first = True
+    for chunk in chunks:
+        if not chunk:
+            continue
+        body = ','.join(encoder.encode(item) for item in chunk)
+        yield (body if first else ',' + body).encode('utf-8')
+        first = False
+    yield b']'
+
+
+def iter_ndjson(chunks):
+    encoder = JSONEncoder(ensure_ascii=False)
+    for chunk in chunks:
+        if chunk:
+            yield (''.join(encoder.encode(item) + '\n' for item in chunk)).encode('utf-8')
+
+
+def streaming_list_response(queryset, serializer_class, stream_format: str = 'json', chunk_size: int = 2000,
+                            context: dict = None) -> StreamingHttpResponse:
+    chunks = iter_serialized_chunks(queryset, serializer_class, chunk_size=chunk_size, context=context)
+    content = iter_ndjson(chunks) if stream_format == 'ndjson' else iter_json_array(chunks)
+    return StreamingHttpResponse(content, content_type=STREAM_FORMATS[stream_format])
+
+
+async def _aencode(chunks, stream_format: str):
+    encoder = JSONEncoder(ensure_ascii=False)
+    first = True
+    if stream_format == 'json':
+        yield b'['
+    async for chunk in chunks:
+        if not chunk:
+            continue
+        if stream_format == 'ndjson':
+            yield (''.join(encoder.encode(item) + '\n' for item in chunk)).encode('utf-8')
+        else:
+            body = ','.join(encoder.encode(item) for item in chunk)
+            yield (body if first else ',' + body).encode('utf-8')
+            first = False
+    if stream_format == 'json':
+        yield b']'
+
+
+def async_streaming_list_response(queryset, serializer_class, stream_format: str = 'json',
+                                  chunk_size: int = 2000) -> StreamingHttpResponse:
+    """在 async 视图中使用，序列化器无法编译时抛出 NotCompilable"""
+    # 在这里编译而不是在异步生成器中：生成器在发送响应头之后才开始执行，那时的异常只能中断连接，视图无法返回错误响应
+    compiled = compile_read_serializer(serializer_class, queryset.model)
+    chunks = aiter_serialized_chunks(queryset, compiled, chunk_size=chunk_size)
+    return StreamingHttpResponse(_aencode(chunks, stream_format), content_type=STREAM_FORMATS[stream_format])
+
+
+class StreamingListMixin:
+    """
+    放在 ListModelMixin 之前继承，请求带上 ?stream=json 或 ?stream=ndjson 时，list() 不分页，流式返回全部数据；
+    否则使用原来的 list()（默认是游标分页，见 pagination.py）.
+    注意 ?format= 已经被 DRF 用来选择渲染器，所以这里使用 stream 参数.
+    """
+    stream_query_param = 'stream'
+    stream_chunk_size = 2000
+
+    def list(self, request, *args, **kwargs):
+        stream_format = request.query_params.get(self.stream_query_param)
+        if stream_format not in STREAM_FORMATS:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        return streaming_list_response(queryset, self.get_serializer_class(), stream_format=stream_format,
+                                       chunk_size=self.stream_chunk_size, context=self.get_serializer_context())
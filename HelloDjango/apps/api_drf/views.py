@@ -18,7 +18,12 @@ from rest_framework.authentication import TokenAuthentication
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from .models import Student, Teacher, Draft
 from .serializers import StudentSerializer, TeacherSerializer, DraftSerializer
-from .custom_auth_permission import IsOwnerOrReadOnly
+from .utils.auth_permission import IsOwnerOrReadOnly, MyTokenAuthentication, CachedModelPermissions
+from .utils.query_optimizer import QueryOptimizedMixin
+from .utils.fast_serializer import CompiledListMixin, compile_read_serializer
+from .utils.pagination import PkCursorPagination
+from .utils.streaming import StreamingListMixin, streaming_list_response, STREAM_FORMATS
+from hello_django.caching import CachedViewMixin, cache_view
 
 # Create your views here.
 """
@@ -30,6 +35,8 @@ DRF对Django进行了如下的扩展：
 """
 
 # =============== 基于函数的视图 =================
+# 读接口的响应按 (URL, 认证信息, Student 的数据版本号) 缓存，Student 保存/删除时失效，见 hello_django/caching.py
+@cache_view(Student)
 @api_view(http_method_names=['GET'])
 # def get_student(request: Request, sid):
 def get_student(request: Request, sid, format=None):
@@ -43,13 +50,25 @@ def get_student(request: Request, sid, format=None):
     serializer = StudentSerializer(instance=student, many=True)
     return Response(data=serializer.data, status=status.HTTP_200_OK)
 
+@cache_view(Student)
 @api_view(http_method_names=['GET'])
 # def list_student(request: Request):
 def list_student(request: Request, format=None):
     print('list_student: ', request.method)
     students = Student.objects.all()
-    serializer = StudentSerializer(instance=students, many=True)
-    return Response(data=serializer.data, status=status.HTTP_200_OK)
+    # 带上 ?stream=json 或 ?stream=ndjson 时，不分页，分块读取并流式返回全部数据，内存占用和总行数无关
+    stream_format = request.query_params.get('stream')
+    if stream_format in STREAM_FORMATS:
+        return streaming_list_response(students, StudentSerializer, stream_format=stream_format)
+    # 列表接口只读，不需要为每行构造 Student 实例和走一遍序列化器的 Field 对象，
+    # 这里使用从 StudentSerializer 编译出的只读序列化器，直接用 values_list() 查询并输出，结果和下面注释的写法一致
+    # serializer = StudentSerializer(instance=students, many=True)
+    # return Response(data=serializer.data, status=status.HTTP_200_OK)
+    compiled = compile_read_serializer(StudentSerializer, Student)
+    # 函数视图没有 GenericAPIView 的分页支持，需要手动调用分页器，按 Meta.ordering 加上主键做游标分页
+    paginator = PkCursorPagination()
+    page = paginator.paginate_queryset(compiled.values(students, named=True), request)
+    return paginator.get_paginated_response(compiled.render_rows(page))
 
 @api_view(http_method_names=['POST'])
 def create_student(request: Request):
@@ -66,6 +85,28 @@ def create_student(request: Request):
     return Response(serializer.errors, status=400)
 
 
+def _bulk_upsert_response(serializer) -> Response:
+    """批量写入的响应：全部成功 200，部分失败 207（响应体中有每行的错误），全部失败 400"""
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    serializer.save()
+    report = serializer.data
+    if report['failed'] == 0:
+        code = status.HTTP_200_OK
+    elif report['created'] or report['updated']:
+        code = status.HTTP_207_MULTI_STATUS
+    else:
+        code = status.HTTP_400_BAD_REQUEST
+    return Response(report, status=code)
+
+
+@api_view(http_method_names=['POST'])
+def bulk_student(request: Request):
+    # 请求体是 Student 数据的列表，按 name + grade + grade_class 创建或更新，见 utils/bulk.py
+    # 上面的 create_student 每次只写入一条数据，批量同步时每行都是一次请求 + 一条 INSERT
+    return _bulk_upsert_response(StudentSerializer(data=request.data, many=True))
+
+
 # =============== 基于类的视图 =================
 # 使用 APIView
 class TeacherApiView(APIView):
@@ -93,12 +134,16 @@ class TeacherApiView(APIView):
         return Response(serializer.errors, status=400)
 
 
+# 下面的列表视图都默认使用游标分页（settings 里的 DEFAULT_PAGINATION_CLASS）；
+# 通过 StreamingListMixin，请求带上 ?stream=json 或 ?stream=ndjson 时，会不分页地流式返回全部数据，见 utils/streaming.py
+# 通过 CachedViewMixin，GET 请求的响应会按用户缓存，数据修改时失效，见 hello_django/caching.py
+
 # 上面的APIView里面，还是需要写一些重复代码，所以 DRF 封装了下面实现了基本CRUD的类供使用
 # 使用 GenericAPI类 和 Mixin类 减少代码
 # + GenericAPIView 继承于 APIView，封装了 QuerySet检查、序列化器检查、分页返回 的逻辑，需要我们提供 指定Model的QuerySet 和 对应的序列化类。
 # + get, post, put, delete 等方法后面的查询以及序列化/反序列化的过程，交由 mixins 中的 RetrieveModelMixin, ListModelMixin,
 #   CreateModelMixin 等工具类实现。
-class TeacherGenericView(GenericAPIView, RetrieveModelMixin, ListModelMixin, CreateModelMixin):
+class TeacherGenericView(CachedViewMixin, StreamingListMixin, QueryOptimizedMixin, GenericAPIView, RetrieveModelMixin, ListModelMixin, CreateModelMixin):
     # 下面这段注释会显示在DRF的接口测试页面上；
     # 并且POST方法还会提供一个表单填写框，比较方便。
     """
@@ -134,9 +179,20 @@ class TeacherGenericView(GenericAPIView, RetrieveModelMixin, ListModelMixin, Cre
         return self.create(request, *args, **kwargs)
 
 
+class TeacherBulkView(GenericAPIView):
+    """
+    批量创建/更新教师信息，请求体是 Teacher 数据的列表，按 name + grade + grade_class 判断是否已存在
+    """
+    queryset = Teacher.objects.all()
+    serializer_class = TeacherSerializer
+
+    def post(self, request, *args, **kwargs):
+        return _bulk_upsert_response(self.get_serializer(data=request.data, many=True))
+
+
 # 上面 GenericAPIView + xxxModelMixin 的方式，已经减少了不少重复代码，但是其实 DRF 还做了更进一步的封装，
 # 提供了一套常用的将 Mixin 类与 GenericAPI类已经组合好了的视图，开箱即用
-class TeacherCompositeView(ListCreateAPIView):
+class TeacherCompositeView(CachedViewMixin, StreamingListMixin, QueryOptimizedMixin, ListCreateAPIView):
     # ListCreateAPIView = GenericAPIView + ListModelMixin + CreateModelMixin，并且其中的 get, post 方法已经帮我们实现好了
     """
     使用 ListCreateAPIView 构建视图函数
@@ -154,10 +210,12 @@ class TeacherCompositeView(ListCreateAPIView):
 #  + ModelViewSet：一次性提供List、Create、Retrieve、Update、Destroy 这5种操作
 #  + ReadOnlyModelViewSet：只提供 List、Retrieve 这2种操作
 # 但是不太建议使用这个 ViewSet，因为封装的太深了，不好自定义  ----------------- KEY
-class TeacherViewSet(ReadOnlyModelViewSet):
+class TeacherViewSet(CachedViewMixin, StreamingListMixin, CompiledListMixin, QueryOptimizedMixin, ReadOnlyModelViewSet):
     """
     使用 ViewSet 构建视图函数
     """
+    # list 接口使用从 TeacherSerializer 编译出的只读序列化器，见 utils/fast_serializer.py
+    compiled_read = True
     # 设置查询结果集
     queryset = Teacher.objects.all()
     # 设置序列化的类
@@ -193,8 +251,12 @@ def create_draft_user(request, *args, **kwargs):
     return response
 
 
-class DraftOpenView(GenericAPIView, ListModelMixin, CreateModelMixin, DestroyModelMixin):
+# DraftSerializer 里 author(source="author.id") 和 get_author_name(obj.author.username) 都会访问外键 author，
+# 直接使用 Draft.objects.all() 时，列表接口每条记录都要再查一次 User 表（N+1 查询）.
+# QueryOptimizedMixin 会根据序列化器的字段自动给 queryset 加上 select_related('author')，见 utils/query_optimizer.py
+class DraftOpenView(CachedViewMixin, StreamingListMixin, QueryOptimizedMixin, GenericAPIView, ListModelMixin, CreateModelMixin, DestroyModelMixin):
     queryset = Draft.objects.all()
+    cache_models = [Draft, User]
     serializer_class = DraftSerializer
     lookup_field = 'nid'
 
@@ -233,8 +295,9 @@ class DraftOpenView(GenericAPIView, ListModelMixin, CreateModelMixin, DestroyMod
         instance.delete()
 
 
-class DraftAuthView(GenericAPIView, ListModelMixin, CreateModelMixin, DestroyModelMixin):
+class DraftAuthView(CachedViewMixin, StreamingListMixin, QueryOptimizedMixin, GenericAPIView, ListModelMixin, CreateModelMixin, DestroyModelMixin):
     queryset = Draft.objects.all()
+    cache_models = [Draft, User]
     serializer_class = DraftSerializer
     lookup_field = 'nid'
 
@@ -262,8 +325,9 @@ class DraftAuthView(GenericAPIView, ListModelMixin, CreateModelMixin, DestroyMod
         return self.destroy(request, *args, **kwargs)
 
 
-class DraftOwnerView(GenericAPIView, ListModelMixin, CreateModelMixin, DestroyModelMixin):
+class DraftOwnerView(CachedViewMixin, StreamingListMixin, QueryOptimizedMixin, GenericAPIView, ListModelMixin, CreateModelMixin, DestroyModelMixin):
     queryset = Draft.objects.all()
+    cache_models = [Draft, User]
     serializer_class = DraftSerializer
     lookup_field = 'nid'
 
@@ -280,6 +344,30 @@ class DraftOwnerView(GenericAPIView, ListModelMixin, CreateModelMixin, DestroyMo
         return self.destroy(request, *args, **kwargs)
 
 
+# 使用自定义的 Token 认证类 + 基于 Model 权限的权限类，用户和权限都从缓存读取，缓存命中时认证和鉴权过程不查询数据库
+class DraftPermView(CachedViewMixin, StreamingListMixin, QueryOptimizedMixin, GenericAPIView, ListModelMixin, CreateModelMixin, DestroyModelMixin):
+    queryset = Draft.objects.all()
+    cache_models = [Draft, User]
+    serializer_class = DraftSerializer
+    lookup_field = 'nid'
+
+    # 请求头 X-Username 指定用户；读写都需要 api_drf.xxx_draft 权限，见 create_draft_user
+    authentication_classes = [MyTokenAuthentication]
+    permission_classes = [CachedModelPermissions]
+
+    def get(self, request, *args, **kwargs):
+        return self.list(request, *args, **kwargs)
+
+    def post(self, request, *args, **kwargs):
+        return self.create(request, *args, **kwargs)
+
+    def delete(self, request, *args, **kwargs):
+        return self.destroy(request, *args, **kwargs)
+
+    def perform_create(self, serializer):
+        serializer.save(author=self.request.user)
+
+
 # 如果是视图函数，需要使用 permission_classes 装饰器来引入权限类
 @api_view(['GET'])
 @permission_classes((IsAuthenticated, ))
@@ -292,8 +380,9 @@ def draft_permission_view(request, format=None):
 
 # ================== DRF 基于Token的身份认证 ======================
 
-class DraftTokenView(ListCreateAPIView):
+class DraftTokenView(CachedViewMixin, StreamingListMixin, QueryOptimizedMixin, ListCreateAPIView):
     queryset = Draft.objects.all()
+    cache_models = [Draft, User]
     serializer_class = DraftSerializer
     lookup_field = 'nid'
 
@@ -324,8 +413,9 @@ def example_view(request, format=None):
 # 因此实际中，推荐使用下面的 JWT 扩展来做基于Token的身份验证
 
 # ------ 使用 rest_framework_simplejwt 提供的JWT验证--------
-class DraftJwtView(GenericAPIView, ListModelMixin, CreateModelMixin, DestroyModelMixin):
+class DraftJwtView(CachedViewMixin, StreamingListMixin, QueryOptimizedMixin, GenericAPIView, ListModelMixin, CreateModelMixin, DestroyModelMixin):
     queryset = Draft.objects.all()
+    cache_models = [Draft, User]
     serializer_class = DraftSerializer
     lookup_field = 'nid'
 
@@ -0,0 +1,30 @@
+"""
+ASGI 部署（HELLO_DJANGO_SERVER_MODE=asgi）下使用的 async 视图.
+DRF 的 APIView 不支持 async，这里使用 Django 原生的 async 视图，只实现 async 真正有收益的接口：
+  + 流式导出全部数据：数据量大、客户端下载慢时，同步视图在整个下载过程中占用一个 worker 线程，
+    async 视图在等待客户端时让出事件循环，一个 worker 进程可以同时服务很多导出请求.
+普通的分页读接口耗时主要在数据库查询和序列化上，Django 的 async ORM 实际上是在线程池里执行同步查询，改成 async 没有收益，继续使用 views.py.
+在 WSGI 下访问这些视图时，Django 会把异步迭代器一次性读到内存里再返回，失去流式的效果.
+"""
+from django.http import HttpRequest, HttpResponseNotAllowed, JsonResponse
+from .models import Student, Teacher
+from .serializers import StudentSerializer, TeacherSerializer
+from .utils.streaming import async_streaming_list_response, STREAM_FORMATS
+
+
+def _stream(request: HttpRequest, queryset, serializer_class):
+    # Django 4.2 的 require_GET 等装饰器不支持 async 视图（5.0 开始支持），这里手动检查
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    stream_format = request.GET.get('stream', 'ndjson')
+    if stream_format not in STREAM_FORMATS:
+        return JsonResponse({'detail': f"unsupported stream format '{stream_format}'"}, status=400)
+    return async_streaming_list_response(queryset, serializer_class, stream_format=stream_format)
+
+
+async def stream_student(request: HttpRequest):
+    return _stream(request, Student.objects.order_by('pk'), StudentSerializer)
+
+
+async def stream_teacher(request: HttpRequest):
+    return _stream(request, Teacher.objects.order_by('pk'), TeacherSerializer)
@@ -5,3 +5,9 @@ from django.apps import AppConfig
 class BlogConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.blog_app'
+
+    def ready(self):
+        # 文章保存/删除、标签变化时使文章相关的缓存失效，见 hello_django/caching.py
+        from hello_django.caching import connect_invalidation
+        from .models import Post
+        connect_invalidation(Post)
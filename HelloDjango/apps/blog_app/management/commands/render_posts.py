@@ -0,0 +1,68 @@
+"""
+批量渲染文章正文的 content_html.
+默认只渲染 content_hash 和正文不一致的文章（新导入的数据、修改了 RENDER_VERSION 之后），--all 时全部重新渲染.
+渲染在进程池中执行（markdown 渲染是纯 CPU 计算，多线程受 GIL 限制），结果按 chunk 用 bulk_update 写回，并写入片段缓存.
+用法： python manage.py render_posts [--all] [--workers N] [--chunk-size 500]
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from apps.blog_app.models import Post
+from apps.blog_app.rendering import content_hash, render_content, cache_rendered
+
+
+def _render(item: tuple) -> str:
+    # 进程池中执行的函数必须是模块级函数，才能被 pickle
+    content, is_md = item
+    return render_content(content, is_md)
+
+
+class Command(BaseCommand):
+    help = "Re-render Post.content_html for posts whose content changed, using a process pool"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='re-render every post, ignoring content_hash')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='number of worker processes, 1 renders in the current process')
+        parser.add_argument('--chunk-size', type=int, default=500, help='posts per query and bulk_update')
+
+    def handle(self, *args, **options):
+        force, workers, chunk_size = options['all'], options['workers'], options['chunk_size']
+        start = time.perf_counter()
+        scanned = rendered = 0
+        executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        try:
+            posts = Post.objects.only('id', 'content', 'is_md', 'content_hash').order_by('pk')
+            chunk = []
+            for post in posts.iterator(chunk_size=chunk_size):
+                scanned += 1
+                digest = content_hash(post.content, post.is_md)
+                if force or digest != post.content_hash:
+                    post.content_hash = digest
+                    chunk.append(post)
+                if len(chunk) >= chunk_size:
+                    rendered += self.render_chunk(chunk, executor)
+                    chunk = []
+            if chunk:
+                rendered += self.render_chunk(chunk, executor)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        self.stdout.write(self.style.SUCCESS(
+            f"scanned {scanned} posts, rendered {rendered} in {time.perf_counter() - start:.2f}s"))
+
+    def render_chunk(self, posts: list, executor) -> int:
+        items = [(post.content, post.is_md) for post in posts]
+        if executor is None:
+            results = map(_render, items)
+        else:
+            results = executor.map(_render, items, chunksize=16)
+        for post, html in zip(posts, results):
+            post.content_html = html
+        with transaction.atomic():
+            Post.objects.bulk_update(posts, ['content_html', 'content_hash'], batch_size=len(posts))
+        for post in posts:
+            cache_rendered(post.content_hash, post.content_html)
+        return len(posts)
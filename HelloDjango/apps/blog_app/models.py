@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from .rendering import content_hash, render_cached
 
 # Create your models here.
 
@@ -67,6 +68,8 @@ class Post(models.Model):
         db_table_comment = '博客文章'
         verbose_name = verbose_name_plural = "文章"
         # ordering = ['-id']
+        # 文章列表按状态过滤、按创建时间倒序，见 views.post_list
+        indexes = [models.Index(fields=['status', '-created_time'], name='blog_post_status_created_idx')]
 
     STATUS_NORMAL = 1
     STATUS_DELETE = 0
@@ -81,6 +84,8 @@ class Post(models.Model):
     desc = models.CharField(max_length=1024, blank=True, verbose_name="摘要")
     content = models.TextField(verbose_name="正文", help_text="正文必须为MarkDown格式")
     content_html = models.TextField(verbose_name="正文html代码", blank=True, editable=False)
+    # content_html 对应的正文 hash，见 rendering.content_hash，只有正文变化时才重新渲染
+    content_hash = models.CharField(max_length=40, blank=True, editable=False, verbose_name="正文hash")
     status = models.PositiveIntegerField(default=STATUS_NORMAL, choices=STATUS_ITEMS, verbose_name="状态")
     is_md = models.BooleanField(default=False, verbose_name="markdown语法")
     tag = models.ManyToManyField(Tag, verbose_name="标签")
@@ -88,8 +93,38 @@ class Post(models.Model):
     owner = models.ForeignKey(User, verbose_name="作者", on_delete=models.DO_NOTHING)
     created_time = models.DateTimeField(auto_now_add=True, verbose_name="创建时间")
 
+    # pv/uv 不要在视图里直接 +1 更新，使用 counters.view_counter.record() 在进程内累计后批量写回
     pv = models.PositiveIntegerField(default=1)
     uv = models.PositiveIntegerField(default=1)
 
     def __str__(self):
         return self.title
+
+    def render_content(self) -> bool:
+        """正文有变化时重新渲染 content_html，返回是否重新渲染"""
+        digest = content_hash(self.content, self.is_md)
+        if digest == self.content_hash and (self.content_html or not self.content):
+            return False
+        self.content_html = render_cached(self.content, self.is_md, digest=digest)
+        self.content_hash = digest
+        return True
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or {'content', 'is_md'} & set(update_fields):
+            if self.render_content() and update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'content_html', 'content_hash'}
+        super().save(*args, **kwargs)
+
+
+class PostVisitorSketch(models.Model):
+    """每篇文章访客的 HyperLogLog sketch，用于估算 Post.uv，见 counters.py"""
+
+    class Meta:
+        db_table = 'blog_post_visitor_sketch'
+        db_table_comment = '文章访客HyperLogLog'
+        verbose_name = verbose_name_plural = "文章访客统计"
+
+    post = models.OneToOneField(Post, on_delete=models.CASCADE, primary_key=True, related_name='visitor_sketch')
+    registers = models.BinaryField(default=b'', verbose_name="HLL寄存器")
+    updated_time = models.DateTimeField(auto_now=True, verbose_name="更新时间")
@@ -0,0 +1,78 @@
+"""
+Post 正文的渲染流水线.
+Markdown 渲染比较耗时，不能在每次请求时执行，这里的做法：
+  + Post.save() 时计算正文的 hash（content_hash），只有 hash 变化时才重新渲染 content_html，其他字段的修改不会触发渲染；
+  + 渲染结果按 hash 缓存到 Django 的 cache 中（片段缓存），内容相同的文章（比如回滚到旧版本、复制的文章）不会重复渲染；
+  + 批量重新渲染（比如升级了 markdown 扩展）使用 manage.py render_posts，在进程池中渲染.
+相关配置（settings）：
+  BLOG_MARKDOWN_EXTENSIONS: markdown 扩展列表
+  BLOG_RENDER_CACHE_ALIAS: 渲染结果使用的 cache 别名，默认 'default'
+  BLOG_RENDER_CACHE_TIMEOUT: 渲染结果的缓存时间（秒），默认 None，即永不过期（key 中包含内容 hash，不存在过期数据的问题）
+修改渲染规则（扩展、非 markdown 正文的处理方式）后需要增加 RENDER_VERSION，使所有 hash 失效.
+"""
+import hashlib
+import threading
+import markdown
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.html import escape, linebreaks
+
+RENDER_VERSION = 1
+DEFAULT_MARKDOWN_EXTENSIONS = ['extra', 'sane_lists', 'toc']
+
+_local = threading.local()
+
+
+def _markdown_extensions() -> list:
+    return getattr(settings, 'BLOG_MARKDOWN_EXTENSIONS', DEFAULT_MARKDOWN_EXTENSIONS)
+
+
+def _markdown_renderer() -> markdown.Markdown:
+    # 构造 Markdown 对象时需要加载扩展、构建处理器链，代价不小，每个线程复用一个实例（Markdown 实例不是线程安全的）
+    md = getattr(_local, 'md', None)
+    if md is None:
+        md = _local.md = markdown.Markdown(extensions=_markdown_extensions(), output_format='html')
+    return md
+
+
+def content_hash(content: str, is_md: bool) -> str:
+    """正文 + 渲染方式 + 渲染规则版本 的 sha1，作为是否需要重新渲染的依据，也作为缓存的 key"""
+    h = hashlib.sha1(f"v{RENDER_VERSION}:{int(bool(is_md))}:".encode('utf-8'))
+    h.update((content or '').encode('utf-8'))
+    return h.hexdigest()
+
+
+def render_content(content: str, is_md: bool) -> str:
+    """渲染正文，不使用缓存；markdown 正文转换成 html，普通正文转义后按段落/换行转换"""
+    if not content:
+        return ''
+    if not is_md:
+        return linebreaks(escape(content))
+    md = _markdown_renderer()
+    try:
+        return md.convert(content)
+    finally:
+        md.reset()
+
+
+def _cache():
+    return caches[getattr(settings, 'BLOG_RENDER_CACHE_ALIAS', 'default')]
+
+
+def _cache_key(digest: str) -> str:
+    return f"blog:content_html:{digest}"
+
+
+def cache_rendered(digest: str, html: str):
+    _cache().set(_cache_key(digest), html, timeout=getattr(settings, 'BLOG_RENDER_CACHE_TIMEOUT', None))
+
+
+def render_cached(content: str, is_md: bool, digest: str = None) -> str:
+    """先按内容 hash 查缓存，没有命中时渲染并写入缓存"""
+    digest = digest or content_hash(content, is_md)
+    cache = _cache()
+    html = cache.get(_cache_key(digest))
+    if html is None:
+        html = render_content(content, is_md)
+        cache_rendered(digest, html)
+    return html
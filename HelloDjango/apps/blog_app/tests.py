@@ -1,3 +1,113 @@
-from django.test import TestCase
+from unittest import mock
+from django.db import IntegrityError, OperationalError
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from hello_django.testing import QueryPlanAssertionsMixin
+from .models import Category, Post, PostVisitorSketch
+from .counters import ViewCounter
+from . import rendering
 
-# Create your tests here.
+
+class PostRenderTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='author', password='password')
+        self.category = Category.objects.create(name='python', owner=self.user)
+
+    def create_post(self, content: str, **kwargs) -> Post:
+        return Post.objects.create(title='title', content=content, is_md=True, category=self.category,
+                                   owner=self.user, **kwargs)
+
+    def test_render_on_save(self):
+        post = self.create_post('# Hello\n\n**world**')
+        self.assertIn('<strong>world</strong>', post.content_html)
+        self.assertEqual(post.content_hash, rendering.content_hash(post.content, True))
+        post.is_md = False
+        post.content = '<b>a</b>'
+        post.save()
+        self.assertEqual(post.content_html, '<p>&lt;b&gt;a&lt;/b&gt;</p>')
+
+    def test_unchanged_content_does_not_render(self):
+        post = self.create_post('# Hello')
+        with mock.patch.object(rendering, 'render_content') as render:
+            post.title = 'new title'
+            post.save()
+            post.save(update_fields=['title'])
+            # 内容相同的另一篇文章命中片段缓存
+            self.create_post('# Hello')
+            render.assert_not_called()
+        post.content = '# Changed'
+        post.save(update_fields=['content'])
+        post.refresh_from_db()
+        self.assertIn('Changed', post.content_html)
+
+    def test_render_posts_command(self):
+        post = self.create_post('*a*')
+        Post.objects.filter(pk=post.pk).update(content='*b*')
+        call_command('render_posts', workers=1, stdout=mock.MagicMock())
+        post.refresh_from_db()
+        self.assertEqual(post.content_html, '<p><em>b</em></p>')
+        self.assertEqual(post.content_hash, rendering.content_hash('*b*', True))
+
+
+@override_settings(BLOG_VIEW_COUNTER_FLUSH_INTERVAL=0)
+class ViewCounterTest(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='author', password='password')
+        category = Category.objects.create(name='python', owner=user)
+        # pv 的默认值是 1，从 0 开始计数便于断言
+        self.post = Post.objects.create(title='title', content='text', category=category, owner=user, pv=0)
+        self.counter = ViewCounter()
+
+    def test_flush(self):
+        for visitor in ('a', 'b', 'a'):
+            self.counter.record(self.post.pk, visitor)
+        self.assertEqual(self.counter.flush(), 3)
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.pv, self.post.uv), (3, 2))
+        self.assertEqual(self.counter.pending(), {})
+
+    def test_deleted_post_does_not_block_flush(self):
+        deleted = Post.objects.create(title='deleted', content='text', category=self.post.category,
+                                      owner=self.post.owner)
+        self.counter.record(deleted.pk, 'a')
+        self.counter.record(self.post.pk, 'a')
+        deleted.delete()
+        self.assertEqual(self.counter.flush(), 1)
+        self.assertEqual(self.counter.pending(), {})
+        self.assertFalse(PostVisitorSketch.objects.filter(post_id=deleted.pk).exists())
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.pv, self.post.uv), (1, 1))
+
+    def test_requeue_only_transient_errors(self):
+        self.counter.record(self.post.pk, 'a')
+        with mock.patch('apps.blog_app.counters.merge_visitor_sketch', side_effect=OperationalError('gone away')):
+            with self.assertRaises(OperationalError):
+                self.counter.flush()
+        self.assertEqual(self.counter.pending(), {self.post.pk: 1})
+        with mock.patch('apps.blog_app.counters.merge_visitor_sketch', side_effect=IntegrityError('fk')):
+            with self.assertRaises(IntegrityError):
+                self.counter.flush()
+        # 重试也不会成功的错误不放回去，之后的 flush 不受影响
+        self.assertEqual(self.counter.pending(), {})
+        self.counter.record(self.post.pk, 'b')
+        self.assertEqual(self.counter.flush(), 1)
+
+
+class PostQueryPlanTest(QueryPlanAssertionsMixin, TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='author', password='password')
+        category = Category.objects.create(name='python', owner=user)
+        Post.objects.bulk_create([
+            Post(title=f"post_{i}", content='text', category=category, owner=user,
+                 status=Post.STATUS_DRAFT if i % 5 == 0 else Post.STATUS_NORMAL)
+            for i in range(200)
+        ])
+
+    def test_post_list_uses_index(self):
+        with self.assertEfficientQueries():
+            response = self.client.get('/blogs/posts')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 20)
@@ -3,4 +3,7 @@ from . import views
 
 urlpatterns = [
     path("", views.index, name="index"),
+    path("posts", views.post_list, name="post_list"),
+    path("post/<int:post_id>", views.post_detail, name="post_detail"),
+    path("post/<int:post_id>/page", views.post_page, name="post_page"),
 ]
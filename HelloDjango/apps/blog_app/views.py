@@ -1,7 +1,11 @@
+from django.conf import settings
 from django.shortcuts import render
 from django.http import HttpRequest, HttpResponse, JsonResponse, Http404
 from django.views.decorators.http import require_http_methods
 from django.views import View
+from .models import Post
+from .counters import view_counter, visitor_id_for
+from hello_django.caching import get_cache, model_generations
 
 # Create your views here.
 
@@ -9,3 +13,49 @@ from django.views import View
 def index(request):
     return HttpResponse("Hello to Blog Application.")
 
+
+
+def _post_summary(post_id: int):
+    """文章摘要数据，按 Post 的数据版本号缓存，文章修改时失效；pv/uv 由计数器批量写回，不触发失效，最多滞后一个缓存周期"""
+    cache = get_cache()
+    key = f"blog:post:{model_generations([Post])[0]}:{post_id}"
+    data = cache.get(key)
+    if data is None:
+        post = Post.objects.filter(pk=post_id, status=Post.STATUS_NORMAL).only('id', 'title', 'desc', 'pv', 'uv').first()
+        # 不存在的文章也缓存起来（空字典），避免反复查询
+        data = {'id': post.pk, 'title': post.title, 'desc': post.desc, 'pv': post.pv, 'uv': post.uv} if post else {}
+        cache.set(key, data, timeout=settings.API_CACHE_TIMEOUT)
+    return data
+
+
+@require_http_methods(['GET'])
+def post_list(request: HttpRequest):
+    """最新发布的文章，使用 (status, -created_time) 索引，不需要排序"""
+    try:
+        limit = min(int(request.GET.get('limit', 20)), 100)
+    except ValueError:
+        limit = 20
+    posts = Post.objects.filter(status=Post.STATUS_NORMAL).order_by('-created_time') \
+        .values('id', 'title', 'desc', 'created_time')[:limit]
+    return JsonResponse(data={'results': list(posts)})
+
+
+@require_http_methods(['GET'])
+def post_detail(request: HttpRequest, post_id: int):
+    data = _post_summary(post_id)
+    if not data:
+        raise Http404(f"post {post_id} not found")
+    # 访问计数只在进程内累加，由后台线程批量写回，不在请求中更新 Post 表
+    view_counter.record(post_id, visitor_id_for(request))
+    return JsonResponse(data=data)
+
+
+@require_http_methods(['GET'])
+def post_page(request: HttpRequest, post_id: int):
+    # 正文 html 比较大，模板中按 content_hash 做片段缓存，见 templates/blog_app/post_page.html
+    post = Post.objects.filter(pk=post_id, status=Post.STATUS_NORMAL) \
+        .only('id', 'title', 'desc', 'content_hash', 'created_time').first()
+    if post is None:
+        raise Http404(f"post {post_id} not found")
+    view_counter.record(post.pk, visitor_id_for(request))
+    return render(request, 'blog_app/post_page.html', context={'post': post})
@@ -0,0 +1,27 @@
+"""
+gunicorn 配置，生产环境启动方式（在 HelloDjango 目录下）：
+  + WSGI: HELLO_DJANGO_PROFILE=prod gunicorn hello_django.wsgi:application
+  + ASGI: HELLO_DJANGO_PROFILE=prod HELLO_DJANGO_SERVER_MODE=asgi gunicorn hello_django.asgi:application
+gunicorn 会自动加载当前目录下的 gunicorn.conf.py.
+WSGI 模式使用 gthread worker：每个线程复用自己的数据库连接（settings.prod 里的 CONN_MAX_AGE），连接数 = workers * threads；
+ASGI 模式使用 uvicorn 的 worker（需要安装 uvicorn），async 视图在事件循环中执行，同步的 DRF 视图在线程池中执行，
+此时 settings.prod 会关闭持久连接.
+"""
+import os
+import multiprocessing
+
+mode = os.environ.get('HELLO_DJANGO_SERVER_MODE', 'wsgi')
+
+bind = os.environ.get('HELLO_DJANGO_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('HELLO_DJANGO_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+timeout = int(os.environ.get('HELLO_DJANGO_TIMEOUT', 30))
+keepalive = 5
+# worker 处理一定数量的请求后重启，避免内存泄漏累积；加上随机抖动，避免所有 worker 同时重启
+max_requests = 10000
+max_requests_jitter = 1000
+
+if mode == 'asgi':
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    worker_class = 'gthread'
+    threads = int(os.environ.get('HELLO_DJANGO_THREADS', 4))
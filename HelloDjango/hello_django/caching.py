@@ -0,0 +1,185 @@
+"""
+项目公共的缓存工具：基于"数据版本号"失效的视图缓存.
+Django 自带的 cache_page 只能按时间过期，数据修改后在过期前一直返回旧数据；按 URL 逐个删除缓存又很难找全所有受影响的 key.
+这里的做法：
+  + 每个 Model 在缓存中维护一个版本号（generation），Model 保存/删除时通过信号把版本号 +1，见 connect_invalidation()；
+  + 视图缓存的 key 中包含它依赖的所有 Model 的版本号，版本号变化后旧的 key 不会再被访问，等待自然过期即可；
+  + 缓存在 DRF 的认证、鉴权、限流（APIView.initial()）之后才查找，key 中包含认证结果（认证类 + 用户主键），即 vary-on-auth：
+    不同用户的响应分开缓存，没有通过认证/鉴权的请求不会拿到缓存的响应；
+    Token 被删除、JWT 过期时认证直接失败，不会继续命中之前的缓存.
+    认证过程本身的开销由认证类负责，比如 api_drf 的 MyTokenAuthentication 从缓存中读取用户，见 apps/api_drf/utils/auth_cache.py.
+注意：
+  + bulk_create()、bulk_update()、QuerySet.update()/delete() 不会发送信号，批量修改数据后需要手动调用 bump_generation(Model)；
+  + locmem 缓存是进程内的，多进程部署时一个进程中的失效对其他进程不可见，
+    这种情况下应使用 file 或 redis 缓存，见 settings.CACHES.
+相关配置（settings）：
+  API_CACHE_ENABLED: 是否启用视图缓存，默认 True
+  API_CACHE_TIMEOUT: 视图缓存的过期时间（秒），默认 60
+  API_CACHE_ALIAS: 使用的 cache 别名，默认 'default'
+"""
+import hashlib
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.http import HttpResponse
+
+# 会影响响应内容的请求头
+VARY_HEADERS = ('HTTP_ACCEPT', 'HTTP_ACCEPT_LANGUAGE')
+# 缓存响应时保留的响应头
+KEEP_HEADERS = ('Content-Type', 'Vary', 'Allow', 'Content-Language')
+
+
+def get_cache():
+    return caches[getattr(settings, 'API_CACHE_ALIAS', 'default')]
+
+
+def _generation_key(model) -> str:
+    return f"gen:{model._meta.label_lower}"
+
+
+def model_generations(models) -> list[int]:
+    """返回 models 当前的版本号，一次 get_many 查询"""
+    cache = get_cache()
+    keys = [_generation_key(m) for m in models]
+    values = cache.get_many(keys)
+    missing = {k: 1 for k in keys if k not in values}
+    if missing:
+        # 版本号永不过期；并发初始化时以先写入的为准
+        for key in missing:
+            cache.add(key, 1, timeout=None)
+        values.update(cache.get_many(list(missing)))
+    return [values.get(k, 1) for k in keys]
+
+
+def bump_generation(model):
+    """使 model 相关的所有视图缓存失效"""
+    cache = get_cache()
+    key = _generation_key(model)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # key 不存在（还没有被读取过，或者被淘汰了），写入一个新值即可
+        cache.set(key, 2, timeout=None)
+
+
+def _invalidate(sender, **kwargs):
+    bump_generation(sender)
+
+
+def _invalidate_m2m(sender, instance, action, model=None, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_generation(type(instance))
+        if model is not None:
+            bump_generation(model)
+
+
+def connect_invalidation(*models):
+    """Model 保存、删除、多对多关系变化时使缓存失效，在 AppConfig.ready() 中调用"""
+    for model in models:
+        uid = f"cache-invalidation:{model._meta.label_lower}"
+        post_save.connect(_invalidate, sender=model, dispatch_uid=uid + ':save', weak=False)
+        post_delete.connect(_invalidate, sender=model, dispatch_uid=uid + ':delete', weak=False)
+        for field in model._meta.many_to_many:
+            m2m_changed.connect(_invalidate_m2m, sender=field.remote_field.through,
+                                dispatch_uid=f"{uid}:m2m:{field.name}", weak=False)
+
+
+def _identity(request) -> str:
+    """认证之后的用户身份：认证类 + 用户主键，匿名用户为 anon"""
+    user = getattr(request, 'user', None)
+    authenticator = getattr(request, 'successful_authenticator', None)
+    if user is None or not user.is_authenticated:
+        return 'anon'
+    return f"{type(authenticator).__name__}:{user.pk}"
+
+
+def _cache_key(request, models) -> str:
+    generations = '.'.join(str(g) for g in model_generations(models))
+    meta = request.META
+    h = hashlib.sha1(request.get_full_path().encode('utf-8'))
+    for name in VARY_HEADERS:
+        h.update(b'\0' + meta.get(name, '').encode('utf-8'))
+    h.update(b'\0' + _identity(request).encode('utf-8'))
+    return f"view:{generations}:{h.hexdigest()}"
+
+
+def _load_response(key: str) -> HttpResponse | None:
+    cached = get_cache().get(key)
+    if cached is None:
+        return None
+    status, headers, content = cached
+    response = HttpResponse(content, status=status)
+    for name, value in headers:
+        response[name] = value
+    return response
+
+
+def _store_response(key: str, response, timeout: int = None):
+    if hasattr(response, 'render') and callable(response.render):
+        # DRF 的 Response 是延迟渲染的，需要先渲染才能拿到内容
+        response = response.render()
+    headers = [(name, response[name]) for name in KEEP_HEADERS if response.has_header(name)]
+    if timeout is None:
+        timeout = getattr(settings, 'API_CACHE_TIMEOUT', 60)
+    get_cache().set(key, (response.status_code, headers, response.content), timeout=timeout)
+
+
+class _CacheHit(Exception):
+    """在 initial() 中命中缓存时抛出，由 handle_exception() 返回缓存的响应，跳过视图方法"""
+
+    def __init__(self, response):
+        self.response = response
+
+
+class CachedViewMixin:
+    """
+    APIView 的缓存 Mixin，需要放在最前面继承.
+    GET/HEAD 请求按 (URL, 认证结果, 依赖 Model 的版本号) 缓存响应，只缓存 200 的非流式响应.
+    cache_models 默认为 queryset 的 Model，响应还依赖其他 Model 时（比如序列化器里访问了外键）需要一起列出.
+    """
+    cache_models = None
+    cache_timeout = None
+    _cache_key = None
+
+    def get_cache_models(self):
+        if self.cache_models is not None:
+            return self.cache_models
+        return [self.queryset.model]
+
+    def initial(self, request, *args, **kwargs):
+        # 认证、鉴权、限流失败时这里直接抛出异常，不会查找缓存
+        super().initial(request, *args, **kwargs)
+        if request.method not in ('GET', 'HEAD') or not getattr(settings, 'API_CACHE_ENABLED', True):
+            return
+        key = _cache_key(request, self.get_cache_models())
+        cached = _load_response(key)
+        if cached is not None:
+            raise _CacheHit(cached)
+        self._cache_key = key
+
+    def handle_exception(self, exc):
+        if isinstance(exc, _CacheHit):
+            return exc.response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if self._cache_key is not None and response.status_code == 200 and not response.streaming:
+            _store_response(self._cache_key, response, self.cache_timeout)
+        return response
+
+
+def cache_view(*models, timeout: int = None):
+    """
+    函数视图的缓存装饰器，放在 @api_view 外层.
+    @api_view 返回的是一个 APIView 子类的 as_view()，这里给这个类加上 CachedViewMixin，缓存同样在认证和鉴权之后查找.
+    """
+    def decorator(view_func):
+        view_class = getattr(view_func, 'cls', None)
+        if view_class is None:
+            raise TypeError(f"cache_view must be applied on top of @api_view, got {view_func!r}")
+        cached_class = type(view_class.__name__, (CachedViewMixin, view_class),
+                            {'cache_models': list(models), 'cache_timeout': timeout,
+                             '__module__': view_class.__module__, '__doc__': view_class.__doc__})
+        return cached_class.as_view(**view_func.initkwargs)
+    return decorator
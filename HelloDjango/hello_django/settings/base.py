@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.1/ref/settings/
 """
 # 这个基本配置文件来自于Django 自动生成的 setting.py 文件（本来存放于 hello_django 目录下的），这里为了方便隔离和切换多个环境的配置，改成了package
+import os
 from pathlib import Path
 from datetime import timedelta
 
@@ -43,14 +44,14 @@ INSTALLED_APPS = [
     'django.contrib.messages',         # 消息系统
     'django.contrib.staticfiles',      # 静态文件管理系统（无数据库表）
     # DRF框架提供的app，展示接口测试的文档
-    # 'rest_framework',
-    # 'rest_framework.authtoken',  # DRF提供的基于token身份认证应用，但是这个一般用的不多
+    'rest_framework',
+    'rest_framework.authtoken',  # DRF提供的基于token身份认证应用，但是这个一般用的不多
     # -----------------------------------
     # 项目管理app
     'hello_django',
     # ------ 具体应用 ------
     'apps.blog_app',
-    # 'apps.api_drf',     # 使用DRF开发的REST-API应用
+    'apps.api_drf',     # 使用DRF开发的REST-API应用
     # 'apps.api_ninjia',  # 使用Ninjia开发的REST-API应用
 ]
 # 中间件配置
@@ -119,11 +120,53 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/4.1/howto/static-files/
 STATIC_URL = '/static/'
 
+# 缓存配置，通过环境变量 HELLO_DJANGO_CACHE 选择缓存后端：
+#  + locmem: 进程内缓存（默认），多进程部署时各进程的缓存互相独立，缓存失效无法同步到其他进程
+#  + file: 文件缓存，同一台机器上的多个进程共享
+#  + redis: Redis（或兼容 Redis 协议的服务），需要安装 redis 包，地址通过 HELLO_DJANGO_REDIS_URL 设置
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+CACHE_PROFILES = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'hello-django',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('HELLO_DJANGO_CACHE_DIR', str(BASE_DIR / '.cache')),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('HELLO_DJANGO_REDIS_URL', 'redis://127.0.0.1:6379/1'),
+        'KEY_PREFIX': 'hello_django',
+    },
+}
+CACHES = {
+    'default': CACHE_PROFILES[os.environ.get('HELLO_DJANGO_CACHE', 'locmem')],
+}
+
+# 请求体的最大长度，默认 2.5MB；批量写入接口（api_drf/bulk_student 等）一次提交整个名单，需要调大
+DATA_UPLOAD_MAX_MEMORY_SIZE = 64 * 1024 * 1024
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
+# -------------------------------- 项目应用配置 --------------------------------
+# blog_app 文章 pv/uv 计数器批量写回数据库的间隔（秒），<= 0 表示不启动后台线程，见 apps/blog_app/counters.py
+BLOG_VIEW_COUNTER_FLUSH_INTERVAL = 10
+# blog_app 文章正文渲染使用的 markdown 扩展，修改后需要执行 manage.py render_posts --all，见 apps/blog_app/rendering.py
+BLOG_MARKDOWN_EXTENSIONS = ['extra', 'sane_lists', 'toc']
+# 读接口的视图缓存，数据修改时通过信号失效，见 hello_django/caching.py
+API_CACHE_ENABLED = True
+API_CACHE_TIMEOUT = 60
+# api_drf 认证类/权限类使用的用户和权限缓存，见 apps/api_drf/utils/auth_cache.py
+AUTH_CACHE_TIMEOUT = 300
+AUTH_NEGATIVE_CACHE_TIMEOUT = 30
+
+
 # -------------------------------- 第三方插件配置 --------------------------------
 # Django Rest-Framework模块的配置
 REST_FRAMEWORK = {
@@ -142,7 +185,10 @@ REST_FRAMEWORK = {
         # 'rest_framework.authentication.TokenAuthentication',  # DRF提供的Token认证类，用的不多
         # 更常见的一个选择是，使用 rest_framework_simplejwt 提供的 JWT 身份验证类
         # 'rest_framework_simplejwt.authentication.JWTAuthentication',
-    )
+    ),
+    # 列表接口默认使用游标分页：按 Model 的 Meta.ordering 排序，并追加主键保证顺序唯一（没有 ordering 时只按主键），不查询总数，翻页代价固定
+    'DEFAULT_PAGINATION_CLASS': 'apps.api_drf.utils.pagination.PkCursorPagination',
+    'PAGE_SIZE': 100,
 }
 # rest_framework_simplejwt 的配置
 SIMPLE_JWT = {
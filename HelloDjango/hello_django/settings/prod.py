@@ -1,14 +1,68 @@
+import os
 from .base import *     # NOQA
 
 
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = False
 
+# 部署方式：wsgi（gunicorn sync/gthread worker）或 asgi（uvicorn worker），见 HelloDjango/gunicorn.conf.py
+SERVER_MODE = os.environ.get('HELLO_DJANGO_SERVER_MODE', 'wsgi')
+
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# 数据库连接配置：
+#  + CONN_MAX_AGE: 连接的最大存活时间（秒），默认 0 表示每个请求结束时关闭连接，下一个请求重新建立连接（MySQL 需要 TCP 握手 + 认证）；
+#    大于 0 时连接在同一个线程的多个请求之间复用，None 表示永久复用.
+#    ASGI 模式下每个请求的 ORM 调用可能在不同的线程中执行，持久连接会随线程数增长并且无法及时回收，Django 文档建议关闭，
+#    需要连接复用时使用数据库自带的连接池（比如 pgbouncer）；
+#  + CONN_HEALTH_CHECKS: 复用连接前先检查连接是否可用（只在每个请求第一次使用连接时检查），避免数据库重启或
+#    wait_timeout 断开连接后，请求拿到一个失效的连接报错；
+#  + DISABLE_SERVER_SIDE_CURSORS: PostgreSQL 下 QuerySet.iterator() 默认使用服务端游标分块读取（流式接口依赖这一点），
+#    如果前面有事务级的连接池（pgbouncer transaction pooling），服务端游标不可用，需要设置为 True.
+DB_ENGINE = os.environ.get('HELLO_DJANGO_DB_ENGINE', 'sqlite')
+CONN_MAX_AGE = 0 if SERVER_MODE == 'asgi' else int(os.environ.get('HELLO_DJANGO_CONN_MAX_AGE', 600))
+
+if DB_ENGINE == 'mysql':
+    # gunicorn 直接加载 wsgi/asgi 模块，不经过 manage.py，这里也需要把 pymysql 注册成 MySQLdb
+    import pymysql
+    pymysql.install_as_MySQLdb()
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.mysql',
+            'NAME': os.environ.get('HELLO_DJANGO_DB_NAME', 'hello_django'),
+            'USER': os.environ.get('HELLO_DJANGO_DB_USER', 'root'),
+            'PASSWORD': os.environ.get('HELLO_DJANGO_DB_PASSWORD', ''),
+            'HOST': os.environ.get('HELLO_DJANGO_DB_HOST', 'localhost'),
+            'PORT': int(os.environ.get('HELLO_DJANGO_DB_PORT', 3306)),
+            'CONN_MAX_AGE': CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {'charset': 'utf8mb4', 'connect_timeout': 5},
+        }
+    }
+elif DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('HELLO_DJANGO_DB_NAME', 'hello_django'),
+            'USER': os.environ.get('HELLO_DJANGO_DB_USER', 'postgres'),
+            'PASSWORD': os.environ.get('HELLO_DJANGO_DB_PASSWORD', ''),
+            'HOST': os.environ.get('HELLO_DJANGO_DB_HOST', 'localhost'),
+            'PORT': int(os.environ.get('HELLO_DJANGO_DB_PORT', 5432)),
+            'CONN_MAX_AGE': CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('HELLO_DJANGO_DISABLE_SERVER_CURSORS', '0') == '1',
+            'OPTIONS': {'connect_timeout': 5},
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            # sqlite 建立连接的代价很小，但复用连接可以保留页缓存
+            'CONN_MAX_AGE': CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            # 多个进程/线程同时写入时，等待锁的时间（秒）
+            'OPTIONS': {'timeout': 20},
+        }
     }
-}
\ No newline at end of file
@@ -0,0 +1,65 @@
+"""
+测试工具：检查查询的执行计划（只支持 SQLite）.
+执行被测代码时记录所有 SELECT 语句，再对每条语句执行 EXPLAIN QUERY PLAN，发现以下问题时测试失败：
+  + USE TEMP B-TREE FOR ORDER BY/GROUP BY/DISTINCT: 没有可用的索引，需要在数据库中排序；
+  + 带 WHERE 条件的语句出现 SCAN 表（没有 USING INDEX）：过滤条件没有可用的索引，需要扫描全表.
+    不带 WHERE 的 SCAN 是按主键/索引顺序读取（比如游标分页的第一页、流式导出全部数据），不算问题.
+用法：
+    class MyTest(QueryPlanAssertionsMixin, TestCase):
+        def test_xxx(self):
+            with self.assertEfficientQueries():
+                self.client.get('/api_drf/list_student')
+"""
+import re
+from contextlib import contextmanager
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+_SORT = re.compile(r'USE TEMP B-TREE FOR (ORDER BY|GROUP BY|DISTINCT|RIGHT PART OF ORDER BY)')
+# SQLite 3.36 之前的格式为 "SCAN TABLE xxx"，之后为 "SCAN xxx"
+_SCAN = re.compile(r'^SCAN (?:TABLE )?(\S+)(.*)$')
+_WHERE = re.compile(r'\bWHERE\b', re.IGNORECASE)
+
+
+def explain(sql: str, using=None) -> list[str]:
+    """返回 SQLite EXPLAIN QUERY PLAN 的每一行的描述"""
+    conn = using or connection
+    with conn.cursor() as cursor:
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def plan_problems(sql: str, plan: list[str]) -> list[str]:
+    problems = []
+    has_where = bool(_WHERE.search(sql))
+    for detail in plan:
+        if _SORT.search(detail):
+            problems.append(f"sort without index: {detail}")
+            continue
+        match = _SCAN.match(detail)
+        if match and 'USING' not in match.group(2) and has_where:
+            problems.append(f"full table scan with filter: {detail}")
+    return problems
+
+
+class QueryPlanAssertionsMixin:
+    """TestCase 的 Mixin，提供执行计划相关的断言"""
+
+    @contextmanager
+    def assertEfficientQueries(self, using=None):
+        conn = using or connection
+        if conn.vendor != 'sqlite':
+            self.skipTest('query plan checks only support sqlite')
+        with CaptureQueriesContext(conn) as ctx:
+            yield ctx
+        failures = []
+        for query in ctx.captured_queries:
+            sql = query['sql']
+            if not sql.lstrip().upper().startswith('SELECT'):
+                continue
+            plan = explain(sql, conn)
+            problems = plan_problems(sql, plan)
+            if problems:
+                failures.append(f"{sql}\n  plan: {plan}\n  " + '\n  '.join(problems))
+        if failures:
+            self.fail("inefficient queries:\n" + '\n'.join(failures))
@@ -75,5 +75,5 @@ urlpatterns = [
     path('hello_json/', hello_json),
     path('hello_json_v2/', hello_json_v2),
     path('blogs/', include('apps.blog_app.urls_blog')),
-    # path('api_drf/', include('apps.api_drf.urls_drf')),  # 使用 include 引入 api_drf 应用下的路由映射
+    path('api_drf/', include('apps.api_drf.urls_drf')),  # 使用 include 引入 api_drf 应用下的路由映射
 ]
@@ -0,0 +1,55 @@
+"""
+对比逐行写入（StudentSerializer.save()，即 create_student 的写法）和批量 upsert（bulk_student 的写法）的耗时.
+逐行写入很慢，只写入前 per_row_limit 行，再按比例估算全部行数的耗时.
+批量写入执行两次：第一次全部是新数据（bulk_create），第二次全部是已存在的数据（bulk_update）.
+用法（在 HelloDjango 目录下）： python -m scripts.bench_bulk_upsert [行数，默认200000] [逐行写入的行数，默认5000]
+"""
+import sys
+import time
+from scripts.bench_utils import setup_django, bench_database
+
+setup_django()
+
+from apps.api_drf.models import Student
+from apps.api_drf.serializers import StudentSerializer
+
+
+def make_rows(count: int, gender: str = 'male') -> list[dict]:
+    return [{'name': f"student_{i}", 'gender': gender, 'grade': str(i % 12 + 1), 'grade_class': str(i % 20 + 1)}
+            for i in range(count)]
+
+
+def per_row(rows: list[dict]) -> float:
+    start = time.perf_counter()
+    for row in rows:
+        serializer = StudentSerializer(data=row)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+    return time.perf_counter() - start
+
+
+def bulk(rows: list[dict]) -> tuple[float, dict]:
+    start = time.perf_counter()
+    serializer = StudentSerializer(data=rows, many=True)
+    serializer.is_valid(raise_exception=True)
+    serializer.save()
+    return time.perf_counter() - start, serializer.report
+
+
+if __name__ == '__main__':
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    per_row_limit = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    with bench_database():
+        sample = make_rows(min(per_row_limit, total))
+        elapsed = per_row(sample)
+        estimated = elapsed / len(sample) * total
+        print(f"per-row save   : {len(sample):>8} rows in {elapsed:7.2f} s | estimated for {total} rows: {estimated:8.1f} s")
+        Student.objects.all().delete()
+
+        rows = make_rows(total)
+        elapsed, report = bulk(rows)
+        print(f"bulk (create)  : {total:>8} rows in {elapsed:7.2f} s | x{estimated / elapsed:6.1f} | "
+              f"created={report['created']} updated={report['updated']} failed={report['failed']}")
+        elapsed, report = bulk(make_rows(total, gender='female'))
+        print(f"bulk (update)  : {total:>8} rows in {elapsed:7.2f} s | x{estimated / elapsed:6.1f} | "
+              f"created={report['created']} updated={report['updated']} failed={report['failed']}")
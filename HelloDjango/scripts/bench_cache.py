@@ -0,0 +1,57 @@
+"""
+对比读接口开启/关闭视图缓存时的吞吐量.
+使用 django.test.Client 走完整的中间件 + 视图流程（不经过网络），分别请求若干读接口 N 次，统计每秒请求数.
+用法（在 HelloDjango 目录下）： python -m scripts.bench_cache [每个接口的请求次数，默认500]
+可以通过 HELLO_DJANGO_CACHE=file/redis 对比不同的缓存后端.
+"""
+import sys
+import time
+from scripts.bench_utils import setup_django, bench_database
+
+setup_django()
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, override_settings
+from apps.api_drf.models import Student, Teacher, Draft
+
+ENDPOINTS = [
+    '/api_drf/list_student',
+    '/api_drf/teacher/viewset/',
+    '/api_drf/teacher/compositeviews',
+    '/api_drf/draft/auth/0',
+]
+
+
+def seed(rows: int):
+    users = [get_user_model().objects.create_user(username=f"user_{i}", password='password') for i in range(10)]
+    Student.objects.bulk_create([
+        Student(name=f"student_{i}", gender='male', grade='1', grade_class='1') for i in range(rows)
+    ])
+    Teacher.objects.bulk_create([
+        Teacher(name=f"teacher_{i}", gender='female', subject='math', grade='1', grade_class='1') for i in range(rows)
+    ])
+    Draft.objects.bulk_create([Draft(author=users[i % len(users)], content=f"draft_{i}") for i in range(rows)])
+
+
+def run(url: str, requests: int) -> float:
+    client = Client(HTTP_ACCEPT='application/json')
+    start = time.perf_counter()
+    for _ in range(requests):
+        response = client.get(url)
+        assert response.status_code == 200, (url, response.status_code)
+    return requests / (time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    with bench_database():
+        seed(1000)
+        print(f"cache backend: {cache.__class__.__name__}")
+        for url in ENDPOINTS:
+            with override_settings(API_CACHE_ENABLED=False):
+                uncached = run(url, requests)
+            cache.clear()
+            cached = run(url, requests)
+            print(f"{url:<34} | uncached: {uncached:9.1f} req/s | cached: {cached:9.1f} req/s "
+                  f"| x{cached / uncached:5.1f}")
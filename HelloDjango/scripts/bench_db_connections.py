@@ -0,0 +1,60 @@
+"""
+对比 CONN_MAX_AGE=0（每个请求重新建立数据库连接）和持久连接下的请求延迟.
+使用 django.test.Client 依次请求同一个接口，统计 p50/p90/p99 延迟.
+真实部署时 Django 在 request_started/request_finished 信号中调用 close_old_connections()，根据 CONN_MAX_AGE 决定是否关闭连接；
+但 django.test.Client 处理请求时会临时断开这两个信号上的 close_old_connections，连接永远不会被关闭，
+所以这里在每个请求前后手动调用一次（计入延迟），模拟真实部署的行为.
+sqlite 建立连接几乎没有代价，差异主要体现在 MySQL/PostgreSQL 上：
+    HELLO_DJANGO_DB_ENGINE=mysql HELLO_DJANGO_DB_PASSWORD=xxx python -m scripts.bench_db_connections
+用法（在 HelloDjango 目录下）： python -m scripts.bench_db_connections [请求次数，默认1000]
+"""
+import sys
+import time
+from scripts.bench_utils import setup_django, bench_database
+
+setup_django()
+
+from django.db import connection, close_old_connections
+from django.test import Client, override_settings
+from apps.api_drf.models import Teacher
+
+URL = '/api_drf/teacher/viewset/'
+
+
+def percentile(values: list, q: float) -> float:
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+
+def run(conn_max_age, requests: int) -> list[float]:
+    # CONN_MAX_AGE 在建立连接时读取，切换前先关闭当前连接
+    connection.close()
+    connection.settings_dict['CONN_MAX_AGE'] = conn_max_age
+    client = Client(HTTP_ACCEPT='application/json')
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        close_old_connections()
+        response = client.get(URL)
+        close_old_connections()
+        latencies.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200
+    latencies.sort()
+    return latencies
+
+
+if __name__ == '__main__':
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    test_settings = connection.settings_dict.setdefault('TEST', {})
+    if connection.vendor == 'sqlite' and not test_settings.get('NAME'):
+        # sqlite 的测试库默认在内存中，Django 不会关闭内存库的连接，改用文件库
+        test_settings['NAME'] = 'bench_db_connections.sqlite3'
+    with bench_database(), override_settings(API_CACHE_ENABLED=False):
+        Teacher.objects.bulk_create([
+            Teacher(name=f"teacher_{i}", gender='female', subject='math', grade='1', grade_class='1') for i in range(100)
+        ])
+        print(f"database: {connection.vendor}, {requests} requests to {URL}")
+        for label, max_age in (('CONN_MAX_AGE=0', 0), ('CONN_MAX_AGE=600', 600)):
+            run(max_age, 20)  # 预热
+            latencies = run(max_age, requests)
+            print(f"{label:<18} | avg: {sum(latencies) / len(latencies):7.2f} ms | p50: {percentile(latencies, 0.5):7.2f} ms "
+                  f"| p90: {percentile(latencies, 0.9):7.2f} ms | p99: {percentile(latencies, 0.99):7.2f} ms")
@@ -0,0 +1,42 @@
+"""
+对比 10k 行数据下，Student/Teacher 列表接口使用 原始序列化器 和 编译后的只读序列化器 的耗时与内存.
+用法（在 HelloDjango 目录下）： python -m scripts.bench_read_serializer [行数，默认10000]
+"""
+import sys
+from scripts.bench_utils import setup_django, bench_database, measure
+
+setup_django()
+
+from apps.api_drf.models import Student, Teacher
+from apps.api_drf.serializers import StudentSerializer, TeacherSerializer
+from apps.api_drf.utils.fast_serializer import compile_read_serializer
+
+
+def seed(rows: int):
+    Student.objects.bulk_create([
+        Student(name=f"student_{i}", gender='male', grade=str(i % 6), grade_class=str(i % 10)) for i in range(rows)
+    ], batch_size=2000)
+    Teacher.objects.bulk_create([
+        Teacher(name=f"teacher_{i}", gender='female', subject='math', grade=str(i % 6), grade_class=str(i % 10))
+        for i in range(rows)
+    ], batch_size=2000)
+
+
+def serializer_path(serializer_class, model):
+    return serializer_class(instance=model.objects.all(), many=True).data
+
+
+def compiled_path(serializer_class, model):
+    return compile_read_serializer(serializer_class, model).serialize(model.objects.all())
+
+
+if __name__ == '__main__':
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    with bench_database():
+        seed(rows)
+        for serializer_class, model in [(StudentSerializer, Student), (TeacherSerializer, Teacher)]:
+            expected, t1, m1 = measure(serializer_path, serializer_class, model)
+            actual, t2, m2 = measure(compiled_path, serializer_class, model)
+            assert [dict(r) for r in expected] == actual, f"{serializer_class.__name__}: output differs"
+            print(f"{serializer_class.__name__:<18} rows: {rows} | serializer: {t1 * 1000:8.1f} ms, {m1:7.1f} MB "
+                  f"| compiled: {t2 * 1000:8.1f} ms, {m2:7.1f} MB | speedup: {t1 / t2:5.2f}x")
@@ -0,0 +1,57 @@
+"""
+验证流式列表接口的内存占用与总行数无关：分别在不同数据量下请求 list_student?stream=ndjson，统计峰值内存；
+并和一次性序列化整个 queryset（原来的无分页写法）做对比.
+用法（在 HelloDjango 目录下）： python -m scripts.bench_streaming [最大行数，默认1000000]
+"""
+import sys
+from scripts.bench_utils import setup_django, bench_database, measure
+
+setup_django()
+
+from rest_framework.test import APIRequestFactory
+from apps.api_drf.models import Student
+from apps.api_drf.serializers import StudentSerializer
+from apps.api_drf.views import list_student
+
+factory = APIRequestFactory()
+
+
+def seed_to(total: int):
+    current = Student.objects.count()
+    batch = 10000
+    while current < total:
+        size = min(batch, total - current)
+        Student.objects.bulk_create([
+            Student(name=f"student_{current + i}", gender='male', grade='1', grade_class='1') for i in range(size)
+        ])
+        current += size
+
+
+def consume_stream(stream_format: str) -> int:
+    response = list_student(factory.get(f'/api_drf/list_student?stream={stream_format}'))
+    size = 0
+    for part in response.streaming_content:
+        size += len(part)
+    return size
+
+
+def materialize() -> int:
+    # 原来 list_student 的写法：整个 queryset + 整个序列化结果都在内存里
+    data = StudentSerializer(instance=Student.objects.all(), many=True).data
+    return len(data)
+
+
+if __name__ == '__main__':
+    max_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    sizes = [n for n in (10_000, 100_000, max_rows) if n <= max_rows]
+    with bench_database():
+        for rows in sizes:
+            seed_to(rows)
+            for fmt in ('json', 'ndjson'):
+                nbytes, t, mem = measure(consume_stream, fmt)
+                print(f"rows: {rows:>8} | stream={fmt:<6} | {nbytes / 1024 / 1024:8.1f} MB output "
+                      f"| time: {t:6.2f} s | peak memory: {mem:7.1f} MB")
+            if rows <= 100_000:
+                # 一次性序列化在大数据量下内存会非常高，只在较小数据量下对比
+                _, t, mem = measure(materialize)
+                print(f"rows: {rows:>8} | materialized  | time: {t:6.2f} s | peak memory: {mem:7.1f} MB")
@@ -0,0 +1,41 @@
+"""
+benchmark 脚本的公共工具：初始化 Django 环境，并创建一个临时的测试数据库（和 manage.py test 的做法一样），不会影响正式数据库.
+用法（在 HelloDjango 目录下）： python -m scripts.bench_xxx
+"""
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+
+def setup_django(profile: str = 'prod'):
+    """prod 配置使用 sqlite，方便本地测试"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', f'hello_django.settings.{profile}')
+    import django
+    django.setup()
+
+
+@contextmanager
+def bench_database(verbosity: int = 0):
+    """创建临时测试库，退出时销毁"""
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=verbosity, autoclobber=True)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+        teardown_test_environment()
+
+
+def measure(fn, *args, **kwargs):
+    """执行一次 fn，返回 (结果, 耗时s, python 分配的峰值内存MB)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / 1024 / 1024
@@ -0,0 +1,72 @@
+"""
+对比文章访问计数的两种写法在多线程持续访问下的吞吐量：
+  + direct: 每次访问都执行一次 UPDATE blog_post SET pv = pv + 1（热点行加锁）
+  + counter: view_counter.record() 进程内累加，最后 flush 一次批量写回
+用法（在 HelloDjango 目录下）： python -m scripts.bench_view_counter [线程数，默认16] [持续时间s，默认5]
+sqlite 本身只允许一个写者，direct 方式在 MySQL 等数据库上的行锁竞争更明显，可以改用 dev 配置对比.
+"""
+import sys
+import time
+import random
+import threading
+from scripts.bench_utils import setup_django, bench_database
+
+setup_django()
+
+from django.contrib.auth.models import User
+from django.db import close_old_connections
+from django.db.models import F
+from apps.blog_app.models import Category, Post
+from apps.blog_app.counters import view_counter
+
+HOT_POSTS = 10
+
+
+def seed() -> list[int]:
+    user = User.objects.create_user(username='bench', password='bench')
+    category = Category.objects.create(name='bench', owner=user)
+    posts = Post.objects.bulk_create([
+        Post(title=f"post_{i}", content='# hello', category=category, owner=user, pv=0, uv=0) for i in range(HOT_POSTS)
+    ])
+    return [p.pk for p in posts]
+
+
+def run(fn, post_ids: list[int], threads: int, duration: float) -> int:
+    counts = [0] * threads
+    stop_at = time.time() + duration
+
+    def worker(idx):
+        n = 0
+        while time.time() < stop_at:
+            fn(random.choice(post_ids), f"visitor_{random.randint(0, 100000)}")
+            n += 1
+        counts[idx] = n
+        close_old_connections()
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return sum(counts)
+
+
+def direct_update(post_id, visitor):
+    Post.objects.filter(pk=post_id).update(pv=F('pv') + 1)
+
+
+if __name__ == '__main__':
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    duration = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    with bench_database():
+        post_ids = seed()
+        total = run(direct_update, post_ids, threads, duration)
+        print(f"direct  : {total / duration:10.1f} views/s")
+        Post.objects.update(pv=0, uv=0)
+        total = run(view_counter.record, post_ids, threads, duration)
+        start = time.perf_counter()
+        view_counter.flush()
+        flush_ms = (time.perf_counter() - start) * 1000
+        stored = sum(Post.objects.values_list('pv', flat=True))
+        print(f"counter : {total / duration:10.1f} views/s | final flush: {flush_ms:.1f} ms | pv in db: {stored} "
+              f"(recorded {total}) | uv estimates: {list(Post.objects.values_list('uv', flat=True))}")
@@ -1,9 +1,10 @@
+from typing import Literal
 import uvicorn
 from fastapi import FastAPI
 from fastapi.responses import HTMLResponse
 from fastapi.middleware.cors import CORSMiddleware
 from config import settings
-from database import init_db_tables
+from database import init_db_tables, query_stats
 from user_app import user_router
 from auth_app import custom_jwt_router, login_router, authx_router
 from api import api_router, rest_router, MyResource, streaming_router, file_router, batch_router
@@ -72,6 +73,15 @@ def hello_fastapi():
     return HTMLResponse(content=hello_str)
 
 
+if query_stats is not None:
+    @app.get(path='/debug/sql-stats', tags=['Hello'])
+    def sql_stats(top: int = 10, order_by: Literal['total_ms', 'count', 'max_ms', 'rows'] = 'total_ms'):
+        """
+        SQL 语句的耗时统计，按 order_by（total_ms/count/max_ms/rows）排序的前 top 类语句.
+        """
+        return query_stats.top_n(top, order_by)
+
+
 # 这里引入时使用的 prefix 会和实例化 APIRouter 时的 prefix 指定的前缀拼在一起，并且此处设置的 prefix 在前面
 app.include_router(api_router)
 # # app.include_router(api_router, prefix="/api_prefix")
@@ -118,7 +128,7 @@ app.include_router(rest_router)
 
 
 if __name__ == "__main__":
-    # from database import init_db_tables
+    # from database import init_db_tables, query_stats
     # init_db_tables()
     # 使用 uvicorn 运行 FastAPI 应用，可以参考 uvicorn 官网文档 https://www.uvicorn.org/#quickstart
     host = "localhost"
@@ -0,0 +1,181 @@
+"""
+读写分离路由的测试：用两个 SQLite 文件分别作为主库和从库（不做复制，两边的数据可以不同，用来区分读取走的是哪个库）.
+运行: cd HelloFastAPI && python -m pytest test/test_read_replica.py
+"""
+import asyncio
+import pytest
+from sqlalchemy import create_engine, select, insert, text, Integer, String
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, sessionmaker
+
+from utils.db_routing import ReplicaNode, ReplicaSet, DatabaseRouter, RoutingSession
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class Item(Base):
+    __tablename__ = 'item'
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String(32))
+
+
+def _create_db(path, name: str):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(Item), [{'id': 1, 'name': name}])
+    return engine
+
+
+@pytest.fixture
+def router(tmp_path):
+    primary = _create_db(tmp_path / 'primary.db', 'primary')
+    replica = _create_db(tmp_path / 'replica.db', 'replica')
+    router = DatabaseRouter(primary, ReplicaSet([ReplicaNode('replica0', replica)]))
+    yield router
+    router.replicas.stop_health_checks()
+    primary.dispose()
+    replica.dispose()
+
+
+@pytest.fixture
+def session_factory(router):
+    return sessionmaker(class_=RoutingSession, router=router)
+
+
+def _read_name(session) -> str:
+    return session.scalar(select(Item.name).where(Item.id == 1))
+
+
+def test_reads_go_to_replica(session_factory):
+    with session_factory() as session:
+        assert _read_name(session) == 'replica'
+        assert session.get(Item, 1).name == 'replica'
+
+
+def test_writes_go_to_primary(router, session_factory):
+    with session_factory() as session:
+        session.add(Item(id=2, name='new'))
+        session.commit()
+    with router.primary.connect() as conn:
+        assert conn.scalar(select(Item.name).where(Item.id == 2)) == 'new'
+    with router.replicas.nodes[0].engine.connect() as conn:
+        assert conn.scalar(select(Item.name).where(Item.id == 2)) is None
+
+
+def test_sticky_after_write(session_factory):
+    with session_factory() as session:
+        assert _read_name(session) == 'replica'
+        session.execute(insert(Item).values(id=3, name='other'))
+        assert _read_name(session) == 'primary'
+        session.commit()
+        # 提交之后仍然走主库，直到 Session 结束（一个请求）
+        assert _read_name(session) == 'primary'
+    # 新的 Session 重新走从库
+    with session_factory() as session:
+        assert _read_name(session) == 'replica'
+
+
+def test_flush_is_sticky(session_factory):
+    with session_factory() as session:
+        session.add(Item(id=4, name='flushed'))
+        session.flush()
+        assert session.scalar(select(Item.name).where(Item.id == 4)) == 'flushed'
+
+
+def test_for_update_and_text_go_to_primary(session_factory):
+    with session_factory() as session:
+        assert session.scalar(select(Item.name).where(Item.id == 1).with_for_update()) == 'primary'
+    with session_factory() as session:
+        assert session.scalar(text("SELECT name FROM item WHERE id = 1")) == 'primary'
+
+
+def test_sticky_after_text_write(router, session_factory):
+    with session_factory() as session:
+        assert _read_name(session) == 'replica'
+        session.execute(text("UPDATE item SET name = 'updated' WHERE id = 1"))
+        # text() 无法判断是否只读，按写入处理，之后的读取走主库，能读到刚写入的数据
+        assert _read_name(session) == 'updated'
+        session.commit()
+        assert _read_name(session) == 'updated'
+
+
+def test_sticky_after_for_update(session_factory):
+    with session_factory() as session:
+        assert session.scalar(select(Item.name).where(Item.id == 1).with_for_update()) == 'primary'
+        assert _read_name(session) == 'primary'
+
+
+def test_use_primary(session_factory):
+    with session_factory() as session:
+        session.use_primary()
+        assert _read_name(session) == 'primary'
+
+
+def test_failover_and_recovery(router, session_factory):
+    node = router.replicas.nodes[0]
+    router.replicas.mark_down(node, 'test')
+    with session_factory() as session:
+        assert _read_name(session) == 'primary'
+    # 健康检查恢复从库
+    router.replicas.check()
+    assert node.healthy
+    with session_factory() as session:
+        assert _read_name(session) == 'replica'
+
+
+def test_unreachable_replica(tmp_path, router, session_factory):
+    # 从库指向一个不存在的目录，建立连接时失败
+    bad = ReplicaNode('bad', create_engine(f"sqlite:///{tmp_path / 'missing' / 'replica.db'}"))
+    replicas = ReplicaSet([bad])
+    replicas.check()
+    assert not bad.healthy
+    assert replicas.choose() is None
+    router.replicas = replicas
+    with session_factory() as session:
+        assert _read_name(session) == 'primary'
+
+
+def test_connect_error_marks_replica_down(tmp_path):
+    bad = ReplicaNode('bad', create_engine(f"sqlite:///{tmp_path / 'missing' / 'replica.db'}"))
+    replicas = ReplicaSet([bad])
+    with pytest.raises(Exception):
+        with bad.engine.connect():
+            pass
+    assert not bad.healthy
+    assert replicas.choose() is None
+
+
+def test_weights(router):
+    zero = ReplicaNode('zero', router.replicas.nodes[0].engine, weight=0)
+    one = ReplicaNode('one', router.replicas.nodes[0].engine, weight=1)
+    replicas = ReplicaSet([zero, one])
+    assert {replicas.choose().name for _ in range(50)} == {'one'}
+    one.weight = 0
+    assert replicas.choose() is None
+
+
+def test_async_session(tmp_path, router):
+    pytest.importorskip('aiosqlite')
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+    primary_async = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'primary.db'}")
+    replica_async = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}")
+    node = ReplicaNode('replica0', router.replicas.nodes[0].engine, async_engine=replica_async)
+    async_router = DatabaseRouter(router.primary, ReplicaSet([node]), primary_async=primary_async)
+    factory = async_sessionmaker(sync_session_class=RoutingSession, router=async_router, async_mode=True,
+                                 expire_on_commit=False)
+
+    async def run():
+        try:
+            async with factory() as session:
+                assert await session.scalar(select(Item.name).where(Item.id == 1)) == 'replica'
+                session.add(Item(id=5, name='async'))
+                await session.commit()
+                assert await session.scalar(select(Item.name).where(Item.id == 1)) == 'primary'
+        finally:
+            await primary_async.dispose()
+            await replica_async.dispose()
+
+    asyncio.run(run())
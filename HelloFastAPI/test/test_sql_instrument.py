@@ -0,0 +1,142 @@
+"""
+查询耗时统计的测试：语句指纹的归类、日志参数的脱敏，以及在 SQLite 内存数据库上的统计结果.
+运行: cd HelloFastAPI && python -m pytest test/test_sql_instrument.py
+"""
+import logging
+import pytest
+from sqlalchemy import create_engine, event, text, Engine
+
+from utils.sql_instrument import fingerprint, redact_parameters, instrument_engine, instrument_all_engines, \
+    measure_overhead, QueryStats
+
+
+@pytest.mark.parametrize('statements', [
+    # 字面量
+    ["SELECT * FROM user WHERE id = 1", "SELECT * FROM user WHERE id = 42"],
+    ["SELECT * FROM user WHERE name = 'tom'", "SELECT * FROM user WHERE name = 'it''s'"],
+    ["SELECT * FROM t WHERE price > 1.5", "SELECT * FROM t WHERE price > 20"],
+    # 各种参数占位符
+    ["SELECT * FROM user WHERE id = ?", "SELECT * FROM user WHERE id = %s",
+     "SELECT * FROM user WHERE id = %(id)s", "SELECT * FROM user WHERE id = :id", "SELECT * FROM user WHERE id = $1"],
+    # IN 列表的长度不同
+    ["SELECT * FROM user WHERE id IN (1)", "SELECT * FROM user WHERE id IN (?, ?, ?)",
+     "SELECT * FROM user WHERE id in (%s,%s)"],
+    # 多行 VALUES（insertmanyvalues）
+    ["INSERT INTO user (name, age) VALUES (?, ?)", "INSERT INTO user (name, age) VALUES (?, ?), (?, ?), (?, ?)",
+     "INSERT INTO user (name, age) VALUES ('a', 1), ('b', 2)"],
+    # 空白
+    ["SELECT id\n  FROM user\n WHERE id = 1", "SELECT id FROM user WHERE id = 2"],
+])
+def test_fingerprint_groups_same_statement(statements):
+    assert len({fingerprint(s) for s in statements}) == 1
+
+
+def test_fingerprint_output():
+    assert fingerprint("SELECT * FROM user WHERE id IN (1, 2, 3) AND name = 'x'") == \
+        "SELECT * FROM user WHERE id IN (...) AND name = ?"
+    assert fingerprint("INSERT INTO t (a, b) VALUES (1, 'x'), (2, 'y')") == "INSERT INTO t (a, b) VALUES (?, ?)"
+
+
+def test_fingerprint_keeps_different_statements_apart():
+    assert fingerprint("SELECT * FROM user WHERE id = 1") != fingerprint("SELECT * FROM user WHERE uid = 1")
+    assert fingerprint("SELECT * FROM t1") != fingerprint("SELECT * FROM t2")
+    # 列数不同的 VALUES 不合并
+    assert fingerprint("INSERT INTO t (a) VALUES (?)") != fingerprint("INSERT INTO t (a, b) VALUES (?, ?)")
+
+
+def test_redact_named_parameters():
+    params = {'username': 'tom', 'password': 'p@ss', 'api_key': 'k', 'Auth_Token': 't', 'content': 'x' * 100}
+    redacted = redact_parameters(params, max_length=10)
+    assert redacted['username'] == 'tom'
+    assert redacted['password'] == redacted['api_key'] == redacted['Auth_Token'] == '***'
+    assert redacted['content'] == 'x' * 10 + '...'
+    assert redact_parameters({'data': b'\x00' * 20}, max_length=4)['data'] == b'\x00' * 4 + b'...'
+
+
+def test_redact_positional_and_executemany():
+    # 位置参数只保留类型
+    assert redact_parameters(('tom', 'secret', 3)) == ('str', 'str', 'int')
+    # executemany 只输出第一组参数
+    redacted = redact_parameters([{'name': 'a', 'password': '1'}, {'name': 'b', 'password': '2'}])
+    assert redacted == [{'name': 'a', 'password': '***'}, '... 2 sets']
+    assert redact_parameters(None) is None
+
+
+def test_instrument_engine(caplog):
+    engine = create_engine('sqlite://')
+    stats = instrument_engine(engine, slow_ms=0)
+    with caplog.at_level(logging.WARNING, logger='sql.slow'), engine.begin() as conn:
+        conn.execute(text("CREATE TABLE t (id INTEGER PRIMARY KEY, token TEXT)"))
+        conn.execute(text("INSERT INTO t VALUES (:id, :token)"), [{'id': i, 'token': f"t{i}"} for i in range(3)])
+        for i in range(5):
+            conn.execute(text(f"SELECT * FROM t WHERE id = {i}")).fetchall()
+    report = {s['fingerprint']: s for s in stats.top_n(order_by='count')}
+    select = report["SELECT * FROM t WHERE id = ?"]
+    assert select['count'] == 5
+    assert select['max_ms'] >= select['avg_ms'] > 0
+    # SQLite 在 DBAPI 层是位置参数，慢查询日志中只有参数的类型，不会输出参数值
+    assert "'t0'" not in caplog.text and "('int', 'str')" in caplog.text
+    assert 'SELECT * FROM t WHERE id = ?' in stats.format_report()
+    engine.dispose()
+
+
+def test_pending_records_are_flushed():
+    engine = create_engine('sqlite://')
+    stats = QueryStats(slow_ms=None, flush_every=4, sample_every=1).attach(engine)
+    with engine.connect() as conn:
+        for i in range(10):
+            conn.execute(text("SELECT :i"), {'i': i}).fetchall()
+    # 8 条在执行时汇总，剩下的 2 条在读取时汇总
+    assert stats.top_n()[0]['count'] == 10
+    assert sum(stats._by_fingerprint["SELECT ?"].buckets) == 10
+    stats.detach(engine)
+    engine.dispose()
+
+
+def test_sampling():
+    engine = create_engine('sqlite://')
+    stats = QueryStats(slow_ms=None, sample_every=4).attach(engine)
+    with engine.connect() as conn:
+        for i in range(10):
+            conn.execute(text("SELECT :i"), {'i': i}).fetchall()
+    # 执行次数是精确的，第 1、5、9 次执行被采样，总耗时按 10 / 3 放大
+    report = stats.top_n()[0]
+    select = stats._by_fingerprint["SELECT ?"]
+    assert report['count'] == 10 and select.sampled == sum(select.buckets) == 3
+    assert report['total_ms'] == pytest.approx(select.total_ms * 10 / 3, abs=1e-3)
+    stats.detach(engine)
+    engine.dispose()
+
+
+def test_detach_and_other_listeners():
+    engine = create_engine('sqlite://')
+    calls = []
+    event.listen(engine, 'do_execute', lambda cursor, statement, parameters, context: calls.append(statement))
+    stats = instrument_engine(engine, slow_ms=None)
+    with engine.connect() as conn:
+        conn.execute(text("SELECT :i"), {'i': 1}).fetchall()
+        # 其他 do_execute 监听函数照常被调用
+        assert calls == ["SELECT ?"]
+        stats.detach(engine)
+        conn.execute(text("SELECT :i"), {'i': 2}).fetchall()
+    assert stats.top_n()[0]['count'] == 1 and len(calls) == 2
+    assert 'do_execute' not in vars(engine.dialect)
+    engine.dispose()
+
+
+def test_instrument_all_engines():
+    stats = instrument_all_engines(slow_ms=None)
+    try:
+        engine = create_engine('sqlite://')
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1")).fetchall()
+    finally:
+        stats.detach(Engine)
+    assert stats.top_n()[0]['count'] == 1
+    assert 'do_execute' not in vars(engine.dialect)
+    engine.dispose()
+
+
+def test_overhead_budget():
+    # 默认配置在 tight loop 中的开销不超过 5%；测量受机器负载影响，超出时重新测量，最多 3 次
+    assert any(measure_overhead(loops=1000, repeat=40, verbose=False) < 5 for _ in range(3))
@@ -0,0 +1,186 @@
+"""
+读写分离：写操作和写入之后的读取走主库，普通的 SELECT 按权重分发到从库.
+  + RoutingSession 重写 Session.get_bind()：
+      - flush、INSERT/UPDATE/DELETE、SELECT ... FOR UPDATE、text() 语句（无法判断是否只读）走主库；
+      - 普通的 select() 走从库，一个 Session 内固定使用同一个从库，保证同一个请求内读到的数据一致；
+      - 任何走主库的语句之后的读取也走主库（sticky-after-write）：从库有复制延迟，刚写入的数据在从库上可能还读不到，
+        text() 等无法判断的语句也按写入处理.
+        Session 通常是每个请求一个（见 database.get_db_session），所以粘滞的范围就是一个请求；
+      - session.use_primary() 之后的所有语句都走主库，用于必须读到最新数据的场景.
+  + ReplicaSet 维护从库的健康状态：
+      - 执行语句时连接断开/无法建立连接，立即把该从库标记为不可用（被动检测）；
+      - check() 对每个从库执行 SELECT 1，恢复可用的从库，start_health_checks() 在后台线程中定期执行（主动检测）；
+      - 没有可用的从库时，读取自动切换到主库（failover）.
+    当前请求中正在执行的语句出错时不会自动重试，之后的请求才会切换.
+  + 异步引擎：AsyncSession 内部使用同步的 Session，通过 sync_session_class=RoutingSession 使用，
+    此时 get_bind() 返回异步引擎的 sync_engine，从库的健康检查仍然使用同步引擎.
+"""
+import random
+import logging
+import threading
+from sqlalchemy import event, text, Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.selectable import Select
+
+logger = logging.getLogger('db.routing')
+
+
+class ReplicaNode:
+    """
+    一个从库
+    :param engine: 同步引擎，用于同步 Session 和健康检查
+    :param async_engine: 异步引擎（可选），用于 AsyncSession
+    :param weight: 权重，为 0 时不参与读取
+    """
+
+    def __init__(self, name: str, engine: Engine, weight: int = 1, async_engine=None):
+        self.name = name
+        self.engine = engine
+        self.async_engine = async_engine
+        self.weight = weight
+        self.healthy = True
+        self.last_error = None
+
+    def bind(self, async_mode: bool = False) -> Engine:
+        if async_mode:
+            if self.async_engine is None:
+                raise ValueError(f"replica {self.name} has no async engine")
+            return self.async_engine.sync_engine
+        return self.engine
+
+    def __repr__(self):
+        return f"<ReplicaNode(name={self.name}, weight={self.weight}, healthy={self.healthy})>"
+
+
+class ReplicaSet:
+    """
+    从库集合：按权重随机选择可用的从库，维护健康状态
+    :param health_check_seconds: 后台健康检查的间隔（秒）
+    """
+
+    def __init__(self, nodes: list[ReplicaNode], health_check_seconds: float = 10):
+        self.nodes = nodes
+        self.health_check_seconds = health_check_seconds
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        for node in nodes:
+            self._watch(node)
+
+    def _watch(self, node: ReplicaNode):
+        def on_error(context):
+            # 连接断开，或者建立连接时失败（此时还没有 Connection 对象）
+            if context.is_disconnect or context.connection is None:
+                self.mark_down(node, context.original_exception)
+
+        engines = [node.engine] + ([node.async_engine.sync_engine] if node.async_engine is not None else [])
+        for engine in engines:
+            event.listen(engine, 'handle_error', on_error)
+
+    def choose(self) -> ReplicaNode | None:
+        """按权重随机选择一个可用的从库，没有可用的从库时返回 None"""
+        candidates = [node for node in self.nodes if node.healthy and node.weight > 0]
+        if not candidates:
+            return None
+        if len(candidates) == 1:
+            return candidates[0]
+        return random.choices(candidates, weights=[node.weight for node in candidates])[0]
+
+    def mark_down(self, node: ReplicaNode, error=None):
+        with self._lock:
+            was_healthy = node.healthy
+            node.healthy = False
+            node.last_error = error
+        if was_healthy:
+            logger.warning("replica %s is down, reads fail over: %s", node.name, error)
+
+    def mark_up(self, node: ReplicaNode):
+        with self._lock:
+            was_healthy = node.healthy
+            node.healthy = True
+            node.last_error = None
+        if not was_healthy:
+            logger.warning("replica %s is back", node.name)
+
+    def check(self):
+        """对所有从库执行一次健康检查"""
+        for node in self.nodes:
+            try:
+                with node.engine.connect() as conn:
+                    conn.execute(text("SELECT 1"))
+            except Exception as exc:
+                self.mark_down(node, exc)
+            else:
+                self.mark_up(node)
+
+    def _run_health_checks(self):
+        while not self._stop.wait(self.health_check_seconds):
+            self.check()
+
+    def start_health_checks(self):
+        if self._thread is None and self.nodes:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run_health_checks, name='replica-health-check', daemon=True)
+            self._thread.start()
+
+    def stop_health_checks(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+class DatabaseRouter:
+    """主库 + 从库集合"""
+
+    def __init__(self, primary: Engine, replicas: ReplicaSet, primary_async=None):
+        self.primary = primary
+        self.primary_async = primary_async
+        self.replicas = replicas
+
+    def primary_bind(self, async_mode: bool = False) -> Engine:
+        return self.primary_async.sync_engine if async_mode else self.primary
+
+
+class RoutingSession(Session):
+    """
+    读写分离的 Session
+        SessionLocal = sessionmaker(class_=RoutingSession, router=router)
+        SessionLocalAsync = async_sessionmaker(sync_session_class=RoutingSession, router=router, async_mode=True)
+    """
+
+    def __init__(self, *args, router: DatabaseRouter, async_mode: bool = False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.router = router
+        self.async_mode = async_mode
+        # 本 Session 使用的从库，第一次读取时选择
+        self.replica: ReplicaNode | None = None
+        # 写入过数据或者调用了 use_primary()，之后都使用主库
+        self.sticky_primary = False
+
+    def use_primary(self):
+        """之后的所有语句都走主库"""
+        self.sticky_primary = True
+
+    @staticmethod
+    def _is_read(clause) -> bool:
+        # 只有 select() 才能确定是只读的；text() 可能是任何语句
+        if not isinstance(clause, Select):
+            return False
+        return clause._for_update_arg is None
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        router = self.router
+        if self.sticky_primary:
+            return router.primary_bind(self.async_mode)
+        if self._flushing or not self._is_read(clause):
+            # 写操作，或者不能确定是只读的语句（text()、FOR UPDATE 等）都走主库，并且之后的读取也都走主库，
+            # 否则 text() 写入之后的读取会读到还没有复制到从库的旧数据
+            self.sticky_primary = True
+            return router.primary_bind(self.async_mode)
+        replica = self.replica
+        if replica is None or not replica.healthy:
+            replica = self.replica = router.replicas.choose()
+        if replica is None:
+            return router.primary_bind(self.async_mode)
+        return replica.bind(self.async_mode)
@@ -0,0 +1,361 @@
+"""
+SQLAlchemy 查询耗时统计和慢查询日志，可以用于任何 Engine（同步引擎，或者异步引擎的 .sync_engine）.
+项目中的引擎要么没有任何观测手段，要么设置 echo=True 输出所有语句（开销大，并且只有语句，没有耗时）. 这里的做法：
+  + 包装引擎 Dialect 的 do_execute 等方法计时（只计 DBAPI cursor 执行语句的时间），按语句的"指纹"汇总：
+    指纹是把字面量替换成 ?、IN (?, ?, ...) 合并为 IN (...)、空白压缩之后的语句，同一类查询归到一起；
+  + 每个指纹记录执行次数、总耗时、最大耗时、影响/返回的行数（cursor.rowcount，SQLite 的 SELECT 为 -1，不计入）
+    和一个按固定边界分桶的耗时直方图，用于估算分位数；
+  + 耗时超过 slow_ms 的语句输出 warning 日志，参数中的敏感字段（password、token 等）替换为 ***，过长的值会被截断；
+  + top_n() / format_report() 输出按总耗时（或次数、最大耗时）排序的前 N 类语句.
+执行次数是精确的，耗时按采样统计：每类语句每 sample_every 次执行计时一次（第一次执行总是计时），
+总耗时和行数按 执行次数 / 采样次数 放大，平均值、分位数和最大值只来自采样；慢查询日志也只覆盖采样的执行，
+需要记录每一条慢查询时设置 sample_every=1.
+热路径上未采样的执行只有一次指纹缓存的 dict 查找和一次 next(itertools.count)；采样的执行再加两次 perf_counter
+和一次 deque.append（不加锁，攒够一批再汇总）.
+可以用 python -m utils.sql_instrument [循环次数] [sample_every] 在本机测量开销（measure_overhead）：
+SQLite 内存数据库的主键查询每条约 28us，默认配置（sample_every=8）的开销约 3.5%（test_sql_instrument.py 中断言在 5% 以内），
+sample_every=1 时约 7.5%；连接真实数据库时每条语句至少几百 us，即使每次都计时开销也在 1% 以下.
+用法:
+    from utils.sql_instrument import instrument_engine
+    stats = instrument_engine(engine, slow_ms=200)
+    ...
+    print(stats.format_report(top=10))
+"""
+import re
+import sys
+import time
+import bisect
+import logging
+import statistics
+import threading
+from time import perf_counter
+from itertools import repeat, count
+from collections import deque, Counter
+from sqlalchemy import event, Engine
+
+logger = logging.getLogger('sql.slow')
+
+# 直方图的桶边界（ms），最后一个桶是 > 5000ms
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+_BUCKETS_S = tuple(b / 1000 for b in BUCKETS_MS)
+# 参数名匹配这个正则的值在日志中替换为 ***
+SENSITIVE_PARAM = re.compile(r'pass|pwd|secret|token|key|credential|auth', re.IGNORECASE)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_BIND_PARAM = re.compile(r'%\([^)]+\)s|%s|:\w+|\$\d+|\?')
+_IN_LIST = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.IGNORECASE)
+_VALUES_LIST = re.compile(r'\bVALUES\s*(\(\s*\?(?:\s*,\s*\?)*\s*\))(?:\s*,\s*\(\s*\?(?:\s*,\s*\?)*\s*\))*', re.IGNORECASE)
+_SPACES = re.compile(r'\s+')
+
+
+def fingerprint(statement: str) -> str:
+    """语句的指纹：去掉字面量和参数占位符的差异"""
+    fp = _STRING_LITERAL.sub('?', statement)
+    fp = _BIND_PARAM.sub('?', fp)
+    fp = _NUMBER_LITERAL.sub('?', fp)
+    fp = _IN_LIST.sub('IN (...)', fp)
+    # insertmanyvalues 的多行 VALUES 合并为一行
+    fp = _VALUES_LIST.sub(r'VALUES \1', fp)
+    return _SPACES.sub(' ', fp).strip()
+
+
+def redact_parameters(parameters, max_length: int = 64):
+    """日志输出用的参数：敏感字段替换为 ***，过长的值截断"""
+    def value(v):
+        if isinstance(v, (str, bytes)) and len(v) > max_length:
+            return v[:max_length] + (b'...' if isinstance(v, bytes) else '...')
+        return v
+
+    if isinstance(parameters, dict):
+        return {k: '***' if SENSITIVE_PARAM.search(str(k)) else value(v) for k, v in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            # executemany 只输出第一组参数
+            return [redact_parameters(parameters[0], max_length), f"... {len(parameters)} sets"]
+        # 位置参数不知道字段名，只保留类型，避免泄露
+        return tuple(type(v).__name__ for v in parameters)
+    return parameters
+
+
+# 包装的 Dialect 方法
+_EXECUTE_METHODS = ('do_execute', 'do_executemany', 'do_execute_no_params')
+
+
+class StatementStats:
+    __slots__ = ('fingerprint', 'calls', 'count', 'sampled', 'total_ms', 'max_ms', 'rows', 'buckets', 'pending',
+                 '_reads')
+
+    def __init__(self, fp: str):
+        self.fingerprint = fp
+        # 每次执行调用一次 next()，同时决定这次是否采样；next() 在 C 代码中完成，多线程下不会丢失计数
+        self.calls = count()
+        # 执行次数（汇总时从 calls 读取）和其中采样的次数，total_ms/max_ms/rows/buckets 只统计采样的执行
+        self.count = 0
+        self.sampled = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+        # 还没有汇总的 (耗时秒数, rowcount)；deque 的 append/popleft 是线程安全的，热路径上只追加，不需要加锁
+        self.pending = deque()
+        self._reads = 0
+
+    def flush(self):
+        """把 pending 中的记录批量汇总（sum/max/Counter 都在 C 代码中循环），调用方需要持有 QueryStats 的锁"""
+        # itertools.count 只能通过 next() 读取，读取本身多出的计数要减掉（只会让采样的位置错开一次）
+        self.count = next(self.calls) - self._reads
+        self._reads += 1
+        pending = self.pending
+        records = [pending.popleft() for _ in range(len(pending))]
+        if not records:
+            return
+        elapsed, rowcounts = zip(*records)
+        self.sampled += len(elapsed)
+        self.total_ms += sum(elapsed) * 1000
+        self.max_ms = max(self.max_ms, max(elapsed) * 1000)
+        self.rows += sum(filter((0).__lt__, rowcounts))
+        for i, n in Counter(map(bisect.bisect_left, repeat(_BUCKETS_S), elapsed)).items():
+            self.buckets[i] += n
+
+    def percentile(self, q: float) -> float:
+        """按直方图估算分位数，返回所在桶的上边界（ms）"""
+        target = q * self.sampled
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if n and seen >= target:
+                return BUCKETS_MS[i] if i < len(BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+    def as_dict(self) -> dict:
+        # 采样的统计按 执行次数 / 采样次数 放大
+        scale = self.count / self.sampled if self.sampled else 0.0
+        return {
+            'fingerprint': self.fingerprint,
+            'count': self.count,
+            'total_ms': round(self.total_ms * scale, 3),
+            'avg_ms': round(self.total_ms / self.sampled, 3) if self.sampled else 0.0,
+            'max_ms': round(self.max_ms, 3),
+            'p50_ms': self.percentile(0.5),
+            'p99_ms': self.percentile(0.99),
+            'rows': round(self.rows * scale),
+        }
+
+
+class QueryStats:
+    """
+    一个或多个引擎的查询统计
+    :param slow_ms: 慢查询的阈值（ms），None 表示不记录慢查询
+    :param max_fingerprints: 最多缓存多少条原始语句的指纹，超过时清空缓存（统计数据不受影响）
+    :param flush_every: 每类语句攒够多少条记录汇总一次；读取统计数据时总是先汇总
+    :param sample_every: 每类语句每多少次执行计时一次，1 表示每次都计时（每一条慢查询都会记录日志）；执行次数总是精确的
+    """
+
+    def __init__(self, slow_ms: float | None = 200, max_fingerprints: int = 10000, flush_every: int = 256,
+                 sample_every: int = 8):
+        if sample_every < 1:
+            raise ValueError(f"sample_every must be >= 1, got {sample_every}")
+        self.slow_ms = slow_ms
+        self.sample_every = sample_every
+        self.max_fingerprints = max_fingerprints
+        self.flush_every = flush_every
+        self._lock = threading.Lock()
+        # 原始语句 -> StatementStats；编译缓存使得同一类语句的字符串完全相同，大部分情况下一次 dict 查找就能命中
+        self._by_statement = {}
+        # 指纹 -> StatementStats
+        self._by_fingerprint = {}
+        # 已经包装的 Dialect -> 它原来的实例属性（没有时为 None），detach 时恢复
+        self._wrapped = {}
+
+    # ---------- 计时 ----------
+    # attach(engine) 把引擎 Dialect 实例上的 do_execute/do_executemany/do_execute_no_params 替换成计时的包装函数，
+    # 而不是监听 Dialect 的 do_execute 等事件：SQLAlchemy 2.x 中即使监听函数什么都不做，事件分发在 tight loop 中的开销也有约 6%，
+    # 并且监听函数必须返回 True（表示语句已经执行），会让同一个事件上后注册的监听函数不再被调用.
+    # 包装函数不影响事件：其他 do_execute* 监听函数照常被调用，只有它们返回 True 时语句不经过这里，不计入统计.
+    # 未采样的执行不计时：perf_counter 在一些虚拟机上要走系统调用，tight loop 中两次调用的开销就接近 2%.
+    def _timed(self, do_execute):
+        """返回计时的 do_execute(cursor, statement, parameters, context)，do_executemany 的参数相同"""
+        by_statement = self._by_statement
+        stats_for = self._stats_for
+        record = self._record
+
+        def execute(cursor, statement, parameters, context=None):
+            stats = by_statement.get(statement) or stats_for(statement)
+            if next(stats.calls) % self.sample_every:
+                return do_execute(cursor, statement, parameters, context)
+            start = perf_counter()
+            do_execute(cursor, statement, parameters, context)
+            # 执行出错时异常直接抛出，不计入耗时统计（执行次数已经计入）
+            record(stats, cursor, statement, parameters, perf_counter() - start)
+        return execute
+
+    def _record(self, stats, cursor, statement, parameters, elapsed):
+        pending = stats.pending
+        pending.append((elapsed, cursor.rowcount))
+        if len(pending) >= self.flush_every:
+            with self._lock:
+                stats.flush()
+        if self.slow_ms is not None and elapsed * 1000 >= self.slow_ms:
+            self._log_slow(statement, parameters, elapsed)
+
+    def _wrap_dialect(self, dialect):
+        with self._lock:
+            if dialect in self._wrapped:
+                return
+            self._wrapped[dialect] = {name: vars(dialect).get(name) for name in _EXECUTE_METHODS}
+        do_execute_no_params = dialect.do_execute_no_params
+
+        def execute_no_params(cursor, statement, parameters, context):
+            do_execute_no_params(cursor, statement, context)
+
+        timed_no_params = self._timed(execute_no_params)
+
+        def timed_execute_no_params(cursor, statement, context=None):
+            timed_no_params(cursor, statement, None, context)
+
+        dialect.do_execute = self._timed(dialect.do_execute)
+        dialect.do_executemany = self._timed(dialect.do_executemany)
+        dialect.do_execute_no_params = timed_execute_no_params
+
+    def _unwrap_dialect(self, dialect):
+        with self._lock:
+            originals = self._wrapped.pop(dialect, {})
+        for name, original in originals.items():
+            if original is None:
+                delattr(dialect, name)
+            else:
+                setattr(dialect, name, original)
+
+    def _on_connect(self, dialect, conn_rec, cargs, cparams):
+        # Dialect 的 do_connect 事件：引擎第一次建立 DBAPI 连接时包装它的 Dialect；返回 None，由 SQLAlchemy 继续建立连接
+        self._wrap_dialect(dialect)
+
+    @staticmethod
+    def _log_slow(statement, parameters, elapsed):
+        logger.warning("slow query %.1f ms: %s | params: %r",
+                       elapsed * 1000, statement, redact_parameters(parameters))
+
+    def flush(self):
+        """把所有还没有汇总的记录汇总到统计数据中"""
+        with self._lock:
+            for stats in self._by_fingerprint.values():
+                stats.flush()
+
+    def _stats_for(self, statement: str) -> StatementStats:
+        fp = fingerprint(statement)
+        with self._lock:
+            if len(self._by_statement) >= self.max_fingerprints:
+                self._by_statement.clear()
+            stats = self._by_fingerprint.get(fp)
+            if stats is None:
+                stats = self._by_fingerprint[fp] = StatementStats(fp)
+            self._by_statement[statement] = stats
+        return stats
+
+    def attach(self, target):
+        """
+        统计 Engine 执行的语句；target 是 Engine 类时统计所有引擎：
+        在 Dialect 的 do_connect 事件中包装，每个引擎在之后第一次建立数据库连接时开始统计，需要在创建连接之前调用.
+        """
+        if isinstance(target, Engine):
+            self._wrap_dialect(target.dialect)
+        else:
+            event.listen(target, 'do_connect', self._on_connect)
+        return self
+
+    def detach(self, target):
+        if isinstance(target, Engine):
+            self._unwrap_dialect(target.dialect)
+            return
+        event.remove(target, 'do_connect', self._on_connect)
+        for dialect in list(self._wrapped):
+            self._unwrap_dialect(dialect)
+
+    # ---------- 报告 ----------
+    def reset(self):
+        with self._lock:
+            self._by_statement.clear()
+            self._by_fingerprint.clear()
+
+    def top_n(self, top: int = 10, order_by: str = 'total_ms') -> list[dict]:
+        """按 order_by（total_ms/count/max_ms/rows）排序的前 top 类语句"""
+        self.flush()
+        with self._lock:
+            stats = [s.as_dict() for s in self._by_fingerprint.values()]
+        stats.sort(key=lambda s: s[order_by], reverse=True)
+        return stats[:top]
+
+    def format_report(self, top: int = 10, order_by: str = 'total_ms', width: int = 100) -> str:
+        lines = [f"{'count':>8} {'total ms':>10} {'avg ms':>8} {'p50':>7} {'p99':>7} {'max ms':>8} {'rows':>8}  statement"]
+        for s in self.top_n(top, order_by):
+            statement = s['fingerprint'] if len(s['fingerprint']) <= width else s['fingerprint'][:width - 3] + '...'
+            lines.append(f"{s['count']:>8} {s['total_ms']:>10.1f} {s['avg_ms']:>8.3f} {s['p50_ms']:>7} "
+                         f"{s['p99_ms']:>7} {s['max_ms']:>8.1f} {s['rows']:>8}  {statement}")
+        return '\n'.join(lines)
+
+
+def instrument_engine(engine, stats: QueryStats = None, slow_ms: float | None = 200) -> QueryStats:
+    """
+    给引擎注册耗时统计，返回 QueryStats；多个引擎可以共用一个 stats.
+    异步引擎需要传入 async_engine.sync_engine.
+    """
+    stats = stats or QueryStats(slow_ms=slow_ms)
+    return stats.attach(getattr(engine, 'sync_engine', engine))
+
+
+def instrument_all_engines(stats: QueryStats = None, slow_ms: float | None = 200) -> QueryStats:
+    """当前进程中的所有引擎（包括之后创建的）都会被统计，每个引擎从之后第一次建立数据库连接时开始，应该在启动时调用"""
+    stats = stats or QueryStats(slow_ms=slow_ms)
+    return stats.attach(Engine)
+
+
+def measure_overhead(loops: int = 20_000, repeat: int = 30, verbose: bool = True, **options) -> float:
+    """
+    在 SQLite 内存数据库上用 tight loop 测量统计的开销，返回开销的百分比；options 是 QueryStats 的参数，不传时使用默认配置.
+    两个相同的引擎，一个不统计、一个统计，每轮各执行 loops 次主键查询（两者的先后顺序每轮交替），取多轮耗时比值的中位数；
+    计时使用进程的 CPU 时间，减少机器上其他进程的干扰.
+    """
+    from sqlalchemy import create_engine, text
+
+    def create() -> Engine:
+        engine = create_engine('sqlite://')
+        with engine.begin() as conn:
+            conn.execute(text("CREATE TABLE t (id INTEGER PRIMARY KEY, name TEXT)"))
+            conn.execute(text("INSERT INTO t VALUES (:id, :name)"), [{'id': i, 'name': f"n{i}"} for i in range(1000)])
+        return engine
+
+    stmt = text("SELECT id, name FROM t WHERE id = :id")
+
+    def run(conn) -> float:
+        start = time.process_time()
+        for i in range(loops):
+            conn.execute(stmt, {'id': i % 1000}).fetchall()
+        return time.process_time() - start
+
+    plain_engine, instrumented_engine = create(), create()
+    stats = QueryStats(**options).attach(instrumented_engine)
+    plain, instrumented = [], []
+    with plain_engine.connect() as plain_conn, instrumented_engine.connect() as instrumented_conn:
+        for i in range(repeat):
+            if i % 2:
+                instrumented.append(run(instrumented_conn))
+                plain.append(run(plain_conn))
+            else:
+                plain.append(run(plain_conn))
+                instrumented.append(run(instrumented_conn))
+    plain_engine.dispose()
+    instrumented_engine.dispose()
+    # 相邻两次运行的比值受机器负载变化的影响最小，取多轮比值的中位数
+    overhead = (statistics.median(i / p for i, p in zip(instrumented, plain)) - 1) * 100
+    if verbose:
+        print(f"plain: {min(plain):.3f} s, instrumented: {min(instrumented):.3f} s for {loops} queries, "
+              f"overhead {overhead:.1f}%")
+        print(stats.format_report(top=3))
+    return overhead
+
+
+if __name__ == '__main__':
+    # cd HelloFastAPI && python -m utils.sql_instrument [循环次数] [sample_every]
+    measure_overhead(*(int(arg) for arg in sys.argv[1:2]),
+                     **({'sample_every': int(sys.argv[2])} if len(sys.argv) > 2 else {}))
@@ -2,12 +2,32 @@ import sys
 import os
 from urllib import parse
 from datetime import timedelta
+from pool_metrics import TimedQueuePool
 
 basedir = os.path.abspath(os.path.dirname(__file__))
 
 class BaseConfig:
     SQLALCHEMY_COMMIT_ON_TEARDOWN = True
-    SQLALCHEMY_TRACK_MODIFICATIONS = True
+    # 开启后每次 flush 都会发送对象修改的信号，额外开销不小，而项目中并没有使用这个信号
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # 是否通过 pool_metrics.init_pool_metrics 统计连接池指标
+    SQLALCHEMY_POOL_METRICS = False
+
+    # ------- serve.py 生产环境启动配置，命令行参数可以覆盖 --------
+    # prefork: 多进程 sync worker；threaded: 多进程 + 每个进程多线程(gthread)；gevent: 多进程 + 协程
+    SERVER_MODE = 'prefork'
+    SERVER_HOST = '0.0.0.0'
+    SERVER_PORT = 8100
+    SERVER_WORKERS = (os.cpu_count() or 1) * 2 + 1
+    # threaded 模式下每个 worker 的线程数
+    SERVER_THREADS = 4
+    # gevent 模式下每个 worker 最多同时处理的连接（协程）数
+    SERVER_WORKER_CONNECTIONS = 1000
+    SERVER_TIMEOUT = 30
+    # file_app 流式导入（/file/ingest）允许写入的表名，不在列表里的表名返回 400；为空时只能做解析和校验
+    INGEST_ALLOWED_TABLES = ()
+    # 导入任务的状态保存多久（秒），最后一次更新超过这个时间的任务查询时返回 404
+    INGEST_JOB_TTL = 24 * 3600
     # 用于生成token的KEY
     SECRET_KEY = 'flask-insecure-nv6-(i1-659xonvcxe&luz90!jsp0ag!y7lt0_8-01al#iilw2'
     # JWT使用的秘钥
@@ -56,6 +76,42 @@ class DevelopmentConfig(BaseConfig):
     SQLALCHEMY_DATABASE_URI = "mysql+pymysql://{user}:{passwd}@{host}:{port}/{db}".format(**mysql_conf)
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+
+class ProductionConfig(BaseConfig):
+    """生产环境配置，数据库连接信息和连接池参数都可以通过环境变量覆盖"""
+    mysql_conf = {
+        'user': os.environ.get('FLASK_DB_USER', 'root'),
+        'passwd': parse.quote_plus(os.environ.get('FLASK_DB_PASSWD', 'mysql2022')),
+        'host': os.environ.get('FLASK_DB_HOST', 'localhost'),
+        'port': int(os.environ.get('FLASK_DB_PORT', 3306)),
+        'db': os.environ.get('FLASK_DB_NAME', 'hello_flask')
+    }
+    SQLALCHEMY_DATABASE_URI = "mysql+pymysql://{user}:{passwd}@{host}:{port}/{db}".format(**mysql_conf)
+    # Flask-SQLAlchemy 会把这里的参数原样传给 sqlalchemy.create_engine()
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        # TimedQueuePool 是 QueuePool 的子类，额外统计获取连接的等待时间
+        'poolclass': TimedQueuePool,
+        # 常驻连接数
+        'pool_size': int(os.environ.get('FLASK_DB_POOL_SIZE', 20)),
+        # 连接池满了之后，最多还可以临时创建的连接数
+        'max_overflow': int(os.environ.get('FLASK_DB_MAX_OVERFLOW', 10)),
+        # 连接池耗尽时，等待空闲连接的最长时间(s)，超时抛出 sqlalchemy.exc.TimeoutError
+        'pool_timeout': int(os.environ.get('FLASK_DB_POOL_TIMEOUT', 10)),
+        # 借出连接前先 ping 一下，避免拿到已被 MySQL 断开的连接
+        'pool_pre_ping': True,
+        # 连接的最长存活时间(s)，要小于 MySQL 的 wait_timeout（默认8小时）
+        'pool_recycle': int(os.environ.get('FLASK_DB_POOL_RECYCLE', 1800)),
+        # SQL 编译缓存的大小，SQLAlchemy 会缓存已编译的语句，命中后省掉编译开销
+        'query_cache_size': int(os.environ.get('FLASK_DB_QUERY_CACHE_SIZE', 1200)),
+    }
+    SQLALCHEMY_POOL_METRICS = True
+    # 计算分位数时保留的最近样本数
+    SQLALCHEMY_POOL_METRICS_SAMPLES = 10000
+    SERVER_MODE = os.environ.get('FLASK_SERVER_MODE', 'prefork')
+    SERVER_WORKERS = int(os.environ.get('FLASK_SERVER_WORKERS', BaseConfig.SERVER_WORKERS))
+
+
 config = {
-    'dev': DevelopmentConfig
+    'dev': DevelopmentConfig,
+    'prod': ProductionConfig,
 }
@@ -0,0 +1,58 @@
+"""
+对比 pd.read_excel 整表读取 和 流式导入（iter_rows + iter_batches）的 峰值内存(RSS) 与 耗时.
+每种方式在单独的子进程里执行，保证峰值 RSS 互不影响.
+用法（在 HelloFlask 目录下）： python -m file_app.bench_ingest [行数，默认500000]
+"""
+import os
+import sys
+import time
+import tempfile
+import resource
+from datetime import datetime, timedelta
+from multiprocessing import get_context
+
+
+def peak_rss_mb() -> float:
+    # Linux 下 ru_maxrss 的单位是 KB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def make_xlsx(path: str, rows: int):
+    # write_only 模式写文件，不会把所有行留在内存里
+    from openpyxl import Workbook
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('data')
+    ws.append(['id', 'name', 'score', 'created'])
+    start = datetime(2024, 1, 1)
+    for i in range(rows):
+        ws.append([i, f"name_{i}", i * 0.5, start + timedelta(seconds=i)])
+    wb.save(path)
+
+
+def run_pandas(path: str):
+    import pandas as pd
+    start = time.perf_counter()
+    df = pd.read_excel(path)
+    return len(df), time.perf_counter() - start, peak_rss_mb()
+
+
+def run_streaming(path: str):
+    from file_app.ingest import iter_rows, iter_batches
+    start = time.perf_counter()
+    count = 0
+    for batch in iter_batches(iter_rows(path)):
+        count += len(batch['id'])
+    return count, time.perf_counter() - start, peak_rss_mb()
+
+
+if __name__ == '__main__':
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    path = os.path.join(tempfile.gettempdir(), f'bench_ingest_{rows}.xlsx')
+    if not os.path.exists(path):
+        print(f"generating {path} with {rows} rows ...")
+        make_xlsx(path, rows)
+    ctx = get_context('spawn')
+    for name, fn in [('pd.read_excel', run_pandas), ('streaming', run_streaming)]:
+        with ctx.Pool(1) as pool:
+            count, seconds, rss = pool.apply(fn, (path,))
+        print(f"{name:<14} rows: {count:>8} | time: {seconds:7.2f} s | peak RSS: {rss:8.1f} MB")
@@ -0,0 +1,367 @@
+"""
+Excel/CSV 上传文件的流式导入.
+原来的 upload 视图在请求线程里直接 pd.read_excel() 整个文件，所有 sheet 的单元格都会一次性加载到内存里.
+这里拆成如下几步：
+  1. spool_upload: 按块把上传文件写到临时目录，不在内存里保留整个文件；
+  2. iter_rows: 增量读取行 —— xlsx 使用 openpyxl 的 read_only 模式，csv 使用标准库 csv.reader；
+  3. iter_batches: 按 batch_size 把行转换成 列式 的批次 {列名: [值...]}，同时做类型转换和校验，
+     列类型根据前 INFER_SAMPLE_ROWS 行推断，之后遇到更宽的值时继续放宽（int -> float -> str）；
+  4. submit_job: 把上面的流程交给后台线程池执行，写入数据库，立即返回 job_id，前端通过 get_job 轮询进度.
+任务状态保存在 JOB_DIR 下的 JSON 文件中（每个任务一个文件，后台线程每写完一个批次更新一次），
+gunicorn 的多个 worker 进程都能查到同一个任务，不管轮询请求落到哪个进程；多台机器部署时 SPOOL_DIR 需要是共享目录.
+最后一次更新超过 app.config['INGEST_JOB_TTL']（默认 JOB_TTL_SECONDS）秒的任务会被清理.
+"""
+import os
+import re
+import csv
+import json
+import time
+import uuid
+import shutil
+import tempfile
+from datetime import datetime, date
+from itertools import chain, islice
+from concurrent.futures import ThreadPoolExecutor
+from openpyxl import load_workbook
+from werkzeug.datastructures import FileStorage
+from extensions import db
+
+CHUNK_SIZE = 1024 * 1024
+BATCH_SIZE = 5000
+SPOOL_DIR = os.path.join(tempfile.gettempdir(), 'hello_flask_uploads')
+ALLOWED_SUFFIXES = ('.xlsx', '.csv')
+JOB_DIR = os.path.join(SPOOL_DIR, 'jobs')
+JOB_TTL_SECONDS = 24 * 3600
+_JOB_ID = re.compile(r'^[0-9a-f]{32}$')
+
+# 导入任务在后台线程池里执行，数量限制住，避免大文件把数据库连接占满
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='ingest')
+
+
+class IngestJob:
+    """一个导入任务的状态，所有字段只在后台线程里修改，to_dict 用于进度查询"""
+    MAX_ERRORS = 100
+
+    def __init__(self, job_id: str, filename: str, path: str):
+        self.job_id = job_id
+        self.filename = filename
+        self.path = path
+        self.status = 'pending'  # pending -> running -> done / failed
+        self.rows_total = None   # xlsx 可以从 sheet 的维度信息拿到，csv 为 None
+        self.rows_done = 0
+        self.rows_invalid = 0
+        self.errors = []         # 只保留前 MAX_ERRORS 条行级错误
+        self.message = None
+        self.created_at = datetime.now()
+        self.finished_at = None
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'IngestJob':
+        job = cls(job_id=data['job_id'], filename=data['filename'], path=None)
+        for name in ('status', 'rows_total', 'rows_done', 'rows_invalid', 'errors', 'message'):
+            setattr(job, name, data[name])
+        job.created_at = datetime.fromisoformat(data['created_at'])
+        job.finished_at = datetime.fromisoformat(data['finished_at']) if data['finished_at'] else None
+        return job
+
+    def save(self, job_dir: str = JOB_DIR):
+        """写入状态文件：先写临时文件再 os.replace，其他进程读到的总是完整的 JSON"""
+        os.makedirs(job_dir, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(suffix='.tmp', dir=job_dir)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False)
+        os.replace(tmp, os.path.join(job_dir, f"{self.job_id}.json"))
+
+    def to_dict(self):
+        progress = None
+        if self.rows_total:
+            progress = round(min((self.rows_done + self.rows_invalid) / self.rows_total, 1.0), 4)
+        elif self.status == 'done':
+            progress = 1.0
+        return {
+            'job_id': self.job_id,
+            'filename': self.filename,
+            'status': self.status,
+            'rows_total': self.rows_total,
+            'rows_done': self.rows_done,
+            'rows_invalid': self.rows_invalid,
+            'progress': progress,
+            'errors': self.errors,
+            'message': self.message,
+            'created_at': self.created_at.isoformat(),
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+def spool_upload(file: FileStorage, spool_dir: str = SPOOL_DIR, chunk_size: int = CHUNK_SIZE) -> str:
+    """按块把上传文件写到磁盘，返回文件路径"""
+    suffix = os.path.splitext(file.filename or '')[1].lower()
+    if suffix not in ALLOWED_SUFFIXES:
+        raise ValueError(f"unsupported file type '{suffix}', only {ALLOWED_SUFFIXES} are allowed")
+    os.makedirs(spool_dir, exist_ok=True)
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=spool_dir)
+    with os.fdopen(fd, 'wb') as f:
+        shutil.copyfileobj(file.stream, f, chunk_size)
+    return path
+
+
+def iter_rows(path: str, sheet_name: str = None, on_total=None):
+    """
+    增量读取文件中的行，第一行是表头.
+    :param on_total: 回调函数，如果能得到总行数（不含表头），就调用它
+    """
+    if path.lower().endswith('.csv'):
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            yield from csv.reader(f)
+        return
+    # read_only 模式下 openpyxl 按行流式解析 xml，不会构建整个 sheet 的单元格对象
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet_name] if sheet_name else wb.worksheets[0]
+        if on_total is not None and ws.max_row:
+            on_total(ws.max_row - 1)
+        yield from ws.iter_rows(values_only=True)
+    finally:
+        wb.close()
+
+
+def _to_int(value):
+    if isinstance(value, bool):
+        raise ValueError(f"{value!r} is not an integer")
+    if isinstance(value, float):
+        if not value.is_integer():
+            raise ValueError(f"{value!r} is not an integer")
+        return int(value)
+    return int(value)
+
+
+def _to_date(value):
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    return datetime.fromisoformat(str(value))
+
+
+CONVERTERS = {
+    'int': _to_int,
+    'float': float,
+    'str': str,
+    'datetime': _to_date,
+}
+
+
+# 以 0 开头的多位数字（编号、邮编、电话等），转成数字会丢掉前导 0，按字符串处理
+_LEADING_ZERO = re.compile(r'^[+-]?0\d')
+# 推断列类型时先读取的样本行数
+INFER_SAMPLE_ROWS = 1000
+
+
+def _infer_type(value) -> str:
+    """推断单个值的类型，csv 里读出来的都是字符串，需要尝试转换"""
+    if isinstance(value, bool):
+        return 'str'
+    if isinstance(value, int):
+        return 'int'
+    if isinstance(value, float):
+        return 'float'
+    if isinstance(value, (datetime, date)):
+        return 'datetime'
+    if _LEADING_ZERO.match(str(value)):
+        return 'str'
+    for type_name in ('int', 'float', 'datetime'):
+        try:
+            CONVERTERS[type_name](value)
+            return type_name
+        except (TypeError, ValueError):
+            continue
+    return 'str'
+
+
+def _widen(current: str | None, other: str) -> str:
+    """能同时容纳两种类型的最窄类型：int + float -> float，其他不同的组合 -> str"""
+    if current is None or current == other:
+        return other
+    if {current, other} == {'int', 'float'}:
+        return 'float'
+    return 'str'
+
+
+def _infer_types(header: list, rows: list) -> dict:
+    """根据样本行推断每一列的类型，全部为空的列不出现在结果中"""
+    types = {}
+    for row in rows:
+        for i, name in enumerate(header):
+            value = row[i] if i < len(row) else None
+            if value is None or value == '':
+                continue
+            types[name] = _widen(types.get(name), _infer_type(value))
+    return types
+
+
+def iter_batches(rows, batch_size: int = BATCH_SIZE, column_types: dict = None, on_error=None,
+                 sample_rows: int = INFER_SAMPLE_ROWS):
+    """
+    把行迭代器转换成列式批次，每个批次是 {列名: [值, ...]}.
+    :param rows: 行迭代器，第一行为表头
+    :param column_types: {列名: 'int'/'float'/'str'/'datetime'}，指定类型的列转换失败时该行校验失败
+    :param on_error: 回调 on_error(row_number, message)，行号从 1 开始（不含表头），校验失败的行会被跳过
+    :param sample_rows: 未指定类型的列，根据前 sample_rows 行推断类型（int 和 float 混合为 float，其他混合为 str）.
+        样本之后出现更宽的值时继续放宽类型：当前批次里已有的值一并转换，已经产出的批次不再修改
+    """
+    rows = iter(rows)
+    try:
+        header = [str(h).strip() if h is not None else f"column_{i}" for i, h in enumerate(next(rows))]
+    except StopIteration:
+        return
+    sample = list(islice(rows, sample_rows))
+    fixed = set(column_types or ())
+    types = _infer_types(header, sample)
+    types.update(column_types or {})
+    converters = [CONVERTERS[types[name]] if name in types else None for name in header]
+    width = len(header)
+    batch = {name: [] for name in header}
+    size = 0
+    for row_number, row in enumerate(chain(sample, rows), start=1):
+        if not any(v not in (None, '') for v in row):
+            continue  # 空行
+        values = []
+        try:
+            for i in range(width):
+                value = row[i] if i < len(row) else None
+                if value is None or value == '':
+                    values.append(None)
+                    continue
+                name = header[i]
+                if converters[i] is None:
+                    # 样本里全部为空的列
+                    types[name] = _infer_type(value)
+                    converters[i] = CONVERTERS[types[name]]
+                try:
+                    values.append(converters[i](value))
+                except (TypeError, ValueError):
+                    if name in fixed:
+                        raise
+                    # 放宽类型后重新转换
+                    types[name] = _widen(types.get(name), _infer_type(value))
+                    converters[i] = CONVERTERS[types[name]]
+                    if types[name] == 'str':
+                        batch[name] = [None if v is None else str(v) for v in batch[name]]
+                    values.append(converters[i](value))
+        except (TypeError, ValueError) as e:
+            if on_error is not None:
+                on_error(row_number, f"column '{header[i]}': {e}")
+            continue
+        for name, value in zip(header, values):
+            batch[name].append(value)
+        size += 1
+        if size >= batch_size:
+            yield batch
+            batch = {name: [] for name in header}
+            size = 0
+    if size:
+        yield batch
+
+
+_UNNAMED_COLUMN = re.compile(r'^column_\d+$')
+
+
+def _target_columns(table, batch: dict) -> list:
+    """
+    批次中要写入的列. 表头里有表中不存在的列时抛出 ValueError，而不是悄悄丢掉这一列的数据；
+    没有表头（iter_batches 命名为 column_N）并且这一批全部为空的列忽略.
+    """
+    columns = [name for name in batch if name in table.c]
+    if not columns:
+        raise ValueError(f"none of the file columns match table '{table.name}'")
+    unknown = [name for name, values in batch.items() if name not in table.c
+               and not (_UNNAMED_COLUMN.match(name) and all(v is None for v in values))]
+    if unknown:
+        raise ValueError(f"columns {unknown} do not exist in table '{table.name}'")
+    return columns
+
+
+def _run_job(app, job: IngestJob, table_name: str = None, sheet_name: str = None, batch_size: int = BATCH_SIZE):
+    """后台线程里执行的导入流程，table_name 为空时只做解析和校验，不写库"""
+    def on_total(total):
+        job.rows_total = total
+
+    def on_error(row_number, message):
+        job.rows_invalid += 1
+        if len(job.errors) < job.MAX_ERRORS:
+            job.errors.append({'row': row_number, 'error': message})
+
+    job.status = 'running'
+    job.save()
+    try:
+        with app.app_context():
+            table = None
+            if table_name:
+                table = db.Table(table_name, db.MetaData(), autoload_with=db.engine)
+            rows = iter_rows(job.path, sheet_name=sheet_name, on_total=on_total)
+            for batch in iter_batches(rows, batch_size=batch_size, on_error=on_error):
+                size = len(next(iter(batch.values())))
+                if table is not None:
+                    columns = _target_columns(table, batch)
+                    records = [dict(zip(columns, values)) for values in zip(*(batch[c] for c in columns))]
+                    # executemany，每个批次一个事务；参数列表为空时 SQLAlchemy 会插入一行全是默认值的数据，不能执行
+                    if records:
+                        with db.engine.begin() as conn:
+                            conn.execute(table.insert(), records)
+                job.rows_done += size
+                job.save()
+        job.status = 'done'
+    except Exception as e:
+        job.status = 'failed'
+        job.message = repr(e)
+        app.logger.exception(f"ingest job {job.job_id} failed")
+    finally:
+        job.finished_at = datetime.now()
+        job.save()
+        if os.path.exists(job.path):
+            os.remove(job.path)
+
+
+def submit_job(app, file: FileStorage, table_name: str = None, sheet_name: str = None,
+               batch_size: int = BATCH_SIZE) -> IngestJob:
+    """
+    落盘后提交到后台线程池，app 需要是真实的 Flask 对象（不是 current_app 代理）.
+    table_name 必须在 app.config['INGEST_ALLOWED_TABLES'] 中，否则抛出 ValueError —— 表名来自客户端，
+    不做限制的话任何人都可以往任意表（包括用户、权限表）里批量插入数据.
+    """
+    if table_name and table_name not in app.config.get('INGEST_ALLOWED_TABLES', ()):
+        raise ValueError(f"table '{table_name}' is not allowed for ingestion")
+    expire_jobs(app.config.get('INGEST_JOB_TTL', JOB_TTL_SECONDS))
+    path = spool_upload(file)
+    job = IngestJob(job_id=uuid.uuid4().hex, filename=file.filename, path=path)
+    job.save()
+    _executor.submit(_run_job, app, job, table_name, sheet_name, batch_size)
+    return job
+
+
+def get_job(job_id: str, job_dir: str = JOB_DIR) -> IngestJob | None:
+    """从状态文件读取任务，任何 worker 进程提交的任务都能查到"""
+    if not _JOB_ID.match(job_id):
+        return None
+    try:
+        with open(os.path.join(job_dir, f"{job_id}.json"), encoding='utf-8') as f:
+            return IngestJob.from_dict(json.load(f))
+    except FileNotFoundError:
+        return None
+
+
+def expire_jobs(ttl: float = JOB_TTL_SECONDS, job_dir: str = JOB_DIR) -> int:
+    """删除最后一次更新超过 ttl 秒的任务状态文件（包括 worker 进程退出后没有更新的任务），返回删除的数量"""
+    if not os.path.isdir(job_dir):
+        return 0
+    deadline = time.time() - ttl
+    removed = 0
+    for entry in os.scandir(job_dir):
+        try:
+            if entry.stat().st_mtime < deadline:
+                os.remove(entry.path)
+                removed += 1
+        except FileNotFoundError:
+            # 其他进程同时在清理
+            continue
+    return removed
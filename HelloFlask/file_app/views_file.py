@@ -1,5 +1,6 @@
 import pandas as pd
 from flask import Blueprint, request, current_app, jsonify
+from .ingest import submit_job, get_job
 
 file_bp = Blueprint('file', __name__)
 
@@ -14,3 +15,30 @@ def upload():
     return "File saved successfully"
 
 
+# 上面的 upload 会在请求线程里把整个 Excel 读进内存，大文件时内存和响应时间都不可控.
+# 下面的流式导入：文件按块落盘后交给后台线程增量解析、分批写库，请求立即返回 job_id，再通过 GET 接口轮询进度.
+# 表单参数：
+#   file: 上传的 .xlsx/.csv 文件
+#   table: 可选，写入的目标表名（表需要已存在，列名和文件表头对应，并且在配置 INGEST_ALLOWED_TABLES 中，否则返回 400），
+#          不传时只做解析和校验
+#   sheet: 可选，xlsx 的 sheet 名称，默认第一个
+@file_bp.route('/file/ingest', methods=['POST'])
+def ingest():
+    file = request.files.get('file')
+    if file is None or not file.filename:
+        return jsonify(code=400, msg="missing upload file 'file'"), 400
+    try:
+        # 后台线程里需要真实的 app 对象来创建 app_context
+        job = submit_job(current_app._get_current_object(), file,
+                         table_name=request.form.get('table'), sheet_name=request.form.get('sheet'))
+    except ValueError as e:
+        return jsonify(code=400, msg=str(e)), 400
+    return jsonify(code=202, msg='accepted', data=job.to_dict()), 202
+
+
+@file_bp.route('/file/ingest/<job_id>', methods=['GET'])
+def ingest_progress(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify(code=404, msg=f"job '{job_id}' not found"), 404
+    return jsonify(code=200, msg='success', data=job.to_dict())
@@ -0,0 +1,130 @@
+"""
+压测 serve.py 的几种启动模式，对比 /rest 和 /jwt_bp 接口的 req/s 和 p99 延迟.
+每种模式会用子进程启动一次 serve.py，压测结束后关闭，保证各模式之间互不影响.
+客户端使用多线程 + requests.Session，客户端本身也受 GIL 影响，压测机最好和服务端分开，或者调低 --concurrency 观察趋势.
+用法（在 HelloFlask 目录下）：
+    python loadtest.py --modes prefork threaded gevent --concurrency 50 --duration 10
+"""
+import sys
+import time
+import socket
+import argparse
+import threading
+import subprocess
+import requests
+
+# (名称, 方法, 路径, 是否需要 JWT)
+ENDPOINTS = [
+    ('rest_parser', 'GET', '/rest/parser?arg=hello&array=1&array=2', False),
+    ('rest_person', 'GET', '/rest/person?name=nico', False),
+    ('jwt_current_user', 'GET', '/jwt_bp/current_user', True),
+]
+
+
+def wait_port(host: str, port: int, timeout: float = 30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise TimeoutError(f"server at {host}:{port} is not ready after {timeout}s")
+
+
+def login(base_url: str) -> str:
+    # JWT_ACCESS_TOKEN_EXPIRES 只有 20s，压测时间更长时需要重新登录
+    resp = requests.post(f"{base_url}/jwt_bp/login_mock", json={'username': 'admin', 'password': 'admin'})
+    resp.raise_for_status()
+    return resp.json()['access_token']
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(int(q * len(sorted_values)), len(sorted_values) - 1)]
+
+
+def run_endpoint(base_url: str, method: str, path: str, need_jwt: bool, concurrency: int, duration: float) -> dict:
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    token = {'value': login(base_url) if need_jwt else None, 'at': time.time()}
+    stop_at = time.time() + duration
+
+    def worker():
+        session = requests.Session()
+        local_latencies, local_errors = [], 0
+        while time.time() < stop_at:
+            headers = None
+            if need_jwt:
+                headers = {'Authorization': f"Bearer {token['value']}"}
+            start = time.perf_counter()
+            try:
+                resp = session.request(method, base_url + path, headers=headers)
+                ok = resp.status_code == 200
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - start
+            if ok:
+                local_latencies.append(elapsed)
+            else:
+                local_errors += 1
+        with lock:
+            latencies.extend(local_latencies)
+            errors[0] += local_errors
+
+    def refresher():
+        while need_jwt and time.time() < stop_at:
+            time.sleep(1)
+            if time.time() - token['at'] > 15:
+                token['value'], token['at'] = login(base_url), time.time()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)] + [threading.Thread(target=refresher)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'rps': len(latencies) / elapsed,
+        'p50_ms': percentile(latencies, 0.5) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+    }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--config', default='prod')
+    arg_parser.add_argument('--modes', nargs='+', default=['prefork', 'threaded', 'gevent'])
+    arg_parser.add_argument('--workers', type=int, default=4)
+    arg_parser.add_argument('--host', default='127.0.0.1')
+    arg_parser.add_argument('--port', type=int, default=8300)
+    arg_parser.add_argument('--concurrency', type=int, default=50)
+    arg_parser.add_argument('--duration', type=float, default=10)
+    args = arg_parser.parse_args()
+
+    base_url = f"http://{args.host}:{args.port}"
+    results = []
+    for mode in args.modes:
+        cmd = [sys.executable, 'serve.py', '--config', args.config, '--mode', mode,
+               '--host', args.host, '--port', str(args.port), '--workers', str(args.workers)]
+        server = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_port(args.host, args.port)
+            for name, method, path, need_jwt in ENDPOINTS:
+                stat = run_endpoint(base_url, method, path, need_jwt, args.concurrency, args.duration)
+                results.append((mode, name, stat))
+                print(f"{mode:<9} {name:<18} req/s: {stat['rps']:9.1f} | p50: {stat['p50_ms']:7.2f} ms "
+                      f"| p99: {stat['p99_ms']:7.2f} ms | errors: {stat['errors']}")
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+    return results
+
+
+if __name__ == '__main__':
+    main()
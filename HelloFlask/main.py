@@ -3,6 +3,7 @@ import logging
 from flask import Flask
 from configs import config
 from extensions import db
+from pool_metrics import init_pool_metrics
 from rest_app import restful_bp, ClassBasedViews, webargs_bp
 from auth_app.exts import login_manager, jwt, principal
 from auth_app import login_bp, http_auth_bp, jwt_bp, principal_bp
@@ -24,6 +25,8 @@ def create_app(config_name: str = 'dev'):
     # ------ 初始化扩展 ---------
     db.init_app(app)
     app.db = db  # 设置一下，以便在 flask-shell 或者 with app.app_context() 里拿到 db 对象进行调试
+    if app.config.get('SQLALCHEMY_POOL_METRICS', False):
+        init_pool_metrics(app, db)
     ClassBasedViews.register(app)
     login_manager.init_app(app)
     jwt.init_app(app)
@@ -41,6 +44,7 @@ if __name__ == '__main__':
         print("****** creating all tables done. ******")
     print(app.url_map)
     app.logger.setLevel(logging.DEBUG)
+    # 这里是单进程的开发服务器，生产环境使用 serve.py 启动
     app.run(host='localhost', port=8100)
     # app.run(host='10.8.6.203', port=8100)
 
@@ -0,0 +1,134 @@
+"""
+SQLAlchemy 连接池指标.
++ TimedQueuePool: QueuePool 的子类，统计从连接池获取连接时的等待耗时（pool 事件里没有"开始获取连接"的钩子，只能在 _do_get 里计时）
++ PoolMetrics: 通过 pool 事件（connect/checkout/checkin/invalidate）统计连接的创建次数、借出次数、占用时长等
+使用方式：
+  1. 配置里设置 SQLALCHEMY_ENGINE_OPTIONS = {'poolclass': TimedQueuePool, ...}，见 configs.ProductionConfig；
+  2. create_app 中 db.init_app(app) 之后调用 init_pool_metrics(app)，之后通过 app.extensions['pool_metrics'].snapshot() 查看.
+"""
+import time
+import threading
+from collections import deque
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+
+def _percentile(sorted_values: list, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(int(round(q * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[idx]
+
+
+class PoolMetrics:
+    """连接池指标，耗时单位都是 ms，只保留最近 max_samples 个样本用于计算分位数"""
+
+    def __init__(self, max_samples: int = 10000):
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.wait_timeouts = 0
+        self.wait_ms = deque(maxlen=max_samples)
+        self.hold_ms = deque(maxlen=max_samples)
+
+    def record_wait(self, elapsed_ms: float, timeout: bool = False):
+        with self._lock:
+            self.wait_ms.append(elapsed_ms)
+            if timeout:
+                self.wait_timeouts += 1
+
+    def attach(self, pool):
+        """在 pool 上注册事件监听"""
+
+        @event.listens_for(pool, 'connect')
+        def on_connect(dbapi_conn, conn_record):
+            with self._lock:
+                self.connects += 1
+
+        @event.listens_for(pool, 'checkout')
+        def on_checkout(dbapi_conn, conn_record, conn_proxy):
+            conn_record.info['checkout_at'] = time.perf_counter()
+            with self._lock:
+                self.checkouts += 1
+
+        @event.listens_for(pool, 'checkin')
+        def on_checkin(dbapi_conn, conn_record):
+            checkout_at = conn_record.info.pop('checkout_at', None)
+            with self._lock:
+                self.checkins += 1
+                if checkout_at is not None:
+                    self.hold_ms.append((time.perf_counter() - checkout_at) * 1000)
+
+        @event.listens_for(pool, 'invalidate')
+        def on_invalidate(dbapi_conn, conn_record, exception):
+            with self._lock:
+                self.invalidations += 1
+
+        if isinstance(pool, TimedQueuePool):
+            pool.metrics = self
+        return self
+
+    def snapshot(self, pool=None) -> dict:
+        with self._lock:
+            wait = sorted(self.wait_ms)
+            hold = sorted(self.hold_ms)
+            result = {
+                'connects': self.connects,
+                'checkouts': self.checkouts,
+                'checkins': self.checkins,
+                'invalidations': self.invalidations,
+                'wait_timeouts': self.wait_timeouts,
+            }
+        for name, values in (('wait_ms', wait), ('hold_ms', hold)):
+            result[name] = {
+                'count': len(values),
+                'avg': sum(values) / len(values) if values else 0.0,
+                'p50': _percentile(values, 0.5),
+                'p90': _percentile(values, 0.9),
+                'p99': _percentile(values, 0.99),
+                'max': values[-1] if values else 0.0,
+            }
+        if pool is not None and isinstance(pool, QueuePool):
+            result['pool'] = {
+                'size': pool.size(),
+                'checked_in': pool.checkedin(),
+                'checked_out': pool.checkedout(),
+                'overflow': pool.overflow(),
+            }
+        return result
+
+
+class TimedQueuePool(QueuePool):
+    """统计获取连接等待时间的 QueuePool，metrics 由 PoolMetrics.attach 设置"""
+    metrics: PoolMetrics = None
+
+    def _do_get(self):
+        metrics = self.metrics
+        if metrics is None:
+            return super()._do_get()
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except Exception:
+            # 连接池耗尽并且等待超时时，会抛出 sqlalchemy.exc.TimeoutError
+            metrics.record_wait((time.perf_counter() - start) * 1000, timeout=True)
+            raise
+        metrics.record_wait((time.perf_counter() - start) * 1000)
+        return conn
+
+    def recreate(self):
+        # engine.dispose() 等操作会重建 pool，需要把 metrics 带过去
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+def init_pool_metrics(app, db) -> PoolMetrics:
+    """给 app 对应的 engine 的连接池注册指标监听"""
+    metrics = PoolMetrics(max_samples=app.config.get('SQLALCHEMY_POOL_METRICS_SAMPLES', 10000))
+    with app.app_context():
+        metrics.attach(db.engine.pool)
+    app.extensions['pool_metrics'] = metrics
+    return metrics
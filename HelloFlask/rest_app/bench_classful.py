@@ -0,0 +1,40 @@
+"""
+对比 ClassBasedViews 在 stateless=False（原始行为）和 stateless=True（共享实例 + 注册时预解析钩子）两种模式下的单请求开销.
+使用 Flask 的 test_client 直接调用，不经过网络，测的是 路由分发 + proxy 的开销.
+用法（在 HelloFlask 目录下）： python -m rest_app.bench_classful
+"""
+import io
+import time
+import contextlib
+from flask import Flask
+from rest_app.views_classful import ClassBasedViews
+
+
+def build_app(stateless: bool) -> Flask:
+    app = Flask(__name__)
+    # 用一个子类来切换模式，避免修改 ClassBasedViews 本身的类属性
+    view_cls = type('ClassBasedViews', (ClassBasedViews,), {'stateless': stateless})
+    view_cls.register(app)
+    return app
+
+
+def bench(app: Flask, url: str, rounds: int) -> float:
+    client = app.test_client()
+    # 视图和钩子里有大量 print，这里丢弃掉，避免 IO 干扰计时
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(100):
+            client.get(url)
+        start = time.perf_counter()
+        for _ in range(rounds):
+            client.get(url)
+        end = time.perf_counter()
+    return (end - start) / rounds * 1e6
+
+
+if __name__ == '__main__':
+    rounds = 20000
+    for url in ['/prefix/base/info', '/prefix/base/auto_info/', '/prefix/base/']:
+        normal = bench(build_app(stateless=False), url, rounds)
+        stateless = bench(build_app(stateless=True), url, rounds)
+        print(f"{url:<28} stateless=False: {normal:8.2f} us/req | stateless=True: {stateless:8.2f} us/req "
+              f"| reduction: {(normal - stateless) / normal:6.2%}")
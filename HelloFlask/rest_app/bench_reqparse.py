@@ -0,0 +1,68 @@
+"""
+对比 RequestParser.parse_args() 和 compile_parser() 预编译后的 parse_args() 的耗时，
+同时检查两者的解析结果、错误信息是否一致.
+用法（在 HelloFlask 目录下）： python -m rest_app.bench_reqparse
+"""
+import time
+from flask import Flask
+from werkzeug.exceptions import HTTPException
+from rest_app.views_restful import (
+    parser, parser_compiled, parser_body, parser_body_compiled,
+    person_parser_get, person_parser_get_compiled, person_parser_body, person_parser_body_compiled,
+    person_address_parser, person_address_parser_compiled,
+)
+
+app = Flask(__name__)
+
+# (名称, 原始parser, 编译后的parser, test_request_context 的参数)
+CASES = [
+    ('ParserTest.get', parser, parser_compiled,
+     dict(path='/rest/parser?arg=a&array=1&array=2&size=10&index=3', method='GET')),
+    ('ParserTest.get[error]', parser, parser_compiled,
+     dict(path='/rest/parser?array=1&size=100', method='GET')),
+    ('ParserTest.post', parser_body, parser_body_compiled,
+     dict(path='/rest/parser?arg=a', method='POST',
+          json={'boolean': 'true', 'date': '2024-01-01', 'pos_int': 3, 'range_int': 10})),
+    ('ParserTest.post[error]', parser_body, parser_body_compiled,
+     dict(path='/rest/parser?arg=a', method='POST', json={'pos_int': -1})),
+    ('Person.get', person_parser_get, person_parser_get_compiled,
+     dict(path='/rest/person?name=nico', method='GET')),
+    ('Person.post', person_parser_body, person_parser_body_compiled,
+     dict(path='/rest/person?name=tom', method='POST',
+          json={'age': 30, 'birthday': '1990-05-01', 'address': {'province': 'anhui', 'city': 'hefei'}})),
+]
+
+
+def run(p):
+    """返回 解析结果 或 错误信息"""
+    try:
+        return p.parse_args()
+    except HTTPException as e:
+        return getattr(e, 'data', e.description)
+
+
+def bench(p, ctx_kwargs, rounds):
+    with app.test_request_context(**ctx_kwargs):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            run(p)
+        end = time.perf_counter()
+    return (end - start) / rounds * 1e6
+
+
+if __name__ == '__main__':
+    rounds = 20000
+    for name, origin, compiled, ctx_kwargs in CASES:
+        with app.test_request_context(**ctx_kwargs):
+            assert run(origin) == run(compiled), f"{name}: compiled parser result differs"
+        t_origin = bench(origin, ctx_kwargs, rounds)
+        t_compiled = bench(compiled, ctx_kwargs, rounds)
+        print(f"{name:<24} RequestParser: {t_origin:8.2f} us | compiled: {t_compiled:8.2f} us "
+              f"| speedup: {t_origin / t_compiled:5.2f}x")
+    # Person 的嵌套 address 解析
+    ctx_kwargs = CASES[-1][3]
+    with app.test_request_context(**ctx_kwargs):
+        args = person_parser_body.parse_args()
+        args_compiled = person_parser_body_compiled.parse_args()
+        assert person_address_parser.parse_args(req=args) == person_address_parser_compiled.parse_args(req=args_compiled)
+    print("Person.post nested address: results are identical")
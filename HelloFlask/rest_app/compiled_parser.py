@@ -0,0 +1,219 @@
+"""
+把 flask_restful 的 reqparse.RequestParser 预编译成一个解析对象.
+RequestParser.parse_args() 每次调用都会对每个 Argument：
+  1. 重新调用 Argument.source() 取一次参数来源（同一个 location 会被反复取）；
+  2. 在 Argument.convert() 里依次尝试 type(value, name, op) -> type(value, name) -> type(value)，靠捕获 TypeError 来确定调用方式；
+  3. 每次重新拼接 operator 对应的参数名、判断 choices/case_sensitive 等.
+这里在模块导入时（也就是 add_argument 全部完成之后）把上面这些和请求无关的工作做完，请求时只剩下取值、转换和校验，
+解析结果以及错误信息和 RequestParser.parse_args() 保持一致.
+
+用法：
+    parser = reqparse.RequestParser()
+    parser.add_argument(...)
+    parser_compiled = compile_parser(parser)
+    # 视图函数中
+    args = parser_compiled.parse_args()
+"""
+import decimal
+import inspect
+import collections.abc
+from flask import current_app, request
+from flask_restful import abort
+from flask_restful.reqparse import RequestParser, Argument, _friendly_location
+from werkzeug import exceptions
+from werkzeug.datastructures import MultiDict, FileStorage
+
+# 这些内置类型只接受一个位置参数，inspect.signature 对其中一些拿不到签名，所以直接写死
+_SINGLE_ARG_TYPES = (str, int, float, bool, dict, list)
+
+
+def _type_arity(type_) -> int | None:
+    """确定 type 可以接受几个位置参数：3 -> (value, name, op)，2 -> (value, name)，1 -> (value)；无法确定时返回 None"""
+    if type_ in _SINGLE_ARG_TYPES:
+        return 1
+    try:
+        sig = inspect.signature(type_)
+    except (TypeError, ValueError):
+        return None
+    for n in (3, 2, 1):
+        try:
+            sig.bind(*range(n))
+            return n
+        except TypeError:
+            continue
+    return None
+
+
+def _source(req, location):
+    """和 Argument.source() 的逻辑一致"""
+    if isinstance(location, str):
+        value = getattr(req, location, MultiDict())
+        if callable(value):
+            value = value()
+        if value is not None:
+            return value
+        return MultiDict()
+    values = MultiDict()
+    for loc in location:
+        value = getattr(req, loc, None)
+        if callable(value):
+            value = value()
+        if value is not None:
+            values.update(value)
+    return values
+
+
+class CompiledArgument:
+    """单个 Argument 预先计算好的信息"""
+
+    def __init__(self, arg: Argument):
+        self.argument = arg
+        self.name = arg.name
+        self.dest = arg.dest or arg.name
+        self.location = arg.location
+        self.location_key = arg.location if isinstance(arg.location, str) else tuple(arg.location)
+        # (参数名, operator)，参数名 = name + 去掉第一个 '=' 的 operator
+        self.names = [(arg.name + op.replace("=", "", 1), op) for op in arg.operators]
+        self.required = arg.required
+        self.default = arg.default
+        self.ignore = arg.ignore
+        self.trim = arg.trim
+        self.lower = not arg.case_sensitive
+        self.append = arg.action == 'append'
+        self.store = arg.action == 'store'
+        self.store_missing = arg.store_missing
+        self.help = arg.help
+        choices = arg.choices
+        if choices and self.lower and hasattr(choices, "__iter__"):
+            choices = [choice.lower() for choice in choices]
+        self.choices = choices
+        if isinstance(arg.location, str):
+            self.missing_msg = "Missing required parameter in {0}".format(
+                _friendly_location.get(arg.location, arg.location))
+        else:
+            friendly_locations = [_friendly_location.get(loc, loc) for loc in arg.location]
+            self.missing_msg = "Missing required parameter in {0}".format(' or '.join(friendly_locations))
+        self.convert = self._make_converter(arg)
+
+    @staticmethod
+    def _make_converter(arg: Argument):
+        type_, name, nullable = arg.type, arg.name, arg.nullable
+        arity = _type_arity(type_)
+        if type_ is decimal.Decimal:
+            call = lambda value, op: type_(str(value))
+        elif arity == 3:
+            call = lambda value, op: type_(value, name, op)
+        elif arity == 2:
+            call = lambda value, op: type_(value, name)
+        elif arity == 1:
+            call = lambda value, op: type_(value)
+        else:
+            # 签名无法确定时，回退到 Argument 自己的 convert
+            return arg.convert
+
+        def convert(value, op):
+            if value is None:
+                if nullable:
+                    return None
+                raise ValueError('Must not be null!')
+            if isinstance(value, FileStorage) and type_ == FileStorage:
+                return value
+            return call(value, op)
+
+        return convert
+
+    def error_message(self, error: Exception) -> dict:
+        """和 Argument.handle_validation_error() 生成的错误信息一致"""
+        error_str = str(error)
+        error_msg = self.help.format(error_msg=error_str) if self.help else error_str
+        return {self.name: error_msg}
+
+
+class CompiledParser:
+    """RequestParser 的预编译版本，parse_args() 的参数和返回值都与 RequestParser.parse_args() 一致"""
+
+    def __init__(self, parser: RequestParser):
+        self.parser = parser
+        self.bundle_errors = parser.bundle_errors
+        self.namespace_class = parser.namespace_class
+        self.args = [CompiledArgument(arg) for arg in parser.args]
+        # strict 模式下，未定义参数的检查范围就是 Argument 的默认 location
+        self.default_location = parser.argument_class('').location
+
+    def parse_args(self, req=None, strict=False, http_error_code=400):
+        if req is None:
+            req = request
+        bundle_errors = current_app.config.get("BUNDLE_ERRORS", False) or self.bundle_errors
+        namespace = self.namespace_class()
+        unparsed = dict(_source(req, self.default_location)) if strict else {}
+        # 同一个 location 在一次解析中只取一次
+        sources = {}
+        errors = {}
+        for arg in self.args:
+            source = sources.get(arg.location_key)
+            if source is None:
+                source = sources[arg.location_key] = _source(req, arg.location)
+            results = []
+            error = None
+            for name, op in arg.names:
+                if name not in source:
+                    continue
+                if hasattr(source, "getlist"):
+                    values = source.getlist(name)
+                else:
+                    values = source.get(name)
+                    if not (isinstance(values, collections.abc.MutableSequence) and arg.append):
+                        values = [values]
+                for value in values:
+                    if arg.trim and hasattr(value, "strip"):
+                        value = value.strip()
+                    if arg.lower and hasattr(value, "lower"):
+                        value = value.lower()
+                    try:
+                        value = arg.convert(value, op)
+                    except Exception as e:
+                        if arg.ignore:
+                            continue
+                        error = e
+                        break
+                    if arg.choices and value not in arg.choices:
+                        error = ValueError("{0} is not a valid choice".format(value))
+                        break
+                    unparsed.pop(name, None)
+                    results.append(value)
+                if error is not None:
+                    break
+            if error is None and not results and arg.required:
+                error = ValueError(arg.missing_msg)
+
+            if error is not None:
+                msg = arg.error_message(error)
+                if not bundle_errors:
+                    abort(400, message=msg)
+                if isinstance(error, ValueError):
+                    errors.update(msg)
+                else:
+                    # RequestParser 在这种情况下会把异常对象本身放进结果里，这里保持一致
+                    namespace[arg.dest] = error
+                continue
+
+            if not results:
+                if arg.store_missing:
+                    namespace[arg.dest] = arg.default() if callable(arg.default) else arg.default
+            elif arg.append:
+                namespace[arg.dest] = results
+            elif arg.store or len(results) == 1:
+                namespace[arg.dest] = results[0]
+            else:
+                namespace[arg.dest] = results
+
+        if errors:
+            abort(http_error_code, message=errors)
+        if strict and unparsed:
+            raise exceptions.BadRequest('Unknown arguments: %s' % ', '.join(unparsed.keys()))
+        return namespace
+
+
+def compile_parser(parser: RequestParser) -> CompiledParser:
+    """必须在 parser 的所有 add_argument/replace_argument/remove_argument 调用之后再编译"""
+    return CompiledParser(parser)
@@ -66,6 +66,10 @@ class FlaskView:
     # TODO(hoatle): make method_dashified=True as default instead,
     # this is not a compatible change
     method_dashified = False
+    # when True, a single instance of the view class is shared by every route
+    # of one registration, and per-request hook lookups are resolved up front.
+    # Only declare this for views that keep no per-request state on `self`.
+    stateless = False
     special_methods = {
         "get": ["GET"],
         "put": ["PUT"],
@@ -155,8 +159,12 @@ class FlaskView:
 
         members = get_interesting_members(base_class, cls)
 
+        instance = None
+        if cls.stateless:
+            instance = cls() if init_argument is None else cls(init_argument)
+
         for name, value in members:
-            proxy = cls.make_proxy_method(name, init_argument)
+            proxy = cls.make_proxy_method(name, init_argument, instance=instance, app=app)
             route_name = cls.build_route_name(name)
 
             # This long try block calls build_rule() and add_url_rule()
@@ -262,26 +270,47 @@ class FlaskView:
         )
 
     @classmethod
-    def make_proxy_method(cls, name, init_argument):
+    def make_proxy_method(cls, name, init_argument, instance=None, app=None):
         """Creates a proxy function that can be used by Flasks routing. The
         proxy instantiates the FlaskView subclass and calls the appropriate
         method.
 
         :param name: the name of the method to create a proxy for
+        :param init_argument: passed to the constructor when instancing the class
+        :param instance: an already built instance to reuse (stateless views)
+        :param app: if provided, hooks are wrapped with ``app.ensure_sync`` once
+                    here instead of through ``current_app`` on every request
         """
 
-        if init_argument is None:
+        if not hasattr(app, "ensure_sync"):
+            # registering on a Blueprint: fall back to current_app per request
+            app = None
+
+        if instance is not None:
+            i = instance
+        elif init_argument is None:
             i = cls()
         else:
             i = cls(init_argument)
         view = getattr(i, name)
 
+        def ensure_sync(fn):
+            if fn is None:
+                return None
+            if app is not None:
+                return app.ensure_sync(fn)
+            return lambda *args, **kwargs: current_app.ensure_sync(fn)(*args, **kwargs)
+
         # Since the view is a bound instance method,
         # first make it an actual function
         # So function attributes work correctly
         def make_func(fn):
+            sync_fn = app.ensure_sync(fn) if app is not None else None
+
             @functools.wraps(fn)
             def inner(*args, **kwargs):
+                if sync_fn is not None:
+                    return sync_fn(*args, **kwargs)
                 return current_app.ensure_sync(fn)(*args, **kwargs)
 
             return inner
@@ -297,35 +326,42 @@ class FlaskView:
             for decorator in reversed(cls.decorators):
                 view = decorator(view)
 
+        # Resolve the request hooks and the representations once, at
+        # registration time, so the proxy does no attribute lookups per request
+        before_request = ensure_sync(getattr(i, "before_request", None))
+        before_view = ensure_sync(getattr(i, "before_" + name, None))
+        after_view = ensure_sync(getattr(i, "after_" + name, None))
+        after_request = ensure_sync(getattr(i, "after_request", None))
+        representations = dict(cls.representations)
+        representation_types = list(representations.keys())
+        default_representation = representations.get("flask-classful/default")
+
         @functools.wraps(view)
         def proxy(**forgettable_view_args):
             # Always use the global request object's view_args, because they
             # can be modified by intervening function before an endpoint or
             # wrapper gets called. This matches Flask's behavior.
             del forgettable_view_args
+            view_args = request.view_args
 
-            if hasattr(i, "before_request"):
-                response = current_app.ensure_sync(i.before_request)(
-                    name, **request.view_args
-                )
+            if before_request is not None:
+                response = before_request(name, **view_args)
                 if response is not None:
                     return response
 
-            before_view_name = "before_" + name
-            if hasattr(i, before_view_name):
-                before_view = getattr(i, before_view_name)
-                response = current_app.ensure_sync(before_view)(**request.view_args)
+            if before_view is not None:
+                response = before_view(**view_args)
                 if response is not None:
                     return response
 
-            response = view(**request.view_args)
+            response = view(**view_args)
             code, headers = None, None
 
             if isinstance(response, tuple):
                 response, code, headers = unpack(response)
 
             if not isinstance(response, ResponseBase):
-                if not bool(cls.representations):
+                if not representations:
                     # representations is empty, then the default is to just
                     # output what the view function returned as a response
                     response = make_response(response, code, headers)
@@ -333,17 +369,15 @@ class FlaskView:
                     # Return the representation that best matches the
                     # representations in the Accept header
                     resp_representation = request.accept_mimetypes.best_match(
-                        cls.representations.keys()
+                        representation_types
                     )
 
                     if resp_representation:
-                        response = cls.representations[resp_representation](
-                            response, code, headers
-                        )
-                    elif "flask-classful/default" in cls.representations:
-                        response = cls.representations["flask-classful/default"](
+                        response = representations[resp_representation](
                             response, code, headers
                         )
+                    elif default_representation is not None:
+                        response = default_representation(response, code, headers)
                     else:
                         # Nothing adequate found, return what the view function
                         # gave us for predictability
@@ -355,13 +389,11 @@ class FlaskView:
                 # the key appropriately
                 response = make_response(response, code, headers)
 
-            after_view_name = "after_" + name
-            if hasattr(i, after_view_name):
-                after_view = getattr(i, after_view_name)
-                response = current_app.ensure_sync(after_view)(response)
+            if after_view is not None:
+                response = after_view(response)
 
-            if hasattr(i, "after_request"):
-                response = current_app.ensure_sync(i.after_request)(name, response)
+            if after_request is not None:
+                response = after_request(name, response)
 
             return response
 
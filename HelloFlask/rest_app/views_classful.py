@@ -30,6 +30,9 @@ class ClassBasedViews(FlaskView):
     excluded_methods = ['exclude_fun']
     # 统一设置装饰器，应用于每个视图函数上
     decorators = [dec, dec_param(param='hello')]
+    # 视图类里没有保存请求级别的状态，声明为无状态后，注册时只创建一个实例供所有路由共享，
+    # 并且 before/after 钩子在注册时就解析好，请求时不再做 hasattr/getattr 查找
+    stateless = True
 
     # 手动设置视图函数
     @route('/info', methods=['GET'])
@@ -2,6 +2,7 @@ from flask import Blueprint, request
 from flask_restful import Api, Resource, reqparse, inputs, fields, marshal_with
 from datetime import datetime
 from flask.views import View, MethodView
+from .compiled_parser import compile_parser
 
 
 restful_bp = Blueprint('rest', __name__, url_prefix='/rest')
@@ -56,12 +57,18 @@ parser_body.add_argument('range_int', type=inputs.int_range(0, 20), location='js
 parser.add_argument('size', type=inputs.int_range(5, 20), default=20, location='args', help='page size should in [5, 20]')
 parser.add_argument('index', type=inputs.positive, default=1, location='args', help='page index should > 0')
 
+# parse_args() 每次都会重新遍历所有参数、取参数来源、试探 type 的调用方式，这些工作和具体请求无关，
+# 所以在所有 add_argument 完成之后预编译一份，视图函数里使用编译后的解析器，结果和错误信息与原始 parser 一致，
+# 见 compiled_parser.py
+parser_compiled = compile_parser(parser)
+parser_body_compiled = compile_parser(parser_body)
+
 # Resource 类实际上是对 MethodView 类的封装
 class ParserTest(Resource):
     def get(self):
         # RequestParser 对象必须在视图函数中解析验证
         # GET 请求使用的 RequestParser 里，不能有 location='json' 的参数，否则会报错，所以这里不能使用 parser_body 这个 parser
-        args = parser.parse_args()
+        args = parser_compiled.parse_args()
         result = {
             'arg': args.arg,  # 这个参数必须要有，否则会返回 400，提示缺少该请求参数
             'arg_default': args.arg_default,  # 有默认值的参数
@@ -74,7 +81,7 @@ class ParserTest(Resource):
 
     def post(self):
         # POST 请求使用的是 parser_body 这个 parser
-        args = parser_body.parse_args()
+        args = parser_body_compiled.parse_args()
         # 没有传入的话，参数值是 None
         print('args.pos_int: ', args.pos_int)
         # date 如果有，是 datetime.datetime 类型
@@ -123,6 +130,10 @@ person_address_parser.add_argument('city', type=str, location=('address', ), hel
 # 然后先解析验证上一层参数，再传入下一层 —— 也要在视图函数中解析
 # person_args = person_parser_body.parse_args()
 # person_address_args = person_address_parser.parse_args(req=person_args)
+# 同样预编译一份
+person_parser_get_compiled = compile_parser(person_parser_get)
+person_parser_body_compiled = compile_parser(person_parser_body)
+person_address_parser_compiled = compile_parser(person_address_parser)
 
 # Flask-restful 提供了 fields.XXX 类型指定 + marshal_with() 装饰器，用于格式化返回数据的结构
 person_fields = {
@@ -138,7 +149,7 @@ person_fields = {
 class Person(Resource):
     @marshal_with(person_fields)
     def get(self):
-        args = person_parser_get.parse_args()
+        args = person_parser_get_compiled.parse_args()
         name = args.name
         print('Person.GET name: ', name)
         if name in PERSON:
@@ -149,8 +160,8 @@ class Person(Resource):
 
     @marshal_with(person_fields, envelope='person')  # envelope 表示是否用指定的 key 来对数据进行一层封装
     def post(self):
-        args = person_parser_body.parse_args()
-        address_args = person_address_parser.parse_args(req=args)
+        args = person_parser_body_compiled.parse_args()
+        address_args = person_address_parser_compiled.parse_args(req=args)
         name = args.name
         age = args.age
         birthday = args.birthday
@@ -166,8 +177,8 @@ class Person(Resource):
     # 这里 PUT 的逻辑和 POST 一样
     @marshal_with(person_fields, envelope='person')
     def put(self):
-        args = person_parser_body.parse_args()
-        address_args = person_address_parser.parse_args(req=args)
+        args = person_parser_body_compiled.parse_args()
+        address_args = person_address_parser_compiled.parse_args(req=args)
         name = args.name
         age = args.age
         birthday = args.birthday
@@ -181,7 +192,7 @@ class Person(Resource):
 
     @marshal_with(person_fields, envelope='person')
     def delete(self):
-        args = person_parser_get.parse_args()
+        args = person_parser_get_compiled.parse_args()
         name = args.name
         print('Person.DELETE name: ', name)
         if name in PERSON:
@@ -63,6 +63,11 @@ user_schema = {
     "email": fields.Email(required=False),
     "password": fields.Str(required=True, validate=validate.Length(min=4, max=16)),
 }
+# parser.parse() 传入 dict 时，每次请求都会调用 Schema.from_dict() 重新生成一个 Schema 类并实例化，开销不小；
+# 这里在导入时就生成好 Schema 实例，parser.parse() 直接复用，校验规则和错误信息都不变.
+# （use_args/use_kwargs 装饰器在装饰时已经做了这一步，所以不需要处理）
+UserSchema = Schema.from_dict(user_schema, name='UserSchema')
+user_schema_obj = UserSchema()
 
 
 # 第一种使用方式，使用 parser 解析请求
@@ -90,7 +95,7 @@ def handle_error(error: ValidationError, req: Request, schema, *, error_status_c
 
 @webargs_bp.route("/register/v1", methods=["POST"])
 def register_v1():
-    args = parser.parse(argmap=user_schema, req=request)
+    args = parser.parse(argmap=user_schema_obj, req=request)
     print(f"register-v1 -> args: {args}")
     return jsonify(args)
 
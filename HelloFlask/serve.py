@@ -0,0 +1,123 @@
+"""
+生产环境启动入口，main.py 里的 app.run() 是 Werkzeug 的单进程开发服务器，不能用于生产.
+这里使用 gunicorn 的编程接口启动 create_app() 创建的应用，支持 3 种模式：
+  + prefork: 多个 sync worker 进程，每个进程同一时间只处理一个请求，适合 CPU 密集型请求
+  + threaded: 多个 gthread worker 进程，每个进程里有一个线程池
+  + gevent: 多个 gevent worker 进程，每个进程里用协程处理请求，适合 IO 密集型请求（比如大量等待数据库）.
+    gevent 依赖 monkey patch 把标准库的 socket/threading 等替换成协作式的实现，所以：
+      1. monkey patch 必须在导入其他任何模块之前执行，因此本文件先解析命令行参数（或 FLASK_SERVER_MODE 环境变量），再 patch，
+         最后才导入配置和 Flask 应用；
+      2. 数据库驱动必须是纯 Python 实现（比如 pymysql），C 扩展实现的驱动（比如 mysqlclient）的网络 IO 不经过 socket 模块，
+         patch 不到，会阻塞整个 worker 进程，见 check_gevent_driver().
+默认参数来自 configs.py 里的 SERVER_XXX 配置.
+用法（在 HelloFlask 目录下）：
+    python serve.py --config prod --mode prefork
+    python serve.py --config prod --mode gevent --workers 4
+"""
+import os
+import sys
+import argparse
+
+MODES = ('prefork', 'threaded', 'gevent')
+# 可以被 gevent monkey patch 成协作式 IO 的数据库驱动（纯 Python 实现，使用标准库 socket）.
+# pysqlite、mysqlclient、psycopg2 等 C 扩展的 IO 不经过 Python 的 socket，查询期间会阻塞整个 worker
+GEVENT_SAFE_DRIVERS = ('pymysql',)
+
+
+def parse_args(argv=None):
+    arg_parser = argparse.ArgumentParser(description='production server for HelloFlask')
+    arg_parser.add_argument('--config', default=os.environ.get('FLASK_CONFIG', 'prod'))
+    arg_parser.add_argument('--mode', choices=MODES, default=None)
+    arg_parser.add_argument('--host', default=None)
+    arg_parser.add_argument('--port', type=int, default=None)
+    arg_parser.add_argument('--workers', type=int, default=None)
+    arg_parser.add_argument('--threads', type=int, default=None)
+    arg_parser.add_argument('--worker-connections', type=int, default=None)
+    return arg_parser.parse_args(argv)
+
+
+def check_gevent_driver(database_uri: str):
+    from sqlalchemy.engine import make_url
+    driver = make_url(database_uri).get_driver_name()
+    if driver not in GEVENT_SAFE_DRIVERS:
+        raise RuntimeError(f"database driver '{driver}' can not be patched by gevent, "
+                           f"use one of {GEVENT_SAFE_DRIVERS} in SQLALCHEMY_DATABASE_URI")
+
+
+def build_options(app_config, args) -> dict:
+    """把 configs.py 的配置和命令行参数转换成 gunicorn 的配置项"""
+    mode = args.mode or app_config.get('SERVER_MODE', 'prefork')
+    host = args.host or app_config.get('SERVER_HOST', '0.0.0.0')
+    port = args.port or app_config.get('SERVER_PORT', 8100)
+    options = {
+        'bind': f"{host}:{port}",
+        'workers': args.workers or app_config.get('SERVER_WORKERS', 1),
+        'timeout': app_config.get('SERVER_TIMEOUT', 30),
+        'accesslog': None,
+    }
+    if mode == 'prefork':
+        options['worker_class'] = 'sync'
+    elif mode == 'threaded':
+        options['worker_class'] = 'gthread'
+        options['threads'] = args.threads or app_config.get('SERVER_THREADS', 4)
+    elif mode == 'gevent':
+        options['worker_class'] = 'gevent'
+        options['worker_connections'] = args.worker_connections or app_config.get('SERVER_WORKER_CONNECTIONS', 1000)
+    else:
+        raise ValueError(f"unknown server mode '{mode}', should be one of {MODES}")
+    return options
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    # gevent 的 patch 要在导入 configs（它会导入 sqlalchemy）之前完成，所以这里只能根据命令行参数或环境变量判断模式
+    early_mode = args.mode or os.environ.get('FLASK_SERVER_MODE')
+    if early_mode == 'gevent':
+        from gevent import monkey
+        monkey.patch_all()
+
+    from configs import config
+    config_obj = config.get(args.config)
+    if config_obj is None:
+        raise SystemExit(f"unknown config '{args.config}', should be one of {list(config)}")
+    mode = args.mode or getattr(config_obj, 'SERVER_MODE', 'prefork')
+    if mode == 'gevent':
+        if early_mode != 'gevent':
+            raise SystemExit("gevent mode must be selected by '--mode gevent' or FLASK_SERVER_MODE=gevent, "
+                             "so that monkey patching happens before any other import")
+        check_gevent_driver(config_obj.SQLALCHEMY_DATABASE_URI)
+
+    from gunicorn.app.base import BaseApplication
+    from main import create_app
+    from extensions import db
+
+    class StandaloneApplication(BaseApplication):
+        def __init__(self, application, options: dict):
+            self.application = application
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                if key in self.cfg.settings and value is not None:
+                    self.cfg.set(key, value)
+
+        def load(self):
+            return self.application
+
+    app = create_app(args.config)
+    args.mode = mode
+    options = build_options(app.config, args)
+
+    def post_fork(server, worker):
+        # app 是在 master 进程里创建的，fork 之后不能和父进程共用连接池里的连接
+        with app.app_context():
+            db.engine.dispose(close=False)
+
+    options['post_fork'] = post_fork
+    print(f"****** starting HelloFlask in '{mode}' mode: {options} ******")
+    StandaloneApplication(app, options).run()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,75 @@
+"""
+连接池压测：N 个线程并发执行查询，统计吞吐量以及获取连接的等待时间分布.
+用法（在 HelloFlask 目录下）：
+    python stress_pool.py --threads 100 --queries 200 --sleep 0.005
+    # 对比不同连接池大小
+    FLASK_DB_POOL_SIZE=5 FLASK_DB_MAX_OVERFLOW=0 python stress_pool.py
+"""
+import time
+import argparse
+import threading
+from sqlalchemy import text
+from main import create_app
+from extensions import db
+
+
+def worker(app, queries: int, sleep: float, barrier: threading.Barrier, errors: list):
+    barrier.wait()
+    for _ in range(queries):
+        # 每次查询都在一个新的 app_context 里，模拟一次请求：请求结束时 session 被移除，连接归还给连接池
+        with app.app_context():
+            try:
+                if sleep > 0:
+                    # 模拟一个耗时的查询，让连接占用时间变长，连接池才会出现排队
+                    db.session.execute(text("SELECT SLEEP(:s)"), {'s': sleep})
+                else:
+                    db.session.execute(text("SELECT 1"))
+            except Exception as e:
+                errors.append(repr(e))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--config', default='prod')
+    arg_parser.add_argument('--threads', type=int, default=100)
+    arg_parser.add_argument('--queries', type=int, default=200, help='queries per thread')
+    arg_parser.add_argument('--sleep', type=float, default=0.005, help='seconds each query holds the connection')
+    args = arg_parser.parse_args()
+
+    app = create_app(args.config)
+    metrics = app.extensions.get('pool_metrics')
+    if metrics is None:
+        raise SystemExit(f"config '{args.config}' does not enable SQLALCHEMY_POOL_METRICS")
+    with app.app_context():
+        # 预热，建立常驻连接
+        db.session.execute(text("SELECT 1"))
+
+    errors = []
+    barrier = threading.Barrier(args.threads + 1)
+    threads = [threading.Thread(target=worker, args=(app, args.queries, args.sleep, barrier, errors))
+               for _ in range(args.threads)]
+    for t in threads:
+        t.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    total = args.threads * args.queries
+    print(f"engine options: {app.config.get('SQLALCHEMY_ENGINE_OPTIONS')}")
+    print(f"threads: {args.threads}, queries: {total}, errors: {len(errors)}, elapsed: {elapsed:.2f}s, "
+          f"throughput: {(total - len(errors)) / elapsed:.1f} queries/s")
+    with app.app_context():
+        snapshot = metrics.snapshot(db.engine.pool)
+    for key in ('connects', 'checkouts', 'checkins', 'invalidations', 'wait_timeouts', 'pool'):
+        print(f"{key:<14}: {snapshot.get(key)}")
+    for key in ('wait_ms', 'hold_ms'):
+        stat = snapshot[key]
+        print(f"{key:<14}: " + ', '.join(f"{k}={v:.3f}" if isinstance(v, float) else f"{k}={v}" for k, v in stat.items()))
+    if errors:
+        print(f"first error: {errors[0]}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""
+file_app 流式导入的测试.
+运行: cd HelloFlask && python -m pytest test/test_ingest.py
+"""
+import io
+import os
+import time
+import pytest
+from flask import Flask
+from sqlalchemy import text
+
+from extensions import db
+from file_app import file_bp
+
+
+@pytest.fixture
+def client(tmp_path):
+    app = Flask(__name__)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'ingest.db'}",
+        INGEST_ALLOWED_TABLES=('ingest_demo',),
+    )
+    db.init_app(app)
+    app.register_blueprint(file_bp)
+    with app.app_context():
+        with db.engine.begin() as conn:
+            conn.execute(text("CREATE TABLE ingest_demo (id INTEGER PRIMARY KEY, name VARCHAR(32))"))
+    return app.test_client()
+
+
+def _upload(client, table: str, content: bytes = b"id,name\n1,a\n"):
+    data = {'file': (io.BytesIO(content), 'data.csv'), 'table': table}
+    return client.post('/file/ingest', data=data, content_type='multipart/form-data')
+
+
+def test_ingest_rejects_table_not_in_allowlist(client):
+    response = _upload(client, 'auth_user')
+    assert response.status_code == 400
+    assert 'not allowed' in response.get_json()['msg']
+
+
+def _wait(client, response) -> dict:
+    assert response.status_code == 202
+    job_id = response.get_json()['data']['job_id']
+    for _ in range(100):
+        job = client.get(f'/file/ingest/{job_id}').get_json()['data']
+        if job['status'] in ('done', 'failed'):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} did not finish: {job}")
+
+
+def test_ingest_accepts_allowed_table(client):
+    job = _wait(client, _upload(client, 'ingest_demo'))
+    assert job['status'] == 'done', job
+    with client.application.app_context():
+        with db.engine.connect() as conn:
+            assert conn.execute(text("SELECT id, name FROM ingest_demo")).all() == [(1, 'a')]
+
+
+@pytest.mark.parametrize('content, message', [
+    (b"code,title\n1,a\n", "none of the file columns match"),
+    (b"id,name,age\n1,a,3\n", "['age'] do not exist"),
+])
+def test_ingest_fails_on_unknown_columns(client, content, message):
+    job = _wait(client, _upload(client, 'ingest_demo', content))
+    assert job['status'] == 'failed'
+    assert message in job['message']
+    with client.application.app_context():
+        with db.engine.connect() as conn:
+            assert conn.execute(text("SELECT count(*) FROM ingest_demo")).scalar() == 0
+
+
+def test_job_state_is_shared_and_expires(client):
+    from file_app import ingest
+    job = _wait(client, _upload(client, 'ingest_demo'))
+    # 状态保存在文件中，其他 worker 进程（这里直接读文件）也能查到
+    path = os.path.join(ingest.JOB_DIR, f"{job['job_id']}.json")
+    assert ingest.get_job(job['job_id']).to_dict() == job
+    assert ingest.get_job('../../etc/passwd') is None
+    # 超过 TTL 的任务被清理
+    os.utime(path, (time.time() - 7200, time.time() - 7200))
+    assert ingest.expire_jobs(ttl=3600) >= 1
+    assert client.get(f"/file/ingest/{job['job_id']}").status_code == 404
+
+
+def _batches(rows, **kwargs) -> dict:
+    """把所有批次合并成一个 {列名: [值...]}"""
+    from file_app.ingest import iter_batches
+    merged = {}
+    for batch in iter_batches(rows, **kwargs):
+        for name, values in batch.items():
+            merged.setdefault(name, []).extend(values)
+    return merged
+
+
+def test_mixed_int_float_column_is_widened():
+    # 和 bench_ingest 的 score 列一样：整数和小数混合
+    rows = [['id', 'score']] + [[str(i), str(i * 0.5).removesuffix('.0')] for i in range(6)]
+    errors = []
+    result = _batches(rows, on_error=lambda n, msg: errors.append((n, msg)))
+    assert errors == []
+    assert result['score'] == [0.0, 0.5, 1.0, 1.5, 2.0, 2.5]
+    assert result['id'] == [0, 1, 2, 3, 4, 5]
+
+
+def test_widened_after_sample():
+    rows = [['score'], [1], [2], [2.5]]
+    errors = []
+    result = _batches(rows, sample_rows=1, on_error=lambda n, msg: errors.append((n, msg)))
+    assert errors == []
+    assert result['score'] == [1, 2, 2.5]
+
+
+def test_leading_zero_codes_are_strings():
+    rows = [['code'], ['00123'], ['123']]
+    assert _batches(rows)['code'] == ['00123', '123']
+
+
+def test_non_numeric_value_widens_to_str():
+    rows = [['code'], ['1'], ['2'], ['A3']]
+    errors = []
+    assert _batches(rows, sample_rows=2, on_error=lambda n, msg: errors.append((n, msg)))['code'] == ['1', '2', 'A3']
+    assert errors == []
+
+
+def test_explicit_column_type_is_not_widened():
+    rows = [['age'], ['1'], ['x'], ['3']]
+    errors = []
+    result = _batches(rows, column_types={'age': 'int'}, on_error=lambda n, msg: errors.append(n))
+    assert result['age'] == [1, 3]
+    assert errors == [2]
@@ -0,0 +1,375 @@
+"""
+ORM 查询结果 和 pandas/Arrow 列式数据 之间的批量转换，同时支持 SQLAlchemy 和 Peewee.
+sqlalchemy_orm.py 和 peewee_practice.py 中的查询都是逐行构造 Model 对象，做数据分析导出时大部分时间花在对象构造上：
+  + SQLAlchemy ORM 每行要构造 Row、Model 实例、identity map 记录和属性状态；
+  + Peewee 每行要构造 Model 实例并逐个字段调用 python_value() 转换.
+这里的做法是绕过 ORM 对象：
+  + SQLAlchemy 通过 Connection 执行语句（即使是 select(Model)，返回的也只是列，不构造 Model 对象），
+    用 yield_per 分批读取（支持服务端游标的驱动不会一次读取全部结果），每批是轻量的 Row（C 扩展实现的 tuple）；
+  + Peewee 用 query.sql() 拿到 SQL 后直接在 DBAPI 游标上 fetchmany()；
+然后把每批数据转置成列，按表定义推断出的 Arrow 类型（Decimal 列按定义的精度使用 decimal128）构造每批的数据，
+最后拼接成 pyarrow.Table（或者再转成 pandas.DataFrame），表定义中没有类型的列由各批数据推断，拼接时提升为兼容的类型.
+反方向的批量写入（DataFrame -> 表）：
+  + PostgreSQL + psycopg2：COPY ... FROM STDIN，每块数据以 CSV 格式传输；
+  + 其他数据库：DBAPI 的 cursor.executemany()（pymysql 会改写成多行 VALUES 的 INSERT），Peewee 使用 insert_many 分批插入.
+注意：Peewee 直接读取游标，不会经过字段的 python_value() 转换（比如 SQLite 中以字符串保存的 DateTimeField），
+这些列在构造 Arrow 数组时按字段定义的类型转换.
+用法: python columnar_bridge.py bench [行数，默认1000000]
+"""
+import io
+import os
+import sys
+import time
+import tempfile
+import pandas as pd
+from sqlalchemy import insert, Table, Column, Integer, String, Float, select
+from sqlalchemy import types as sa_types
+from sqlalchemy.orm import DeclarativeBase, Session
+
+try:
+    import pyarrow as pa
+except ImportError:
+    # 没有安装 pyarrow 时，只能使用 pandas 的路径
+    pa = None
+
+try:
+    import peewee as pw
+except ImportError:
+    pw = None
+
+# 每次从游标读取的行数
+BATCH_SIZE = 50000
+
+
+# --------------- 类型推断 ---------------
+def P1_Types():
+    pass
+
+
+def _sqlalchemy_arrow_type(sa_type):
+    """SQLAlchemy 列类型 -> Arrow 类型，无法确定时返回 None（由数据推断）"""
+    if pa is None:
+        return None
+    # 注意判断顺序：Boolean/BigInteger 等是 Integer 的子类或兄弟类
+    if isinstance(sa_type, sa_types.Boolean):
+        return pa.bool_()
+    if isinstance(sa_type, sa_types.Integer):
+        return pa.int64()
+    if isinstance(sa_type, sa_types.Float):
+        return pa.float64()
+    if isinstance(sa_type, sa_types.Numeric):
+        if not sa_type.asdecimal:
+            return pa.float64()
+        # Decimal 转为 float 会损失精度，按列定义的精度使用 decimal128；没有定义精度时由数据推断
+        return _decimal_arrow_type(sa_type.precision, sa_type.scale)
+    if isinstance(sa_type, sa_types.DateTime):
+        return pa.timestamp('us')
+    if isinstance(sa_type, sa_types.Date):
+        return pa.date32()
+    if isinstance(sa_type, (sa_types.String, sa_types.Enum)):
+        return pa.string()
+    return None
+
+
+def _decimal_arrow_type(precision, scale):
+    if not precision:
+        return None
+    scale = scale or 0
+    if precision <= 38:
+        return pa.decimal128(precision, scale)
+    return pa.decimal256(precision, scale)
+
+
+# peewee 的 Field.field_type -> Arrow 类型
+_PEEWEE_TYPES = {
+    'AUTO': 'int64', 'BIGAUTO': 'int64', 'INT': 'int64', 'BIGINT': 'int64', 'SMALLINT': 'int64',
+    'FLOAT': 'float64', 'DOUBLE': 'float64',
+    'BOOL': 'bool_',
+    'CHAR': 'string', 'VARCHAR': 'string', 'TEXT': 'string', 'UUID': 'string',
+    'DATE': 'date32',
+}
+
+
+def _peewee_arrow_type(field):
+    if pa is None:
+        return None
+    field_type = getattr(field, 'field_type', None)
+    if field_type == 'DATETIME':
+        return pa.timestamp('us')
+    if field_type == 'DECIMAL':
+        return _decimal_arrow_type(getattr(field, 'max_digits', None), getattr(field, 'decimal_places', None))
+    name = _PEEWEE_TYPES.get(field_type)
+    return getattr(pa, name)() if name else None
+
+
+def _to_arrow_array(values, arrow_type):
+    if arrow_type is None:
+        return pa.array(values)
+    try:
+        return pa.array(values, type=arrow_type)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # 比如 SQLite 中的日期时间是 ISO 格式的字符串，先按字符串构造再转换
+        return pa.array(values).cast(arrow_type)
+
+
+def _batches_to_arrow(names, arrow_types, batches):
+    """把游标读取的多批 tuple 列表转成 pyarrow.Table"""
+    tables = []
+    for rows in batches:
+        columns = list(zip(*rows))
+        arrays = [_to_arrow_array(list(col), t) for col, t in zip(columns, arrow_types)]
+        tables.append(pa.Table.from_arrays(arrays, names=names))
+    if not tables:
+        # 没有数据，没有指定类型的列按字符串处理
+        return pa.schema([(name, t or pa.string()) for name, t in zip(names, arrow_types)]).empty_table()
+    # 由数据推断的列，各批的类型可能不同（比如某一批全是 NULL 推断为 null，Decimal 的位数不同推断出的 decimal128 不同），
+    # 每批独立构造，合并时再统一提升为兼容的类型
+    return pa.concat_tables(tables, promote_options='permissive')
+
+
+def _batches_to_dataframe(names, batches):
+    frames = [pd.DataFrame.from_records(rows, columns=names) for rows in batches]
+    if not frames:
+        return pd.DataFrame(columns=names)
+    return pd.concat(frames, ignore_index=True)
+
+
+def _fetch_batches(cursor, batch_size: int):
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        yield rows
+
+
+# --------------- SQLAlchemy ---------------
+def P2_SQLAlchemy():
+    pass
+
+
+def _sqlalchemy_columns(stmt):
+    names = [col.key for col in stmt.selected_columns]
+    types = [_sqlalchemy_arrow_type(col.type) for col in stmt.selected_columns]
+    return names, types
+
+
+def sqlalchemy_to_arrow(conn, stmt, batch_size: int = BATCH_SIZE):
+    """
+    执行 SQLAlchemy 的 select 语句，返回 pyarrow.Table.
+    :param conn: Connection 或者 Session（ORM 的 select(Model) 也可以，返回的是 Model 对应的列，而不是 Model 对象）
+    """
+    if isinstance(conn, Session):
+        conn = conn.connection()
+    names, types = _sqlalchemy_columns(stmt)
+    # yield_per 同时开启 stream_results: 支持服务端游标的驱动分批从数据库读取，否则驱动会先把全部结果读到内存中
+    result = conn.execute(stmt.execution_options(yield_per=batch_size))
+    try:
+        return _batches_to_arrow(names, types, result.partitions())
+    finally:
+        result.close()
+
+
+def sqlalchemy_to_dataframe(conn, stmt, batch_size: int = BATCH_SIZE):
+    if pa is not None:
+        return sqlalchemy_to_arrow(conn, stmt, batch_size).to_pandas()
+    if isinstance(conn, Session):
+        conn = conn.connection()
+    names, _ = _sqlalchemy_columns(stmt)
+    result = conn.execute(stmt.execution_options(yield_per=batch_size))
+    try:
+        return _batches_to_dataframe(names, result.partitions())
+    finally:
+        result.close()
+
+
+def _dataframe_rows(df):
+    """DataFrame -> tuple 列表，NaN/NaT 转为 None，numpy 标量转为 Python 对象"""
+    return list(df.astype(object).where(df.notna(), None).itertuples(index=False, name=None))
+
+
+def dataframe_to_table(conn, table: Table, df, chunk_size: int = BATCH_SIZE) -> int:
+    """
+    把 DataFrame 批量写入 table，DataFrame 的列名必须是表的列名；在调用方的事务中执行，返回写入的行数.
+    PostgreSQL(psycopg2) 使用 COPY，其他数据库使用 DBAPI 的 executemany.
+    """
+    columns = list(df.columns)
+    dialect = conn.dialect
+    dbapi_conn = conn.connection.dbapi_connection
+    cursor = dbapi_conn.cursor()
+    try:
+        if dialect.name == 'postgresql' and dialect.driver == 'psycopg2':
+            quote = dialect.identifier_preparer.quote
+            sql = f"COPY {quote(table.name)} ({', '.join(quote(c) for c in columns)}) FROM STDIN WITH (FORMAT csv)"
+            for start in range(0, len(df), chunk_size):
+                buffer = io.StringIO()
+                df.iloc[start:start + chunk_size].to_csv(buffer, index=False, header=False)
+                buffer.seek(0)
+                cursor.copy_expert(sql, buffer)
+        else:
+            compiled = insert(table).compile(dialect=dialect, column_keys=columns)
+            if compiled.positional:
+                # 参数顺序以编译结果为准
+                order = list(compiled.positiontup)
+                frame = df[order]
+            else:
+                order = columns
+                frame = df
+            for start in range(0, len(frame), chunk_size):
+                rows = _dataframe_rows(frame.iloc[start:start + chunk_size])
+                if not compiled.positional:
+                    rows = [dict(zip(order, row)) for row in rows]
+                cursor.executemany(str(compiled), rows)
+    finally:
+        cursor.close()
+    return len(df)
+
+
+# --------------- Peewee ---------------
+def P3_Peewee():
+    pass
+
+
+def _peewee_columns(query, cursor):
+    names = [d[0] for d in cursor.description]
+    types = [_peewee_arrow_type(col) for col in query.selected_columns]
+    if len(types) != len(names):
+        types = [None] * len(names)
+    return names, types
+
+
+def peewee_to_arrow(query, batch_size: int = BATCH_SIZE):
+    """执行 Peewee 的 select 查询，返回 pyarrow.Table，不构造 Model 对象"""
+    db = query.model._meta.database
+    sql, params = query.sql()
+    cursor = db.execute_sql(sql, params)
+    try:
+        names, types = _peewee_columns(query, cursor)
+        return _batches_to_arrow(names, types, _fetch_batches(cursor, batch_size))
+    finally:
+        cursor.close()
+
+
+def peewee_to_dataframe(query, batch_size: int = BATCH_SIZE):
+    if pa is not None:
+        return peewee_to_arrow(query, batch_size).to_pandas()
+    db = query.model._meta.database
+    sql, params = query.sql()
+    cursor = db.execute_sql(sql, params)
+    try:
+        names = [d[0] for d in cursor.description]
+        return _batches_to_dataframe(names, _fetch_batches(cursor, batch_size))
+    finally:
+        cursor.close()
+
+
+def dataframe_to_model(model, df, batch_size: int = None) -> int:
+    """
+    把 DataFrame 批量写入 Peewee Model 对应的表，DataFrame 的列名是 Model 的字段名.
+    每条 INSERT 的行数受数据库参数个数的限制（旧版本 SQLite 为 999），默认按列数计算.
+    """
+    db = model._meta.database
+    fields = [model._meta.fields[name] for name in df.columns]
+    if batch_size is None:
+        batch_size = max(1, 999 // len(fields)) if isinstance(db, pw.SqliteDatabase) else 1000
+    rows = _dataframe_rows(df)
+    with db.atomic():
+        for batch in pw.chunked(rows, batch_size):
+            model.insert_many(batch, fields=fields).execute()
+    return len(rows)
+
+
+# --------------- 性能对比 ---------------
+def P4_Benchmark():
+    pass
+
+
+def _timeit(label, func, n):
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40}: {n:>8} rows in {elapsed:7.2f} s | {n / elapsed:>10,.0f} rows/s")
+    return result
+
+
+def bench(n: int = 1_000_000):
+    from sqlalchemy import create_engine
+
+    class Base(DeclarativeBase):
+        pass
+
+    class BenchUser(Base):
+        __tablename__ = 'bench_user'
+        uid = Column(Integer, primary_key=True)
+        name = Column(String(64), nullable=False)
+        gender = Column(String(64))
+        age = Column(Integer)
+        score = Column(Float)
+
+    df = pd.DataFrame({
+        'uid': range(1, n + 1),
+        'name': [f"user{i}" for i in range(n)],
+        'gender': ['male', 'female', None, 'female'] * (n // 4) + ['male'] * (n % 4),
+        'age': [i % 90 for i in range(n)],
+        'score': [i / 7 for i in range(n)],
+    })
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(engine)
+        table = BenchUser.__table__
+
+        print("---- DataFrame -> table ----")
+        with engine.begin() as conn:
+            _timeit("pandas.to_sql", lambda: df.to_sql('bench_user', conn, if_exists='append', index=False,
+                                                       chunksize=BATCH_SIZE), n)
+            conn.execute(table.delete())
+            _timeit("dataframe_to_table (executemany)", lambda: dataframe_to_table(conn, table, df), n)
+
+        print("---- SQLAlchemy query -> DataFrame ----")
+        stmt = select(BenchUser).order_by(BenchUser.uid)
+        with Session(engine) as session:
+            def orm_objects():
+                users = session.execute(stmt).scalars().all()
+                return pd.DataFrame([{'uid': u.uid, 'name': u.name, 'gender': u.gender, 'age': u.age,
+                                      'score': u.score} for u in users])
+            expected = _timeit("ORM objects -> DataFrame", orm_objects, n)
+            session.expunge_all()
+        with engine.connect() as conn:
+            _timeit("pandas.read_sql", lambda: pd.read_sql(select(table).order_by(table.c.uid), conn), n)
+            if pa is not None:
+                _timeit("sqlalchemy_to_arrow", lambda: sqlalchemy_to_arrow(conn, stmt), n)
+            result = _timeit("sqlalchemy_to_dataframe", lambda: sqlalchemy_to_dataframe(conn, stmt), n)
+        pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+        engine.dispose()
+
+        if pw is None:
+            return
+        print("---- Peewee query -> DataFrame ----")
+        db = pw.SqliteDatabase(os.path.join(tmp, 'bench_pw.db'))
+
+        class Person(pw.Model):
+            uid = pw.AutoField()
+            name = pw.CharField(max_length=64)
+            gender = pw.CharField(max_length=64, null=True)
+            age = pw.IntegerField(null=True)
+            score = pw.FloatField(null=True)
+
+            class Meta:
+                database = db
+                table_name = 'bench_person'
+
+        with db:
+            db.create_tables([Person])
+            _timeit("dataframe_to_model (insert_many)", lambda: dataframe_to_model(Person, df), n)
+            query = Person.select().order_by(Person.uid)
+            _timeit("Model objects -> DataFrame",
+                    lambda: pd.DataFrame([{'uid': p.uid, 'name': p.name, 'gender': p.gender, 'age': p.age,
+                                           'score': p.score} for p in query]), n)
+            _timeit("query.dicts() -> DataFrame", lambda: pd.DataFrame(list(query.dicts())), n)
+            result = _timeit("peewee_to_dataframe", lambda: peewee_to_dataframe(query), n)
+        pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'bench':
+        bench(*(int(arg) for arg in sys.argv[2:3]))
@@ -1,8 +1,22 @@
 """
 ORM 和 RBAC 的结合使用
+用户 -> 组 -> 权限 的权限模型中，判断"用户 X 是否有权限 P"需要沿着 用户 -> 用户组关联 -> 组 -> 组权限关联 逐级查询，
+每次检查需要多次查询（或者一次多表 JOIN）. 这里的 RBACEngine 维护一张物化的"有效权限"表 rbac_user_effective_permission：
+  + 每一行 (uid, pid, grants) 表示用户拥有的一个权限，grants 是授予这个权限的来源个数（直接授予算 1 个，每个拥有该权限的组算 1 个）；
+  + 用户加入/退出组、组增加/删除权限、直接授予/撤销权限时，按引用计数增量维护：来源 +1 / -1，计数归零时删除该行，
+    每次变更都是几条集合操作的 SQL（INSERT ... SELECT / UPDATE ... WHERE），不需要重新计算整个用户的权限；
+  + has_permission(uid, pid) 是一次主键查询；
+  + 另外可以把有效权限加载为内存中的位图索引（PermissionBitmapIndex，每个用户一个 int，每个权限占一位），检查时不需要查询数据库，
+    RBACEngine 执行变更时同步更新位图.
+用法： python orm_rbac.py bench [用户数，默认100000] [检查次数，默认1000000]
 """
+import sys
+import time
+import random
 from urllib import parse
-from sqlalchemy import create_engine, Column, Integer, String, ForeignKey
+from contextlib import contextmanager
+from sqlalchemy import create_engine, Column, Integer, String, ForeignKey, Table, PrimaryKeyConstraint, Index
+from sqlalchemy import select, insert, update, delete, and_, exists, literal, func
 from sqlalchemy.orm import declarative_base, sessionmaker, relationship, backref
 
 mysql_conf = {
@@ -47,7 +61,7 @@ class Group(Base):
     name = Column(String(64), nullable=False, comment='组名')
 
     def __repr__(self):
-        return f"<User(gid={self.gid}, name={self.name}')>"
+        return f"<Group(gid={self.gid}, name={self.name}')>"
 
 
 class Permission(Base):
@@ -61,5 +75,324 @@ class Permission(Base):
     name = Column(String(64), nullable=False, comment='权限名称')
 
     def __repr__(self):
-        return f"<User(pid={self.gid}, name={self.name}')>"
+        return f"<Permission(pid={self.pid}, name={self.name}')>"
 
+
+# ---------------------------------------------------------------------
+# 关联表，使用 Core 的 Table 定义（只有两个外键，不需要额外的字段）
+user_group = Table(
+    'rbac_user_group',
+    Base.metadata,
+    Column('uid', ForeignKey('rbac_user.uid'), primary_key=True),
+    Column('gid', ForeignKey('rbac_group.gid'), primary_key=True),
+    # 按组查询成员（组权限变化时需要找出所有成员）
+    Index('ix_rbac_user_group_gid', 'gid'),
+    comment='RBAC-用户所属的组',
+    mysql_engine='InnoDB',
+    extend_existing=True,
+)
+group_permission = Table(
+    'rbac_group_permission',
+    Base.metadata,
+    Column('gid', ForeignKey('rbac_group.gid'), primary_key=True),
+    Column('pid', ForeignKey('rbac_permission.pid'), primary_key=True),
+    comment='RBAC-组拥有的权限',
+    mysql_engine='InnoDB',
+    extend_existing=True,
+)
+user_permission = Table(
+    'rbac_user_permission',
+    Base.metadata,
+    Column('uid', ForeignKey('rbac_user.uid'), primary_key=True),
+    Column('pid', ForeignKey('rbac_permission.pid'), primary_key=True),
+    comment='RBAC-直接授予用户的权限',
+    mysql_engine='InnoDB',
+    extend_existing=True,
+)
+# 物化的有效权限表，由 RBACEngine 维护，不要直接修改
+user_effective_permission = Table(
+    'rbac_user_effective_permission',
+    Base.metadata,
+    Column('uid', String(32), nullable=False),
+    Column('pid', String(32), nullable=False),
+    Column('grants', Integer, nullable=False, comment='授予来源的个数'),
+    PrimaryKeyConstraint('uid', 'pid'),
+    comment='RBAC-用户的有效权限',
+    mysql_engine='InnoDB',
+    extend_existing=True,
+)
+
+# 通过关联表访问组和权限，用于展示和管理；权限检查不要沿着这些关系逐级访问，使用 RBACEngine.has_permission
+User.groups = relationship(Group, secondary=user_group, backref=backref('users', lazy='dynamic'))
+Group.permissions = relationship(Permission, secondary=group_permission)
+User.permissions = relationship(Permission, secondary=user_permission)
+
+
+class PermissionBitmapIndex:
+    """
+    内存中的有效权限索引：每个权限分配一个位，每个用户的有效权限是一个 int 位图.
+    10 万用户 * 几十个权限的位图只占几 MB 内存，检查一次权限只是一次 dict 查找 + 位运算.
+    """
+
+    def __init__(self):
+        self.bits = {}
+        self.users = {}
+
+    def _bit(self, pid: str) -> int:
+        bit = self.bits.get(pid)
+        if bit is None:
+            bit = self.bits[pid] = 1 << len(self.bits)
+        return bit
+
+    def load(self, conn):
+        self.users.clear()
+        rows = conn.execute(select(user_effective_permission.c.uid, user_effective_permission.c.pid))
+        users = self.users
+        for uid, pid in rows:
+            users[uid] = users.get(uid, 0) | self._bit(pid)
+        return self
+
+    def set(self, uid: str, pid: str, granted: bool):
+        bit = self._bit(pid)
+        if granted:
+            self.users[uid] = self.users.get(uid, 0) | bit
+        else:
+            mask = self.users.get(uid, 0) & ~bit
+            if mask:
+                self.users[uid] = mask
+            else:
+                self.users.pop(uid, None)
+
+    def has_permission(self, uid: str, pid: str) -> bool:
+        bit = self.bits.get(pid)
+        return bit is not None and bool(self.users.get(uid, 0) & bit)
+
+
+class RBACEngine:
+    """
+    维护物化有效权限表的 RBAC 引擎，所有成员关系和授权的变更都要通过这里的方法执行，每个方法在一个事务中完成.
+    :param use_bitmap: 是否同时维护内存中的位图索引；多进程部署时其他进程的变更不会同步到本进程的位图，需要定期 reload_bitmap()
+    """
+    eff = user_effective_permission
+
+    def __init__(self, engine, use_bitmap: bool = False):
+        self.engine = engine
+        self.bitmap = PermissionBitmapIndex() if use_bitmap else None
+        if self.bitmap is not None:
+            self.reload_bitmap()
+
+    def reload_bitmap(self):
+        with self.engine.connect() as conn:
+            self.bitmap.load(conn)
+
+    # ---------------- 有效权限的增量维护 ----------------
+    def _grant(self, conn, pairs):
+        """pairs 是 (uid, pid) 的 SELECT，对每一对的 grants +1，不存在时插入"""
+        eff = self.eff
+        pairs = pairs.subquery()
+        conn.execute(
+            update(eff)
+            .where(exists().where(and_(pairs.c.uid == eff.c.uid, pairs.c.pid == eff.c.pid)))
+            .values(grants=eff.c.grants + 1)
+        )
+        conn.execute(
+            insert(eff).from_select(
+                ['uid', 'pid', 'grants'],
+                select(pairs.c.uid, pairs.c.pid, literal(1)).where(
+                    ~exists().where(and_(eff.c.uid == pairs.c.uid, eff.c.pid == pairs.c.pid))
+                ),
+            )
+        )
+        return self._bitmap_changes(conn, pairs)
+
+    def _revoke(self, conn, pairs):
+        """对每一对的 grants -1，归零时删除"""
+        eff = self.eff
+        pairs = pairs.subquery()
+        conn.execute(
+            update(eff)
+            .where(exists().where(and_(pairs.c.uid == eff.c.uid, pairs.c.pid == eff.c.pid)))
+            .values(grants=eff.c.grants - 1)
+        )
+        conn.execute(delete(eff).where(eff.c.grants <= 0))
+        return self._bitmap_changes(conn, pairs)
+
+    def _bitmap_changes(self, conn, pairs) -> list:
+        """查询 pairs 在事务中的最新状态，返回位图需要的变更 [(uid, pid, granted)]；这里不修改位图，事务提交后才应用"""
+        if self.bitmap is None:
+            return []
+        eff = self.eff
+        rows = conn.execute(
+            select(pairs.c.uid, pairs.c.pid, eff.c.uid.is_not(None))
+            .select_from(pairs.outerjoin(eff, and_(eff.c.uid == pairs.c.uid, eff.c.pid == pairs.c.pid)))
+        )
+        return [(uid, pid, bool(granted)) for uid, pid, granted in rows]
+
+    @contextmanager
+    def _begin(self):
+        """engine.begin() 的包装：yield (conn, changes)，位图的变更先收集到 changes 中，事务成功提交后才应用到位图，回滚时丢弃"""
+        changes = []
+        with self.engine.begin() as conn:
+            yield conn, changes
+        if self.bitmap is not None:
+            for uid, pid, granted in changes:
+                self.bitmap.set(uid, pid, granted)
+
+    # ---------------- 成员关系和授权的变更 ----------------
+    def add_user_to_group(self, uid: str, gid: str):
+        with self._begin() as (conn, changes):
+            if conn.execute(select(user_group.c.uid).where(user_group.c.uid == uid, user_group.c.gid == gid)).first():
+                return
+            conn.execute(insert(user_group).values(uid=uid, gid=gid))
+            changes += self._grant(conn, select(literal(uid).label('uid'), group_permission.c.pid)
+                                   .where(group_permission.c.gid == gid))
+
+    def remove_user_from_group(self, uid: str, gid: str):
+        with self._begin() as (conn, changes):
+            result = conn.execute(delete(user_group).where(user_group.c.uid == uid, user_group.c.gid == gid))
+            if result.rowcount:
+                changes += self._revoke(conn, select(literal(uid).label('uid'), group_permission.c.pid)
+                                        .where(group_permission.c.gid == gid))
+
+    def grant_group_permission(self, gid: str, pid: str):
+        with self._begin() as (conn, changes):
+            if conn.execute(select(group_permission.c.gid)
+                            .where(group_permission.c.gid == gid, group_permission.c.pid == pid)).first():
+                return
+            conn.execute(insert(group_permission).values(gid=gid, pid=pid))
+            changes += self._grant(conn, select(user_group.c.uid, literal(pid).label('pid'))
+                                   .where(user_group.c.gid == gid))
+
+    def revoke_group_permission(self, gid: str, pid: str):
+        with self._begin() as (conn, changes):
+            result = conn.execute(delete(group_permission)
+                                  .where(group_permission.c.gid == gid, group_permission.c.pid == pid))
+            if result.rowcount:
+                changes += self._revoke(conn, select(user_group.c.uid, literal(pid).label('pid'))
+                                        .where(user_group.c.gid == gid))
+
+    def grant_user_permission(self, uid: str, pid: str):
+        with self._begin() as (conn, changes):
+            if conn.execute(select(user_permission.c.uid)
+                            .where(user_permission.c.uid == uid, user_permission.c.pid == pid)).first():
+                return
+            conn.execute(insert(user_permission).values(uid=uid, pid=pid))
+            changes += self._grant(conn, select(literal(uid).label('uid'), literal(pid).label('pid')))
+
+    def revoke_user_permission(self, uid: str, pid: str):
+        with self._begin() as (conn, changes):
+            result = conn.execute(delete(user_permission)
+                                  .where(user_permission.c.uid == uid, user_permission.c.pid == pid))
+            if result.rowcount:
+                changes += self._revoke(conn, select(literal(uid).label('uid'), literal(pid).label('pid')))
+
+    def rebuild(self):
+        """从关联表全量重建有效权限表（初始化或者数据修复时使用）"""
+        eff = self.eff
+        sources = select(user_group.c.uid, group_permission.c.pid) \
+            .join_from(user_group, group_permission, user_group.c.gid == group_permission.c.gid) \
+            .union_all(select(user_permission.c.uid, user_permission.c.pid)).subquery()
+        with self.engine.begin() as conn:
+            conn.execute(delete(eff))
+            conn.execute(insert(eff).from_select(
+                ['uid', 'pid', 'grants'],
+                select(sources.c.uid, sources.c.pid, func.count()).group_by(sources.c.uid, sources.c.pid),
+            ))
+        if self.bitmap is not None:
+            self.reload_bitmap()
+
+    # ---------------- 权限检查 ----------------
+    def has_permission(self, uid: str, pid: str, conn=None) -> bool:
+        """启用位图时不查询数据库；否则是一次主键查询"""
+        if self.bitmap is not None:
+            return self.bitmap.has_permission(uid, pid)
+        stmt = select(literal(1)).where(self.eff.c.uid == uid, self.eff.c.pid == pid)
+        if conn is not None:
+            return conn.execute(stmt).first() is not None
+        with self.engine.connect() as conn:
+            return conn.execute(stmt).first() is not None
+
+    def permissions_of(self, uid: str) -> set[str]:
+        with self.engine.connect() as conn:
+            return set(conn.scalars(select(self.eff.c.pid).where(self.eff.c.uid == uid)))
+
+
+def naive_has_permission(session, uid: str, pid: str) -> bool:
+    """对比用：沿着 ORM 关系逐级访问，每次检查需要查询 用户 -> 组 -> 每个组的权限 和 直接授予的权限"""
+    user = session.get(User, uid)
+    if user is None:
+        return False
+    if any(p.pid == pid for p in user.permissions):
+        return True
+    return any(p.pid == pid for group in user.groups for p in group.permissions)
+
+
+def bench(num_users: int = 100_000, num_checks: int = 1_000_000, num_groups: int = 200, num_permissions: int = 60):
+    bench_engine = create_engine('sqlite://')
+    Base.metadata.create_all(bench_engine, tables=[
+        User.__table__, Group.__table__, Permission.__table__,
+        user_group, group_permission, user_permission, user_effective_permission,
+    ])
+    rnd = random.Random(42)
+    uids = [f"u{i}" for i in range(num_users)]
+    gids = [f"g{i}" for i in range(num_groups)]
+    pids = [f"p{i}" for i in range(num_permissions)]
+    with bench_engine.begin() as conn:
+        conn.execute(insert(User.__table__), [{'uid': uid, 'name': uid} for uid in uids])
+        conn.execute(insert(Group.__table__), [{'gid': gid, 'name': gid} for gid in gids])
+        conn.execute(insert(Permission.__table__), [{'pid': pid, 'name': pid} for pid in pids])
+        conn.execute(insert(group_permission), [
+            {'gid': gid, 'pid': pid} for gid in gids for pid in rnd.sample(pids, 5)
+        ])
+        conn.execute(insert(user_group), [
+            {'uid': uid, 'gid': gid} for uid in uids for gid in rnd.sample(gids, 3)
+        ])
+        conn.execute(insert(user_permission), [{'uid': uid, 'pid': rnd.choice(pids)} for uid in uids[::10]])
+
+    rbac = RBACEngine(bench_engine)
+    start = time.perf_counter()
+    rbac.rebuild()
+    print(f"rebuild effective permissions for {num_users} users: {time.perf_counter() - start:.2f} s")
+
+    checks = [(rnd.choice(uids), rnd.choice(pids)) for _ in range(num_checks)]
+    # 逐级访问的方式太慢，只执行一小部分
+    naive_checks = checks[:2000]
+    with sessionmaker(bind=bench_engine)() as bench_session:
+        start = time.perf_counter()
+        naive = [naive_has_permission(bench_session, uid, pid) for uid, pid in naive_checks]
+        elapsed = time.perf_counter() - start
+        bench_session.expunge_all()
+    print(f"naive (relationships) : {len(naive_checks):>8} checks in {elapsed:7.2f} s | "
+          f"{elapsed / len(naive_checks) * 1e6:8.1f} us/check")
+
+    with bench_engine.connect() as conn:
+        start = time.perf_counter()
+        materialized = [rbac.has_permission(uid, pid, conn=conn) for uid, pid in checks]
+        elapsed = time.perf_counter() - start
+    print(f"materialized table    : {num_checks:>8} checks in {elapsed:7.2f} s | "
+          f"{elapsed / num_checks * 1e6:8.1f} us/check")
+    assert materialized[:len(naive)] == naive
+
+    rbac.bitmap = PermissionBitmapIndex()
+    start = time.perf_counter()
+    rbac.reload_bitmap()
+    print(f"load bitmap index: {time.perf_counter() - start:.2f} s")
+    start = time.perf_counter()
+    bitmap = [rbac.has_permission(uid, pid) for uid, pid in checks]
+    elapsed = time.perf_counter() - start
+    print(f"bitmap index          : {num_checks:>8} checks in {elapsed:7.2f} s | "
+          f"{elapsed / num_checks * 1e6:8.1f} us/check")
+    assert bitmap == materialized
+
+    # 增量维护的耗时：组权限变化影响组内所有成员
+    start = time.perf_counter()
+    rbac.grant_group_permission(gids[0], pids[-1])
+    rbac.revoke_group_permission(gids[0], pids[-1])
+    rbac.add_user_to_group(uids[0], gids[1])
+    rbac.remove_user_from_group(uids[0], gids[1])
+    print(f"4 incremental updates: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'bench':
+        bench(*(int(arg) for arg in sys.argv[2:4]))
@@ -0,0 +1,250 @@
+"""
+Peewee 在并发场景下的使用：连接池、批量写入、在 asyncio 中调用.
+peewee_practice.py 中使用模块级的单个 db 对象，每行数据一次 Model.create()/save()：
+  + peewee 的连接是线程本地的，多线程时每个线程各自建立连接，用完不关闭的话连接数会随线程数增长；
+  + 每次 create() 都是一条 INSERT，并且在自动提交模式下每条都是一个事务（一次 fsync/binlog 写入）.
+这里的做法：
+  + 使用 playhouse.pool 的连接池数据库，连接用完（db.close() / connection_context 结束）后放回池中，
+    max_connections 限制总连接数，stale_timeout 回收空闲太久的连接（避免被 MySQL 的 wait_timeout 断开）；
+  + BatchWriter 缓存多个线程提交的数据，每 batch_size 行在一个 db.atomic() 事务中用 insert_many 写入；
+  + AsyncDatabase 把 peewee 的同步调用放到线程池中执行，线程数不超过连接池大小.
+用法: python peewee_pool.py bench [线程数，默认8] [每个线程的行数，默认20000]
+"""
+import os
+import sys
+import time
+import asyncio
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import peewee as pw
+from playhouse.pool import PooledMySQLDatabase, PooledPostgresqlDatabase, PooledSqliteDatabase
+
+# ================= 连接池 =================
+def P1_Pool():
+	pass
+
+# 模型绑定到代理对象上，运行时再决定使用哪个数据库
+database_proxy = pw.DatabaseProxy()
+
+
+def create_pooled_database(engine: str = 'mysql', database: str = 'crashcourse', max_connections: int = 20,
+						   stale_timeout: int = 300, timeout: int = 10, **kwargs):
+	"""
+	创建连接池数据库，并绑定到 database_proxy
+	:param max_connections: 连接池的最大连接数，超过时等待其他线程归还连接
+	:param stale_timeout: 连接空闲超过这个时间（秒）后，下次取出时关闭并重新建立
+	:param timeout: 连接池满时等待的时间（秒），超时抛出 MaxConnectionsExceeded；0 表示不等待
+	"""
+	pool_kwargs = dict(max_connections=max_connections, stale_timeout=stale_timeout, timeout=timeout)
+	if engine == 'mysql':
+		kwargs.setdefault('charset', 'utf8mb4')
+		db = PooledMySQLDatabase(database, **pool_kwargs, **kwargs)
+	elif engine == 'postgresql':
+		db = PooledPostgresqlDatabase(database, **pool_kwargs, **kwargs)
+	elif engine == 'sqlite':
+		# WAL 模式下读写可以并发；写入时等待锁，而不是直接报 database is locked
+		kwargs.setdefault('pragmas', {'journal_mode': 'wal', 'busy_timeout': timeout * 1000, 'synchronous': 'normal'})
+		# 连接在线程池的线程之间传递使用
+		kwargs.setdefault('check_same_thread', False)
+		db = PooledSqliteDatabase(database, **pool_kwargs, **kwargs)
+	else:
+		raise ValueError(f"unsupported engine: {engine}")
+	database_proxy.initialize(db)
+	return db
+
+
+class PersonPooled(pw.Model):
+	uid = pw.AutoField(primary_key=True)
+	name = pw.CharField(max_length=127, null=False, index=True, verbose_name="姓名")
+	age = pw.IntegerField(null=True, verbose_name="年龄")
+	gender = pw.CharField(max_length=127, null=True, verbose_name="性别")
+	update_ = pw.TimestampField(column_name='update', null=True)
+
+	class Meta:
+		database = database_proxy
+		table_name = 'person_pooled'
+
+
+# ================= 批量写入 =================
+def P2_BatchWriter():
+	pass
+
+
+class BatchWriter:
+	"""
+	线程安全的批量写入器：多个线程调用 add()，缓存达到 batch_size 行时由当前线程写入数据库.
+	写入在一个 db.atomic() 事务中完成，每条 INSERT 包含 insert_size 行（受数据库参数个数限制，SQLite 旧版本为 999 个）.
+	用法:
+		with BatchWriter(PersonPooled, batch_size=1000) as writer:
+			writer.add({"name": "daniel", "age": 20})
+	"""
+
+	def __init__(self, model, batch_size: int = 1000, insert_size: int = None):
+		self.model = model
+		self.batch_size = batch_size
+		if insert_size is None:
+			insert_size = max(1, 999 // len(model._meta.sorted_fields))
+		self.insert_size = insert_size
+		self._buffer = []
+		self._lock = threading.Lock()
+		self.written = 0
+		self.batches = 0
+
+	def add(self, row: dict):
+		with self._lock:
+			self._buffer.append(row)
+			if len(self._buffer) < self.batch_size:
+				return
+			rows, self._buffer = self._buffer, []
+		# 在锁外写入，其他线程可以继续往新的缓存里添加数据
+		self._write(rows)
+
+	def add_many(self, rows):
+		for row in rows:
+			self.add(row)
+
+	def flush(self):
+		with self._lock:
+			rows, self._buffer = self._buffer, []
+		if rows:
+			self._write(rows)
+
+	def _write(self, rows: list):
+		db = self.model._meta.database
+		# connection_context 结束时把连接归还给连接池
+		with db.connection_context():
+			with db.atomic():
+				for batch in pw.chunked(rows, self.insert_size):
+					self.model.insert_many(batch).execute()
+		with self._lock:
+			self.written += len(rows)
+			self.batches += 1
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc, tb):
+		if exc_type is None:
+			self.flush()
+
+
+# ================= 异步调用 =================
+def P3_Async():
+	pass
+
+
+class AsyncDatabase:
+	"""
+	在 asyncio 中使用 peewee：同步调用放到线程池中执行，每次调用结束后连接归还给连接池.
+	max_workers 应该不大于连接池的 max_connections，避免线程等待连接.
+	用法:
+		adb = AsyncDatabase(db)
+		rows = await adb.run(lambda: list(PersonPooled.select().dicts()))
+		await adb.atomic(lambda: PersonPooled.insert_many(rows).execute())
+	"""
+
+	def __init__(self, db, max_workers: int = 10):
+		self.db = db
+		self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='peewee')
+
+	def _call(self, func, args, kwargs, atomic: bool):
+		with self.db.connection_context():
+			if atomic:
+				with self.db.atomic():
+					return func(*args, **kwargs)
+			return func(*args, **kwargs)
+
+	async def run(self, func, *args, **kwargs):
+		loop = asyncio.get_running_loop()
+		return await loop.run_in_executor(self.executor, self._call, func, args, kwargs, False)
+
+	async def atomic(self, func, *args, **kwargs):
+		"""在一个事务中执行 func"""
+		loop = asyncio.get_running_loop()
+		return await loop.run_in_executor(self.executor, self._call, func, args, kwargs, True)
+
+	async def insert_many(self, model, rows: list, insert_size: int = 100):
+		def insert():
+			for batch in pw.chunked(rows, insert_size):
+				model.insert_many(batch).execute()
+			return len(rows)
+		return await self.atomic(insert)
+
+	def close(self):
+		"""
+		只关闭线程池；每次调用结束时连接已经归还给连接池，连接池可能还有其他使用者，
+		由调用 create_pooled_database() 的一方负责 close_all()
+		"""
+		self.executor.shutdown(wait=True)
+
+
+# ================= 性能对比 =================
+def P4_Benchmark():
+	pass
+
+
+def _rows(thread_id: int, n: int):
+	now = datetime.now()
+	return [{'name': f"t{thread_id}-{i}", 'age': i % 90, 'gender': ('male', 'female')[i % 2], 'update_': now}
+			for i in range(n)]
+
+
+def bench(threads: int = 8, rows_per_thread: int = 20000):
+	with tempfile.TemporaryDirectory() as tmp:
+		db = create_pooled_database('sqlite', os.path.join(tmp, 'bench.db'), max_connections=threads)
+		with db.connection_context():
+			db.create_tables([PersonPooled])
+		total = threads * rows_per_thread
+
+		def report(label, elapsed):
+			print(f"{label:<32}: {total:>8} rows in {elapsed:7.2f} s | {total / elapsed:>10,.0f} rows/s")
+
+		def truncate():
+			with db.connection_context():
+				PersonPooled.delete().execute()
+
+		# 1. 每个线程逐行 create()，自动提交模式下每行一个事务
+		def create_rows(thread_id):
+			with db.connection_context():
+				for row in _rows(thread_id, rows_per_thread):
+					PersonPooled.create(**row)
+
+		start = time.perf_counter()
+		with ThreadPoolExecutor(threads) as executor:
+			list(executor.map(create_rows, range(threads)))
+		report(f"Model.create x {threads} threads", time.perf_counter() - start)
+		truncate()
+
+		# 2. 所有线程共用一个 BatchWriter
+		for batch_size in (100, 1000, 5000):
+			writer = BatchWriter(PersonPooled, batch_size=batch_size)
+			start = time.perf_counter()
+			with ThreadPoolExecutor(threads) as executor:
+				list(executor.map(lambda t: writer.add_many(_rows(t, rows_per_thread)), range(threads)))
+			writer.flush()
+			report(f"BatchWriter batch_size={batch_size}", time.perf_counter() - start)
+			assert writer.written == total
+			truncate()
+
+		# 3. asyncio 中并发提交
+		async def async_insert():
+			adb = AsyncDatabase(db, max_workers=threads)
+			try:
+				await asyncio.gather(*(adb.insert_many(PersonPooled, _rows(t, rows_per_thread))
+									   for t in range(threads)))
+				return await adb.run(PersonPooled.select().count)
+			finally:
+				adb.close()
+
+		start = time.perf_counter()
+		count = asyncio.run(async_insert())
+		report("AsyncDatabase.insert_many", time.perf_counter() - start)
+		assert count == total
+		db.close_all()
+
+
+if __name__ == '__main__':
+	if len(sys.argv) > 1 and sys.argv[1] == 'bench':
+		bench(*(int(arg) for arg in sys.argv[2:4]))
@@ -2,8 +2,15 @@
 Pydantic使用练习
 """
 from typing import TYPE_CHECKING, Optional, List, Dict, Tuple
-from pydantic import BaseModel, ConfigDict, Field, model_validator, field_validator
+from pydantic import BaseModel, ConfigDict, Field, model_validator, field_validator, TypeAdapter, ValidationError
+from pydantic_core import from_json
 from datetime import datetime
+from functools import lru_cache
+import multiprocessing
+import json
+import time
+import sys
+import os
 import re
 
 
@@ -43,57 +50,206 @@ class Policy(BaseModel):
     # createdAt: str = Field()
     # updatedAt: str = Field()
 
-    @field_validator('org', mode='before')
+    @field_validator('institution', mode='before')
     @classmethod
-    def validate_institution(cls, value: Dict[str, str]) -> str:
-        keys = list(value.keys())
-        return ','.join(keys)
+    def validate_institution(cls, value: Dict[str, str] | str | None) -> str | None:
+        # 原始数据中 org 是 {机构名: ...} 的字典，只保留机构名
+        if isinstance(value, dict):
+            return ','.join(value)
+        return value
 
-    @field_validator('pub_date', mode='after')
+    @field_validator('pubDate', mode='after')
     @classmethod
-    def validate_pubdate(cls, value: str) -> str | None:
+    def validate_pubdate(cls, value: str | None) -> str | None:
         """
-        将不同格式的日期字符串统一转换为 yyyy-mm-dd 格式
-        支持的格式:
-        - 2025-07-01
-        - 2025-07-01 12:00:00
-        - 2025年6月15号
-        Args:
-            date_str (str): 输入的日期字符串
-        Returns:
-            str: 格式化后的日期字符串 (yyyy-mm-dd)
+        将不同格式的日期字符串统一转换为 yyyy-mm-dd 格式，见 normalize_pubdate
         """
         if not value:
             return None
-        # 处理 2025-07-01 12:00:00 这种带时间的格式，只取日期部分
-        if re.match(r'^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}$', value):
-            return value.split(' ')[0]
-        # 处理标准的 2025-07-01 格式
-        if re.match(r'^\d{4}-\d{2}-\d{2}$', value):
-            return value
-        # 处理 2025年6月15号 这种中文格式
-        chinese_pattern = r'(\d{4})年(\d{1,2})月(\d{1,2})号?'
-        match = re.match(chinese_pattern, value)
-        if match:
-            year, month, day = match.groups()
-            # 确保月份和日期是两位数格式
-            return f"{year}-{int(month):02d}-{int(day):02d}"
-        # 如果都不匹配，尝试使用 datetime 解析
-        try:
-            # 尝试常见格式
-            for fmt in ['%Y-%m-%d', '%Y-%m-%d %H:%M:%S']:
-                try:
-                    dt = datetime.strptime(value, fmt)
-                    return dt.strftime('%Y-%m-%d')
-                except ValueError:
-                    continue
-        except Exception:
-            pass
-        # 如果所有格式都无法解析，返回原字符串
+        return normalize_pubdate(value)
+
+
+# 日期格式的正则表达式预先编译，不要在每次校验时重新查找/编译
+_DATETIME_RE = re.compile(r'^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}$')
+_DATE_RE = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+_CN_DATE_RE = re.compile(r'(\d{4})年(\d{1,2})月(\d{1,2})号?')
+
+
+# 同一批政策文件的发布日期大量重复，缓存解析结果
+@lru_cache(maxsize=65536)
+def normalize_pubdate(value: str) -> str:
+    """
+    将不同格式的日期字符串统一转换为 yyyy-mm-dd 格式
+    支持的格式:
+    - 2025-07-01
+    - 2025-07-01 12:00:00
+    - 2025年6月15号
+    Args:
+        value (str): 输入的日期字符串
+    Returns:
+        str: 格式化后的日期字符串 (yyyy-mm-dd)，无法解析时返回原字符串
+    """
+    # 处理 2025-07-01 12:00:00 这种带时间的格式，只取日期部分
+    if _DATETIME_RE.match(value):
+        return value.split(' ')[0]
+    # 处理标准的 2025-07-01 格式
+    if _DATE_RE.match(value):
         return value
+    # 处理 2025年6月15号 这种中文格式
+    match = _CN_DATE_RE.match(value)
+    if match:
+        year, month, day = match.groups()
+        # 确保月份和日期是两位数格式
+        return f"{year}-{int(month):02d}-{int(day):02d}"
+    # 如果都不匹配，尝试使用 datetime 解析（比如 2025-7-1 这种月份、日期不是两位数的格式）
+    for fmt in ['%Y-%m-%d', '%Y-%m-%d %H:%M:%S']:
+        try:
+            return datetime.strptime(value, fmt).strftime('%Y-%m-%d')
+        except ValueError:
+            continue
+    # 如果所有格式都无法解析，返回原字符串
+    return value
+
+
+# ------------------ Policy 批量导入 ------------------
+# 逐条 Policy(**json.loads(line)) 的方式，每条记录都要经过 json 解析 -> dict -> 校验 三步，并且都在一个进程里执行.
+# 批量导入的做法：
+#   1. 把一批记录拼成一个 JSON 数组的 bytes，用 TypeAdapter(list[Policy]).validate_json() 一次完成解析和校验（都在 pydantic-core 的 Rust 代码中）；
+#   2. 一批中有记录校验失败时，validate_json 会整批失败，这时从错误信息中找出失败的下标，去掉后再校验剩下的记录；
+#      有的行不是合法的 JSON 时，整个数组都无法解析，错误信息中没有下标，这时退回到逐行校验，只有这些行失败；
+#   3. 多个批次分发到多个进程中并行校验.
+PolicyList = TypeAdapter(List[Policy])
+
+
+def _validate_lines(lines: List[bytes]) -> Tuple[List[Policy], List[Dict]]:
+    """逐行解析和校验，用于一批中有不是合法 JSON 的行的情况"""
+    valid, failed = [], []
+    for index, line in enumerate(lines):
+        try:
+            valid.append(Policy.model_validate_json(line))
+        except ValidationError as exc:
+            errors = [{'loc': error['loc'], 'msg': error['msg']}
+                      for error in exc.errors(include_url=False, include_input=False)]
+            failed.append({'index': index, 'errors': errors})
+    return valid, failed
+
+
+def validate_policy_chunk(lines: List[bytes]) -> Tuple[List[Policy], List[Dict]]:
+    """
+    校验一批记录（NDJSON 的行），返回 (校验通过的 Policy 列表, 失败记录的错误信息列表)
+    错误信息中的 index 是记录在这一批中的下标
+    """
+    data = b'[' + b','.join(lines) + b']'
+    try:
+        return PolicyList.validate_json(data), []
+    except ValidationError as exc:
+        failed = {}
+        for error in exc.errors(include_url=False, include_input=False):
+            loc = error['loc']
+            if loc and isinstance(loc[0], int):
+                failed.setdefault(loc[0], []).append({'loc': loc[1:], 'msg': error['msg']})
+            else:
+                # JSON 解析错误没有下标，不知道是哪一行，逐行校验
+                return _validate_lines(lines)
+    records = from_json(data)
+    valid = PolicyList.validate_python([r for i, r in enumerate(records) if i not in failed])
+    return valid, [{'index': index, 'errors': errors} for index, errors in sorted(failed.items())]
+
+
+def _validate_chunk_worker(args: Tuple[int, List[bytes]]) -> Tuple[int, List[Dict], List[Dict]]:
+    # 在子进程中执行；返回 dict 而不是 Policy 对象，减少进程间序列化的开销
+    offset, data = args
+    policies, errors = validate_policy_chunk(data)
+    for error in errors:
+        error['index'] += offset
+    return offset, PolicyList.dump_python(policies), errors
+
+
+def iter_policy_chunks(lines, chunk_size: int = 5000):
+    """把 NDJSON 的行（bytes）按 chunk_size 分批，跳过空行，产出 (第一条记录的下标, 这一批的行列表)"""
+    chunk = []
+    offset = 0
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        chunk.append(line)
+        if len(chunk) >= chunk_size:
+            yield offset, chunk
+            offset += len(chunk)
+            chunk = []
+    if chunk:
+        yield offset, chunk
+
+
+def import_policies(lines, chunk_size: int = 5000, workers: int | None = None):
+    """
+    批量校验 NDJSON 格式的政策文件，按批次产出 (校验通过的记录 dict 列表, 失败记录的错误信息列表)，
+    错误信息中的 index 是记录在整个输入中的下标（跳过空行后）.
+    :param lines: bytes 行的可迭代对象，比如 open(path, 'rb')
+    :param workers: 进程数，默认为 CPU 核数；为 1 时在当前进程中执行
+    """
+    chunks = iter_policy_chunks(lines, chunk_size)
+    if workers == 1:
+        for chunk in chunks:
+            _, records, errors = _validate_chunk_worker(chunk)
+            yield records, errors
+        return
+    with multiprocessing.Pool(workers) as pool:
+        # imap 按输入顺序返回结果，并且不会一次把所有批次都提交到队列里
+        for _, records, errors in pool.imap(_validate_chunk_worker, chunks):
+            yield records, errors
+
+
+def _make_policy_lines(n: int) -> List[bytes]:
+    """生成 n 条测试用的原始政策记录（NDJSON）"""
+    dates = ['2025-07-01', '2024-12-31 08:30:00', '2025年6月15号', '2023年1月2日', '2022/03/04']
+    orgs = [{'国务院': 1}, {'工业和信息化部': 1, '财政部': 2}, {'发展改革委': 1}]
+    lines = []
+    for i in range(n):
+        record = {
+            'id': f"policy-{i}", 'title': f"关于推进第{i}项工作的通知",
+            'pub_date': dates[i % len(dates)] if i % 50 else f"20{i % 25:02d}年{i % 12 + 1}月{i % 28 + 1}号",
+            'doc_num': f"国发〔2025〕{i}号", 'org': orgs[i % len(orgs)],
+            'province': '全国', 'level': '国家级', 'theme': '产业发展',
+            'url': f"https://example.com/policy/{i}", 'content': '政策正文' * 20,
+        }
+        lines.append(json.dumps(record, ensure_ascii=False).encode('utf-8'))
+    return lines
+
+
+def bench(n: int = 200_000, chunk_size: int = 5000):
+    lines = _make_policy_lines(n)
+
+    def report(label, elapsed):
+        print(f"{label:<36}: {n:>8} records in {elapsed:6.2f} s | {n / elapsed:>10,.0f} records/s")
+
+    normalize_pubdate.cache_clear()
+    start = time.perf_counter()
+    per_object = [Policy(**json.loads(line)) for line in lines]
+    report("per object Policy(**json.loads())", time.perf_counter() - start)
+
+    start = time.perf_counter()
+    batch = []
+    for _, data in iter_policy_chunks(lines, chunk_size):
+        batch.extend(validate_policy_chunk(data)[0])
+    report("TypeAdapter.validate_json (1 proc)", time.perf_counter() - start)
+    assert batch == per_object
+
+    for workers in (2, os.cpu_count() or 1):
+        start = time.perf_counter()
+        total = sum(len(records) for records, _ in import_policies(lines, chunk_size, workers))
+        report(f"import_policies (workers={workers})", time.perf_counter() - start)
+        assert total == n
+    print(normalize_pubdate.cache_info())
 
 
 if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'bench':
+        # python pydantic_practice.py bench [记录数]
+        bench(*(int(arg) for arg in sys.argv[2:3]))
+        sys.exit(0)
+
     p1 = Person(uid=1, username="zhangsan", gender="female", age=30, password="123456")
     print(p1.model_dump())
 
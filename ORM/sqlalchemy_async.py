@@ -1,7 +1,14 @@
 """
 SQLAlchemy异步使用，以2.0为例
 """
+import os
+import sys
+import json
+import time
 import asyncio
+import sqlite3
+import tempfile
+import tracemalloc
 from urllib import parse
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, async_scoped_session, AsyncEngine, \
     AsyncSession, AsyncConnection, AsyncSessionTransaction
@@ -185,6 +192,105 @@ async def async_orm_usage():
     await async_engine.dispose()
 
 
+# ------------ 4. 流式查询 -------------------
+def P4_Streaming():
+    """
+    AsyncConnection.execute() 返回的是缓冲的结果：驱动先把整个结果集读取到内存中，再交给调用方迭代，
+    结果集很大时（导出整张表）内存占用和结果集大小成正比，并且第一行数据要等全部读取完才能拿到.
+    AsyncConnection.stream() 使用服务端游标（aiomysql 的 SSCursor、asyncpg 的 cursor），返回 AsyncResult，
+    按 yield_per 指定的行数分批从数据库读取，内存占用只和批大小有关.
+    注意：
+      + 流式读取期间连接一直被占用，直到迭代结束或者生成器被关闭（客户端断开时 StreamingResponse 会关闭生成器）；
+      + MySQL 的服务端游标在读取完之前，同一个连接上不能执行其他语句.
+    """
+    pass
+
+
+async def stream_rows(engine: AsyncEngine, stmt, params=None, yield_per: int = 1000):
+    """逐行产出查询结果的异步生成器"""
+    async with engine.connect() as conn:
+        result = await conn.stream(stmt.execution_options(yield_per=yield_per), params)
+        async for row in result:
+            yield row
+
+
+async def stream_partitions(engine: AsyncEngine, stmt, params=None, size: int = 1000):
+    """按固定大小的分区产出查询结果，每个分区是 Row 的列表（最后一个分区可能不满）"""
+    async with engine.connect() as conn:
+        result = await conn.stream(stmt.execution_options(yield_per=size), params)
+        async for partition in result.partitions(size):
+            yield partition
+
+
+async def stream_ndjson(engine: AsyncEngine, stmt, params=None, size: int = 1000):
+    """把查询结果编码为 NDJSON（每行一个 JSON 对象），每个分区编码成一个 bytes 块"""
+    encoder = json.JSONEncoder(ensure_ascii=False, default=str)
+    async for partition in stream_partitions(engine, stmt, params, size):
+        yield ''.join(encoder.encode(row._asdict()) + '\n' for row in partition).encode('utf-8')
+
+
+def ndjson_response(engine: AsyncEngine, stmt, params=None, size: int = 1000):
+    """返回 FastAPI 的 StreamingResponse，用于在路由函数中直接返回大结果集"""
+    # fastapi 只在这里用到，不作为本模块的必须依赖
+    from fastapi.responses import StreamingResponse
+    return StreamingResponse(stream_ndjson(engine, stmt, params, size), media_type='application/x-ndjson')
+
+
+def create_stream_app(engine: AsyncEngine = async_engine):
+    """
+    一个导出 user_orm 表的 FastAPI 应用示例：
+        uvicorn sqlalchemy_async:app_factory --factory
+        curl -N http://127.0.0.1:8000/users/stream?min_age=18
+    """
+    from fastapi import FastAPI
+    app = FastAPI()
+
+    @app.get('/users/stream')
+    async def export_users(min_age: int = 0, size: int = 1000):
+        stmt = select(UserORM.__table__).where(UserORM.age >= min_age).order_by(UserORM.uid)
+        return ndjson_response(engine, stmt, size=size)
+
+    return app
+
+
+app_factory = create_stream_app
+
+
+async def check_streaming(rows: int = 5_000_000, size: int = 1000):
+    """
+    流式读取的检查：在临时 SQLite 文件中生成 rows 行数据，用 stream_ndjson() 读取全部数据，检查行数和内存峰值.
+    用法: python sqlalchemy_async.py stream-check [行数]
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'stream.db')
+        # 用标准库 sqlite3 同步生成测试数据，比通过 ORM 插入快得多
+        with sqlite3.connect(path) as db:
+            db.execute("CREATE TABLE stream_user (uid INTEGER PRIMARY KEY, name TEXT NOT NULL, gender TEXT, age INTEGER)")
+            db.executemany("INSERT INTO stream_user VALUES (?, ?, ?, ?)",
+                           ((i, f"user{i}", ('male', 'female')[i % 2], i % 80) for i in range(1, rows + 1)))
+        engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+        stream_user = Table('stream_user', MetaData(), Column('uid', Integer, primary_key=True),
+                            Column('name', String), Column('gender', String), Column('age', Integer))
+        stmt = select(stream_user).order_by(stream_user.c.uid)
+        try:
+            tracemalloc.start()
+            start = time.perf_counter()
+            count = total_bytes = 0
+            async for chunk in stream_ndjson(engine, stmt, size=size):
+                count += chunk.count(b'\n')
+                total_bytes += len(chunk)
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        finally:
+            await engine.dispose()
+    print(f"streamed {count} rows / {total_bytes / 2 ** 20:.1f} MiB NDJSON in {elapsed:.1f} s, "
+          f"peak traced memory {peak / 2 ** 20:.1f} MiB")
+    assert count == rows, f"expected {rows} rows, got {count}"
+    # 内存峰值只和分区大小有关，和总行数无关，这里留出足够的余量
+    assert peak < 32 * 2 ** 20, f"peak memory {peak} bytes is too large for streaming"
+
+
 async def main_async():
     print("************* main_async **************")
     await async_connection()
@@ -193,4 +299,7 @@ async def main_async():
 
 
 if __name__ == '__main__':
-    asyncio.run(main_async())
+    if len(sys.argv) > 1 and sys.argv[1] == 'stream-check':
+        asyncio.run(check_streaming(*(int(arg) for arg in sys.argv[2:3])))
+    else:
+        asyncio.run(main_async())
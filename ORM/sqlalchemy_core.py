@@ -2,11 +2,14 @@
 练习 SQL Alchemy 的 Core，以 1.4 版本为例
 2.0 版本 Core 的使用语法基本没有变化。
 """
+import sys
+import time
 import logging
 from urllib import parse
-from sqlalchemy import create_engine, inspect
+from sqlalchemy import create_engine, inspect, bindparam
 from sqlalchemy import MetaData, Table, Column, Integer, String, ForeignKey
-from sqlalchemy.sql.expression import text, insert, select, func
+from sqlalchemy.sql.expression import text, insert, select, delete, func
+from sqlalchemy.dialects import mysql, postgresql, sqlite
 
 # 设置日志级别
 logging.basicConfig()
@@ -188,7 +191,179 @@ def P2_4_Update():
     pass
 
 
+# --------------- 数据访问工具 ---------------
+def P3_Toolkit():
+    """
+    上面的写法每次调用都重新构造 insert().values(...) 对象，值直接写在语句里：
+      + 每次执行都要为新的语句对象生成缓存 key，值不同时 SQL 结构也可能不同（比如 values 的列不同），编译缓存命中率低；
+      + 一次只插入一条或几条数据，每条数据都是一次数据库往返.
+    改进的做法：
+      + 语句在模块加载时构造一次，变化的部分用 bindparam 占位，执行时传参数 —— SQL 只编译一次，之后都命中 engine 的编译缓存；
+      + 批量数据用 executemany 的方式执行（execute 传入参数列表），SQLAlchemy 2.0 的 insertmanyvalues 会把多行参数
+        合并成 INSERT ... VALUES (...), (...) 分页发送，每页的行数由 insertmanyvalues_page_size 控制（默认 1000），
+        需要 RETURNING 时也能批量执行；
+      + 生产环境关闭 echo（以及 sqlalchemy.engine 的 DEBUG 日志），echo 会格式化并输出每一条语句和参数，批量写入时开销很大.
+    """
+    pass
+
+# 预先构造的语句，执行时通过参数传值
+USER_INSERT = insert(user)
+USER_INSERT_RETURNING = insert(user).returning(user.c.uid, sort_by_parameter_order=True)
+USER_BY_UID = select(user).where(user.c.uid == bindparam('uid'))
+USER_BY_NAME = select(user).where(user.c.name == bindparam('name')).order_by(user.c.uid)
+USER_COUNT = select(func.count()).select_from(user)
+# upsert 时更新的列
+UPSERT_COLUMNS = ('name', 'fullname', 'gender')
+
+
+class UserStore:
+    """
+    user_core 表的数据访问工具
+    :param page_size: 批量写入时每条 INSERT 语句包含的行数（insertmanyvalues_page_size）
+    :param chunk_size: 批量写入时每次 execute 传入的行数，迭代器形式的数据按这个大小分块，避免全部加载到内存
+    """
+
+    def __init__(self, engine, page_size: int = 1000, chunk_size: int = 10000):
+        self.engine = engine
+        self.page_size = page_size
+        self.chunk_size = chunk_size
+        self._upsert = self._build_upsert()
+
+    def _build_upsert(self):
+        dialect = self.engine.dialect.name
+        if dialect == 'mysql':
+            stmt = mysql.insert(user)
+            return stmt.on_duplicate_key_update({name: stmt.inserted[name] for name in UPSERT_COLUMNS})
+        if dialect in ('postgresql', 'sqlite'):
+            module = postgresql if dialect == 'postgresql' else sqlite
+            stmt = module.insert(user)
+            return stmt.on_conflict_do_update(
+                index_elements=[user.c.uid],
+                set_={name: stmt.excluded[name] for name in UPSERT_COLUMNS},
+            )
+        raise ValueError(f"upsert is not supported for {dialect}")
+
+    @property
+    def supports_returning(self) -> bool:
+        return self.engine.dialect.insert_returning
+
+    def _chunks(self, rows):
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def get(self, uid: int):
+        with self.engine.connect() as conn:
+            return conn.execute(USER_BY_UID, {'uid': uid}).first()
+
+    def find_by_name(self, name: str) -> list:
+        with self.engine.connect() as conn:
+            return conn.execute(USER_BY_NAME, {'name': name}).all()
+
+    def count(self) -> int:
+        with self.engine.connect() as conn:
+            return conn.execute(USER_COUNT).scalar()
+
+    def insert_one(self, row: dict, conn=None):
+        if conn is not None:
+            return conn.execute(USER_INSERT, row)
+        with self.engine.begin() as conn:
+            return conn.execute(USER_INSERT, row)
+
+    def bulk_insert(self, rows, return_ids: bool = False, page_size: int = None):
+        """
+        批量插入，rows 可以是 dict 的列表或迭代器，整个过程在一个事务中.
+        :param return_ids: 返回插入记录的 uid 列表（按 rows 的顺序），需要数据库支持 INSERT ... RETURNING
+        :return: return_ids 为 True 时返回 uid 列表，否则返回插入的行数
+        """
+        if return_ids and not self.supports_returning:
+            raise ValueError(f"{self.engine.dialect.name} does not support INSERT ... RETURNING")
+        stmt = USER_INSERT_RETURNING if return_ids else USER_INSERT
+        ids = []
+        total = 0
+        with self.engine.begin() as conn:
+            conn = conn.execution_options(insertmanyvalues_page_size=page_size or self.page_size)
+            for chunk in self._chunks(rows):
+                result = conn.execute(stmt, chunk)
+                if return_ids:
+                    ids.extend(result.scalars())
+                total += len(chunk)
+        return ids if return_ids else total
+
+    def upsert(self, rows: list[dict]):
+        """
+        按主键 uid 插入或更新.
+        数据库支持 RETURNING 时（PostgreSQL、SQLite 3.35+）返回写入后的记录，否则（MySQL）返回受影响的行数.
+        """
+        stmt = self._upsert
+        with self.engine.begin() as conn:
+            if self.supports_returning:
+                return conn.execute(stmt.returning(*user.c, sort_by_parameter_order=True), rows).all()
+            return conn.execute(stmt, rows).rowcount
+
+    def clear(self):
+        with self.engine.begin() as conn:
+            conn.execute(delete(user))
+
+
+def make_rows(n: int, start: int = 0):
+    genders = ('male', 'female', None)
+    for i in range(start, start + n):
+        yield {'name': f"user{i}", 'fullname': f"user {i} full name", 'gender': genders[i % 3]}
+
+
+def bench(n: int = 1_000_000, url: str = 'sqlite://'):
+    """
+    插入 n 行数据，比较三种写法: 逐行 execute、executemany、insertmanyvalues 批量 VALUES（不同的 page_size）.
+    用法: python sqlalchemy_core.py bench [行数] [数据库url]
+    """
+    # 关闭 echo 和 sqlalchemy.engine 的日志（本模块开头设置了 DEBUG 级别）
+    logging.getLogger("sqlalchemy.engine").setLevel(logging.WARNING)
+    bench_engine = create_engine(url, echo=False)
+    metadata_obj.create_all(bind=bench_engine, tables=[user])
+    store = UserStore(bench_engine)
+    store.clear()
+    rows = list(make_rows(n))
+
+    def report(label, elapsed):
+        print(f"{label:<36}: {n:>8} rows in {elapsed:7.2f} s | {n / elapsed:>10,.0f} rows/s")
+
+    # 1. 逐行执行，每行一次数据库往返（在同一个事务中，不计算提交的开销）
+    start = time.perf_counter()
+    with bench_engine.begin() as conn:
+        for row in rows:
+            store.insert_one(row, conn=conn)
+    report("single execute", time.perf_counter() - start)
+    store.clear()
+
+    # 2. executemany：不需要 RETURNING 时，由驱动的 cursor.executemany() 执行（pymysql 会自己把多行改写成一条多 VALUES 语句）
+    start = time.perf_counter()
+    store.bulk_insert(rows)
+    report("executemany", time.perf_counter() - start)
+    store.clear()
+
+    # 3. insertmanyvalues：多行合并为一条 INSERT ... VALUES (...), (...) 语句
+    if store.supports_returning:
+        for page_size in (100, 1000, 5000):
+            start = time.perf_counter()
+            ids = store.bulk_insert(rows, return_ids=True, page_size=page_size)
+            report(f"insertmanyvalues page_size={page_size}", time.perf_counter() - start)
+            assert len(ids) == n
+            store.clear()
+    else:
+        print(f"{bench_engine.dialect.name} does not support RETURNING, skip insertmanyvalues")
+    assert store.count() == 0
+
+
 if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'bench':
+        bench(int(sys.argv[2]) if len(sys.argv) > 2 else 1_000_000, *sys.argv[3:4])
+        sys.exit(0)
     ins = user.insert().values(name="jack", fullname="Jack Jones")
     # with engine.begin() as conn:
     #     res = conn.execute(ins)
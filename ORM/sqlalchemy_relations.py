@@ -1,9 +1,12 @@
 """
 练习 SQL Alchemy 的 ORM 的关系定义，以 1.4 版本为例
 """
+import logging
+from collections import Counter
 from urllib import parse
-from sqlalchemy import create_engine, Table, Column, Integer, String, ForeignKey
+from sqlalchemy import create_engine, event, Table, Column, Integer, String, ForeignKey
 from sqlalchemy.orm import declarative_base, sessionmaker, relationship, backref
+from sqlalchemy.orm import selectinload, joinedload, subqueryload
 from sqlalchemy.sql.expression import text, select, func
 from sqlalchemy.ext.associationproxy import association_proxy
 
@@ -319,5 +322,203 @@ def run_3():
     for association in res_r2.left_associations:
         print(association.left_record)
 
+
+# ---------------------------------------------------------------------
+def P5_loader_strategy():
+    print("关联记录的加载策略")
+
+# relationship 默认是 lazy='select'：访问 l1.right_records 时才执行一次查询，遍历 N 个 LeftV1 并访问 right_records_id 时
+# 就会执行 1 + N 次查询（N+1 问题）. 解决办法是在查询时通过 options() 指定预加载（eager loading）策略：
+#  + joinedload: 在原查询上 LEFT OUTER JOIN 关联表，一次查询完成；但是结果行数 = 父记录数 * 平均子记录数，扇出（fan-out）大时
+#    重复传输父记录的数据，并且多层 joinedload 会使行数成倍增长. 适合多对一（每个父记录最多一行）和扇出很小的集合；
+#  + selectinload: 先查父记录，再用 WHERE 父主键 IN (...) 查询子记录，IN 列表按 500 个一批（低于各个驱动的参数个数限制），
+#    父记录数为 N 时总共 1 + ceil(N / 500) 次查询，不会重复父记录. 适合大多数集合关系；
+#  + subqueryload: 把原查询作为子查询 JOIN 到关联表，不论父记录多少都只有 2 次查询，但是原查询要执行两次.
+#    适合父记录非常多（selectin 的批次太多）的情况.
+# 下面的 apply_loader_strategies() 根据关系的类型和估算的扇出自动选择策略，NPlusOneDetector 在运行时检测 N+1 问题.
+
+logger = logging.getLogger(__name__)
+
+# 平均扇出不超过这个值的集合关系使用 joinedload
+JOINED_MAX_FANOUT = 2.0
+# 预计父记录数超过这个值时使用 subqueryload（selectinload 需要 N / 500 次查询）
+SUBQUERY_MIN_PARENTS = 20000
+# 各个驱动一条语句中绑定参数个数的上限，IN 列表不能超过这个长度
+DRIVER_MAX_PARAMS = {
+    'sqlite': 999,          # SQLite 3.32 之前的默认值，之后是 32766
+    'mysql': 65535,
+    'postgresql': 32767,
+    'mssql': 2100,
+    'oracle': 1000,         # Oracle 的 IN 列表最多 1000 项
+}
+# 缓存估算的扇出：{relationship property: 平均每个父记录的关联记录数}
+_fanout_cache = {}
+
+
+def estimate_fanout(session, prop, refresh: bool = False) -> float:
+    """
+    估算关系的平均扇出：关联记录总数 / 父记录总数，结果会被缓存.
+    :param prop: 关系属性，比如 LeftV1.right_records
+    """
+    prop = getattr(prop, 'property', prop)
+    if not prop.uselist:
+        return 1.0
+    if not refresh and prop in _fanout_cache:
+        return _fanout_cache[prop]
+    parents = session.execute(select(func.count()).select_from(prop.parent.local_table)).scalar() or 0
+    if prop.secondary is not None:
+        # 多对多：关联表的行数
+        children = session.execute(select(func.count()).select_from(prop.secondary)).scalar() or 0
+    else:
+        # 一对多：子表中外键不为空的行数
+        fk = next(iter(prop.remote_side))
+        children = session.execute(select(func.count()).select_from(prop.target).where(fk.isnot(None))).scalar() or 0
+    fanout = children / parents if parents else 0.0
+    _fanout_cache[prop] = fanout
+    return fanout
+
+
+def choose_loader(prop, fanout: float, expected_parents: int = None):
+    """根据关系类型、扇出和预计的父记录数选择加载策略，返回 joinedload/selectinload/subqueryload 之一"""
+    prop = getattr(prop, 'property', prop)
+    if not prop.uselist or fanout <= JOINED_MAX_FANOUT:
+        return joinedload
+    if expected_parents is not None and expected_parents > SUBQUERY_MIN_PARENTS:
+        return subqueryload
+    return selectinload
+
+
+def apply_loader_strategies(session, stmt, paths, expected_parents: int = None):
+    """
+    为 select(Entity) 语句的每条关系路径设置预加载策略.
+    :param paths: 关系路径列表，比如 ['right_records'] 或者 ['right_associations.right_record']
+    :param expected_parents: 预计查询返回的父记录数，不知道时传 None（不会选择 subqueryload）
+    用法: stmt = apply_loader_strategies(session, select(LeftV1), ['right_records'])
+         session.execute(stmt).scalars().unique()
+    集合关系可能选择 joinedload，此时结果中父记录会重复，需要调用 unique()
+    """
+    entity = stmt.column_descriptions[0]['entity']
+    options = []
+    for path in paths:
+        option = None
+        current = entity
+        parents = expected_parents
+        for name in path.split('.'):
+            attr = getattr(current, name)
+            fanout = estimate_fanout(session, attr)
+            loader = choose_loader(attr, fanout, parents)
+            logger.debug("%s.%s: fan-out %.2f -> %s", current.__name__, name, fanout, loader.__name__)
+            # 第一层用函数，后续层级在前一个 Load 对象上链式调用同名方法
+            option = loader(attr) if option is None else getattr(option, loader.__name__)(attr)
+            current = attr.property.mapper.class_
+            parents = None if parents is None else int(parents * max(fanout, 1.0))
+        options.append(option)
+    return stmt.options(*options)
+
+
+def max_in_size(dialect, reserved: int = 0) -> int:
+    """一条语句中 IN 列表的最大长度，reserved 是语句中其他绑定参数的个数"""
+    return DRIVER_MAX_PARAMS.get(dialect.name, 999) - reserved
+
+
+def in_batches(values, dialect, reserved: int = 0):
+    """把 values 按驱动的参数个数限制切分，用于手写的 WHERE ... IN (...) 查询"""
+    values = list(values)
+    size = max_in_size(dialect, reserved)
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+def load_by_ids(session, entity, ids, paths=()):
+    """按主键批量查询记录，IN 列表按驱动的参数限制分批，paths 中的关系同时预加载"""
+    pk = entity.__mapper__.primary_key[0]
+    result = []
+    for batch in in_batches(ids, session.get_bind().dialect):
+        stmt = apply_loader_strategies(session, select(entity).where(pk.in_(batch)), paths, len(batch))
+        result.extend(session.execute(stmt).scalars().unique())
+    return result
+
+
+class NPlusOneDetector:
+    """
+    运行时检测 N+1：在一个工作单元（session 的一个顶层事务）内，同一条语句执行次数超过 threshold 时输出 warning.
+    关系的懒加载按 "实体.关系" 计数，其他语句按 SQL 文本计数.
+    用法:
+        with NPlusOneDetector(session, threshold=10):
+            for left in session.execute(select(LeftV1)).scalars():
+                print(left.right_records_id)
+    """
+
+    def __init__(self, session, threshold: int = 10):
+        self.session = session
+        self.threshold = threshold
+        self.counts = Counter()
+        # 所有工作单元中检测到的问题：{语句: 最大执行次数}
+        self.detected = {}
+
+    def _key(self, orm_execute_state) -> str:
+        if orm_execute_state.is_relationship_load:
+            return f"lazy load {orm_execute_state.loader_strategy_path}"
+        return str(orm_execute_state.statement)
+
+    def _on_execute(self, orm_execute_state):
+        key = self._key(orm_execute_state)
+        self.counts[key] += 1
+        count = self.counts[key]
+        if count > self.threshold:
+            if key not in self.detected:
+                logger.warning("possible N+1: executed > %d times in one unit of work: %s", self.threshold, key)
+            self.detected[key] = max(self.detected.get(key, 0), count)
+
+    def _on_transaction_end(self, session, transaction):
+        if transaction.parent is None:
+            self.counts.clear()
+
+    def attach(self):
+        event.listen(self.session, 'do_orm_execute', self._on_execute)
+        event.listen(self.session, 'after_transaction_end', self._on_transaction_end)
+        return self
+
+    def detach(self):
+        event.remove(self.session, 'do_orm_execute', self._on_execute)
+        event.remove(self.session, 'after_transaction_end', self._on_transaction_end)
+
+    def __enter__(self):
+        return self.attach()
+
+    def __exit__(self, *exc):
+        self.detach()
+
+
+def run_4():
+    Base.metadata.create_all(bind=engine, tables=[LeftV1.__table__, RightV1.__table__, association_table_v1])
+    lefts = [LeftV1(id=i) for i in range(100, 150)]
+    rights = [RightV1(id=i) for i in range(100, 110)]
+    for i, left in enumerate(lefts):
+        left.right_records.extend(rights[i % 10:i % 10 + 3])
+    session.add_all(lefts + rights)
+    session.commit()
+    session.expunge_all()
+
+    # 默认的懒加载：1 + 50 次查询，会被检测到
+    with NPlusOneDetector(session, threshold=10) as detector:
+        for left in session.execute(select(LeftV1).where(LeftV1.id >= 100)).scalars():
+            print(left, left.right_records_id)
+        session.commit()
+    print(detector.detected)
+    session.expunge_all()
+
+    # 自动选择加载策略：平均扇出为 3，使用 selectinload，总共 2 次查询
+    with NPlusOneDetector(session, threshold=10) as detector:
+        stmt = apply_loader_strategies(session, select(LeftV1).where(LeftV1.id >= 100), ['right_records'])
+        for left in session.execute(stmt).scalars():
+            print(left, left.right_records_id)
+        session.commit()
+    print(detector.detected)
+    session.expunge_all()
+
+    print(load_by_ids(session, LeftV1, range(100, 150), paths=['right_records']))
+
+
 if __name__ == '__main__':
     pass
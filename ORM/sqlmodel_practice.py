@@ -1,7 +1,12 @@
 """
 SQLModel练习
 """
+import os
+import sys
+import json
+import time
 import asyncio
+from contextlib import asynccontextmanager
 from urllib import parse
 from pydantic import model_validator
 from sqlmodel import SQLModel, Field, create_engine, Session, select, or_, desc
@@ -14,10 +19,10 @@ from sqlalchemy import create_engine as create_engine_origin, select as select_o
 from sqlalchemy.orm import Session as Session_origin
 from sqlalchemy import Column, String, Integer, DateTime, Boolean
 
-from typing import List
+from typing import List, Annotated
 import uvicorn
-from fastapi import FastAPI
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, Depends, HTTPException, Query
+from fastapi.responses import JSONResponse, StreamingResponse
 
 
 # --------------- 连接数据库 ---------------
@@ -33,6 +38,10 @@ mysql_conf = {
 mysql_conf['passwd'] = parse.quote_plus(mysql_conf['passwd'])
 db_url = 'mysql+pymysql://{user}:{passwd}@{host}:{port}/{database}'.format(**mysql_conf)
 db_url_async = 'mysql+aiomysql://{user}:{passwd}@{host}:{port}/{database}'.format(**mysql_conf)
+# 可以通过环境变量换成其他数据库，比如性能对比时使用 SQLite:
+# SQLMODEL_DB_URL=sqlite:///hero.db SQLMODEL_DB_URL_ASYNC=sqlite+aiosqlite:///hero.db python sqlmodel_practice.py bench
+db_url = os.environ.get('SQLMODEL_DB_URL', db_url)
+db_url_async = os.environ.get('SQLMODEL_DB_URL_ASYNC', db_url_async)
 # 下面这个是同步引擎——SQLModel提供的封装
 engine = create_engine(url=db_url, echo=True)
 
@@ -40,7 +49,10 @@ engine = create_engine(url=db_url, echo=True)
 engine_origin = create_engine_origin(url=db_url, echo=True)
 
 # 异步引擎和异步Session对象
-async_engine: AsyncEngine = create_async_engine(url=db_url_async)
+# 连接池配置：pool_size 个常驻连接 + 最多 max_overflow 个临时连接，所有请求共用；
+# pool_pre_ping 取出连接时先检查是否可用，pool_recycle 定期重建连接，避免被 MySQL 的 wait_timeout 断开
+async_engine: AsyncEngine = create_async_engine(url=db_url_async, pool_size=10, max_overflow=20,
+                                                pool_pre_ping=True, pool_recycle=3600)
 SessionLocalAsync: async_sessionmaker[AsyncSession] = async_sessionmaker(bind=async_engine, expire_on_commit=False)
 
 
@@ -206,11 +218,13 @@ def main():
 
 # **************************** 异步使用方式 ****************************
 # 异步使用，目前还需要调用 sqlalchemy 的异步API
-async def init_db_async():
+async def init_db_async(dispose: bool = True):
+    """dispose=False 时保留连接池，FastAPI 应用启动时使用"""
     print(">>>>>>> init heroes")
     async with async_engine.begin() as conn:
-        await conn.run_sync(SQLModel.metadata.create_all, checkfirst=True)
-    await async_engine.dispose()
+        await conn.run_sync(SQLModel.metadata.create_all, tables=[Hero.__table__], checkfirst=True)
+    if dispose:
+        await async_engine.dispose()
 
 async def add_heroes_async():
     hero_1 = Hero(name="Deadpond", secret_name="Dive Wilson", age=30, gender="male")
@@ -234,6 +248,16 @@ async def select_heroes_async():
             print(hero)
     await async_engine.dispose()
 
+
+async def select_hero_page_async(session: AsyncSession, after_uid: int = 0, limit: int = 100) -> List[Hero]:
+    """
+    按 uid 顺序查询 uid > after_uid 的 limit 个英雄，使用调用方的 session（比如 FastAPI 请求的 session）.
+    键集分页（keyset pagination）：WHERE uid > 上一页最后一个 uid ORDER BY uid LIMIT n，直接在主键索引上定位，
+    不像 OFFSET 分页那样需要扫描并丢弃前面所有的行，翻到很后面的页时也一样快
+    """
+    statement = select(Hero).where(Hero.uid > after_uid).order_by(Hero.uid).limit(limit)
+    return list((await session.execute(statement)).scalars())
+
 async def main_async():
     print(">>>>>>> run main_async")
     await init_db_async()
@@ -244,8 +268,17 @@ async def main_async():
 
 
 # **************************** 结合FastAPI使用 ****************************
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await init_db_async(dispose=False)
+    yield
+    # 应用退出时才关闭连接池，请求之间复用连接
+    await async_engine.dispose()
 
+
+app = FastAPI(lifespan=lifespan)
+
+# 下面是同步的写法：每个请求在线程池中执行，并且同步引擎设置了 echo=True，每条语句都会格式化输出
 @app.get("/heroes", response_model=List[Hero])
 def list_hero():
     result: List[Hero] = []
@@ -276,7 +309,106 @@ def create_hero(hero: Hero):
     return hero
 
 
+# ---------- 异步的写法 ----------
+async def get_async_session():
+    """每个请求一个 AsyncSession，请求结束时关闭，连接归还给 async_engine 的连接池"""
+    async with SessionLocalAsync() as session:
+        yield session
+
+AsyncSessionDep = Annotated[AsyncSession, Depends(get_async_session)]
+
+
+class HeroPage(SQLModel):
+    items: List[Hero]
+    # 下一页的 after_uid 参数，没有下一页时为 None
+    next_after: int | None = None
+
+
+@app.get("/async/heroes", response_model=HeroPage)
+async def list_hero_async(session: AsyncSessionDep, after_uid: int = 0, limit: int = Query(default=100, ge=1, le=1000)):
+    # 多查一条，用来判断是否还有下一页
+    heroes = await select_hero_page_async(session, after_uid, limit + 1)
+    has_next = len(heroes) > limit
+    heroes = heroes[:limit]
+    return HeroPage(items=heroes, next_after=heroes[-1].uid if has_next else None)
+
+
+async def _stream_heroes(batch_size: int):
+    # 不使用请求的 session：依赖项在响应开始发送前就会退出；并且 Session 的 identity map 会随读取的行数增长.
+    # 这里直接在连接上流式读取列，内存占用只和 batch_size 有关
+    statement = select_origin(Hero.__table__).order_by(Hero.uid).execution_options(yield_per=batch_size)
+    async with async_engine.connect() as conn:
+        result = await conn.stream(statement)
+        async for rows in result.partitions():
+            yield ''.join(json.dumps(row._asdict(), ensure_ascii=False, default=str) + '\n' for row in rows)
+
+
+@app.get("/async/heroes/stream")
+async def stream_hero_async(batch_size: int = Query(default=500, ge=1, le=10000)):
+    """以 NDJSON 格式返回所有英雄（每行一个 JSON 对象）"""
+    return StreamingResponse(_stream_heroes(batch_size), media_type="application/x-ndjson")
+
+
+@app.get("/async/hero/{uid}", response_model=Hero)
+async def get_hero_async(uid: int, session: AsyncSessionDep):
+    hero = await session.get(Hero, uid)
+    if hero is None:
+        raise HTTPException(status_code=404, detail="hero not found")
+    return hero
+
+
+# **************************** 性能对比 ****************************
+async def bench(heroes: int = 10000, requests: int = 1000, concurrency: int = 50):
+    """
+    用 httpx 在进程内调用应用，对比同步和异步接口.
+    为了对比接口本身，两个引擎都关闭 echo（同步引擎默认 echo=True，每条语句都会输出日志）.
+    """
+    import httpx
+    engine.echo = False
+    SQLModel.metadata.drop_all(engine, tables=[Hero.__table__], checkfirst=True)
+    SQLModel.metadata.create_all(engine, tables=[Hero.__table__])
+    with engine.begin() as conn:
+        conn.execute(Hero.__table__.insert(), [
+            {'name': f"hero-{i}", 'secret_name': f"secret-{i}", 'age': i % 100} for i in range(heroes)
+        ])
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def call(url):
+            async with semaphore:
+                response = await client.get(url)
+                response.raise_for_status()
+                return response
+
+        async def run(label, urls):
+            start = time.perf_counter()
+            await asyncio.gather(*(call(url) for url in urls))
+            elapsed = time.perf_counter() - start
+            print(f"{label:<36}: {len(urls):>6} requests in {elapsed:6.2f} s | {len(urls) / elapsed:>8,.0f} req/s")
+
+        uids = [i % heroes + 1 for i in range(requests)]
+        await run("sync   GET /hero/{uid}", [f"/hero/{uid}" for uid in uids])
+        await run("async  GET /async/hero/{uid}", [f"/async/hero/{uid}" for uid in uids])
+        pages = requests // 10
+        # 同步接口只能返回全部数据；异步接口按 100 条一页，分散到不同的位置
+        await run("sync   GET /heroes (all rows)", ["/heroes"] * pages)
+        await run("async  GET /async/heroes (keyset page)",
+                  [f"/async/heroes?after_uid={uid}&limit=100" for uid in uids[:pages]])
+        await run("async  GET /async/heroes/stream (all rows)", ["/async/heroes/stream"] * pages)
+        # 流式接口返回的行数和同步接口一致
+        lines = (await client.get("/async/heroes/stream")).text.count('\n')
+        assert lines == heroes, f"expected {heroes} rows, got {lines}"
+    await async_engine.dispose()
+
+
 if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'bench':
+        # python sqlmodel_practice.py bench [英雄数] [请求数] [并发数]
+        asyncio.run(bench(*(int(arg) for arg in sys.argv[2:5])))
+        sys.exit(0)
+
     main()
     asyncio.run(main_async())
 